@@ -0,0 +1,434 @@
+# Micro-benchmarks for the SEC parsing paths, run on synthetic inputs:
+#   python -m utils.python_helpers.benchmarks 13f-info-table --size 50000
+#   python -m utils.python_helpers.benchmarks cusip-scan --size 500
+#   python -m utils.python_helpers.benchmarks cusip-identifiers --size 3000000
+#   python -m utils.python_helpers.benchmarks nport-name-match --size 3500
+#   python -m utils.python_helpers.benchmarks nport-stream --size 200000
+#   python -m utils.python_helpers.benchmarks 10k-sections --size 20
+#   python -m utils.python_helpers.benchmarks vector-search --size 100000
+
+import argparse
+import collections
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .cusip_cik_parsing import CikCusipParser
+from .form_10k_extractor import SECTIONS, Form10kExtractor
+from .form_13f_hr_extractor import Form13F_HR_Extractor
+from .identifiers import cusip_check_digit, cusip_identifiers, is_valid_cusip, valid_cusips
+from .name_matcher import NameMatcher
+from .sec_nport_processor import iter_nport_batches, iter_nport_holdings
+from .sgml_submission import SecSubmission
+from .vector_index import HashingEmbedder, VectorIndex
+
+
+def _measure(fn: Callable, repeat: int = 3) -> tuple[float, object]:
+    """Best wall time over `repeat` runs, with the result of the last run."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _peak_memory(fn: Callable) -> int:
+    """Peak bytes allocated by Python while running `fn`."""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _report(name: str, rows: int, seconds: float, peak: int) -> None:
+    print(f'{name:<28} {seconds * 1000:>10.1f} ms {rows / seconds:>14,.0f} rows/s {peak / 2**20:>10.1f} MiB parse peak')
+
+
+def synthetic_info_table(rows: int) -> str:
+    """An INFORMATION TABLE document with `rows` infoTable entries, every tenth one an option position."""
+    entries = []
+    for i in range(rows):
+        share_type = 'PRN' if i % 10 == 9 else 'SH'
+        entries.append(
+            f'<ns1:infoTable><ns1:nameOfIssuer>ISSUER {i}</ns1:nameOfIssuer><ns1:titleOfClass>COM</ns1:titleOfClass>'
+            f'<ns1:cusip>{i:09d}</ns1:cusip><ns1:value>{i * 7 % 100000}</ns1:value>'
+            f'<ns1:shrsOrPrnAmt><ns1:sshPrnamt>{i * 13 % 1000000}</ns1:sshPrnamt><ns1:sshPrnamtType>{share_type}</ns1:sshPrnamtType></ns1:shrsOrPrnAmt>'
+            f'<ns1:investmentDiscretion>SOLE</ns1:investmentDiscretion>'
+            f'<ns1:votingAuthority><ns1:Sole>{i}</ns1:Sole><ns1:Shared>0</ns1:Shared><ns1:None>0</ns1:None></ns1:votingAuthority>'
+            f'</ns1:infoTable>'
+        )
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<ns1:informationTable xmlns:ns1="http://www.sec.gov/edgar/document/thirteenf/informationtable">\n'
+            + '\n'.join(entries) + '\n</ns1:informationTable>')
+
+
+def benchmark_13f_info_table(rows: int = 50_000, repeat: int = 3) -> None:
+    """xmltodict + strip_ns versus the streaming iterparse path.
+
+    Times cover parsing plus filter_and_format; the memory peak is for parsing
+    alone (building the full structure versus walking the stream).
+    """
+    extractor = Form13F_HR_Extractor('', '')
+    xml = synthetic_info_table(rows)
+    print(f'13F information table: {rows:,} infoTable rows, {len(xml) / 2**20:.1f} MiB')
+    args = ('1 Main St', '0001962636', 'Manager', '03-31-2023')
+    seconds, legacy = _measure(
+        lambda: extractor.filter_and_format(extractor.extract_investment_info(xml), *args), repeat)
+    _report('xmltodict + strip_ns', rows, seconds, _peak_memory(lambda: extractor.extract_investment_info(xml)))
+    seconds, streamed = _measure(
+        lambda: extractor.filter_and_format(extractor.iter_investment_info(xml), *args), repeat)
+    _report('iterparse', rows, seconds,
+            _peak_memory(lambda: collections.deque(extractor.iter_investment_info(xml), maxlen=0)))
+    assert legacy == streamed, 'parsers disagree'
+
+
+def synthetic_sc13_filing(rng: random.Random, cik: int, exhibit_lines: int = 4000,
+                          nearby_labels: bool = False) -> str:
+    """An SC 13D/13G full submission: SEC header, a cover page with the CUSIP and a long exhibit after it.
+
+    With `nearby_labels` the number follows a second CUSIP label that sits
+    inside the context window of a first one, out of that first one's reach.
+    """
+    cusip8 = f'{rng.randrange(10**3, 10**4)}{rng.choice("ABCDEFGH")}{rng.randrange(10)}{rng.randrange(10, 100)}'
+    cusip = f'{cusip8}{cusip_check_digit(cusip8)}'
+    cover = [
+        '<P>Common Stock, par value $0.001 per share</P>',
+        '<P>(Title of Class of Securities)</P>',
+        f'<P><B>{cusip[:6]} {cusip[6:8]} {cusip[8]}</B></P>',
+        '<P>(CUSIP Number)</P>',
+    ] if not nearby_labels else [
+        '<P>CUSIP and class information</P>',
+        '<P>(Title of Class of Securities)</P>',
+        '<P>CUSIP Number:</P>',
+        '<P>Common Stock, par value $0.001 per share</P>',
+        f'<P><B>{cusip[:6]} {cusip[6:8]} {cusip[8]}</B></P>',
+    ]
+    filler = [f'<P>Item {i % 7 + 1}. The reporting person acquired the shares for investment purposes, {i}.</P>'
+              for i in range(exhibit_lines)]
+    return '\n'.join([
+        '<SEC-DOCUMENT>0000950103-23-000001.txt : 20230105',
+        '<SEC-HEADER>0000950103-23-000001.hdr.sgml : 20230105',
+        'ACCESSION NUMBER:\t\t0000950103-23-000001',
+        'CONFORMED SUBMISSION TYPE:\tSC 13D',
+        '',
+        'SUBJECT COMPANY:\t',
+        '',
+        '\tCOMPANY DATA:\t',
+        f'\t\tCOMPANY CONFORMED NAME:\t\t\tISSUER {cik} INC',
+        f'\t\tCENTRAL INDEX KEY:\t\t\t{cik:010d}',
+        '',
+        'FILED BY:\t',
+        '',
+        '\tCOMPANY DATA:\t',
+        '\t\tCOMPANY CONFORMED NAME:\t\t\tACTIVIST FUND LP',
+        '\t\tCENTRAL INDEX KEY:\t\t\t0001999999',
+        '</SEC-HEADER>',
+        '<DOCUMENT>',
+        '<TYPE>SC 13D',
+        '<SEQUENCE>1',
+        '<FILENAME>d123.htm',
+        '<TEXT>',
+        '<HTML><BODY>',
+        '<P>SECURITIES AND EXCHANGE COMMISSION</P>',
+        *cover,
+        *filler,
+        '</BODY></HTML>',
+        '</TEXT>',
+        '</DOCUMENT>',
+        '</SEC-DOCUMENT>',
+    ]), cusip
+
+
+def benchmark_cusip_scan(files: int = 500, repeat: int = 3) -> None:
+    """SecSubmission split + _parse_submission versus the streaming scan_lines scanner, per SC 13D file."""
+    parser = CikCusipParser()
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        expected = []
+        for i in range(files):
+            text, cusip = synthetic_sc13_filing(rng, 1000 + i, nearby_labels=i % 2 == 1)
+            path = os.path.join(directory, f'{1000 + i}_2023-01-05_{i:06d}.txt')
+            with open(path, 'w') as f:
+                f.write(text)
+            paths.append(path)
+            expected.append(cusip)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f'SC 13D corpus: {files:,} files, {size / 2**20:.1f} MiB')
+
+        def legacy():
+            results = []
+            for path in paths:
+                with SecSubmission.open(path) as submission:
+                    results.append(parser._parse_submission(path, submission))
+            return results
+
+        seconds, legacy_results = _measure(legacy, repeat)
+        print(f'{"full split + window regex":<28} {seconds / files * 1000:>10.3f} ms/file')
+        seconds, streamed_results = _measure(lambda: [parser._parse(path) for path in paths], repeat)
+        print(f'{"streaming scanner":<28} {seconds / files * 1000:>10.3f} ms/file')
+    assert [r[2] for r in streamed_results] == expected, 'scanner missed CUSIPs'
+    assert [r[1:] for r in legacy_results] == [r[1:] for r in streamed_results], 'parsers disagree'
+
+
+def synthetic_cusips(rows: int, seed: int = 18) -> pd.Series:
+    """13F-like CUSIP column: mostly valid, some lower case, spaced, zero padded or with a wrong check digit."""
+    rng = np.random.default_rng(seed)
+    issuers = [f'{n:04d}{rng.choice(list("0123456789ABCDEFGHJK"))}{rng.integers(10)}' for n in rng.integers(0, 10_000, 5_000)]
+    pool = []
+    for issuer in issuers:
+        cusip8 = f'{issuer}{rng.integers(10, 100)}'
+        pool.append(f'{cusip8}{cusip_check_digit(cusip8)}')
+    cusips = np.array(pool, dtype=object)[rng.integers(0, len(pool), rows)]
+    noise = rng.random(rows)
+    cusips[noise < 0.02] = [c.lower() for c in cusips[noise < 0.02]]
+    spaced = (noise >= 0.02) & (noise < 0.03)
+    cusips[spaced] = [f'{c[:6]} {c[6:8]} {c[8]}' for c in cusips[spaced]]
+    padded = (noise >= 0.03) & (noise < 0.035)
+    cusips[padded] = ['000' + c for c in cusips[padded]]
+    wrong = (noise >= 0.035) & (noise < 0.04)
+    cusips[wrong] = [c[:8] + str((int(c[8]) + 1) % 10) for c in cusips[wrong]]
+    return pd.Series(cusips, dtype='str')
+
+
+def benchmark_cusip_identifiers(rows: int = 3_000_000, repeat: int = 3) -> None:
+    """Per-row Python validation versus the vectorized identifiers module on a CUSIP column."""
+    cusips = synthetic_cusips(rows)
+    print(f'CUSIP column: {rows:,} rows')
+    sample = cusips[:min(rows, 200_000)]
+    seconds, per_row = _measure(lambda: [is_valid_cusip(''.join(c.split()).upper()) for c in sample], 1)
+    print(f'{"per-row is_valid_cusip":<28} {seconds * 1000 * rows / len(sample):>10.1f} ms (extrapolated)')
+    seconds, vectorized = _measure(lambda: valid_cusips(cusips), repeat)
+    print(f'{"valid_cusips":<28} {seconds * 1000:>10.1f} ms {rows / seconds:>14,.0f} rows/s')
+    seconds, _ = _measure(lambda: cusip_identifiers(cusips), repeat)
+    print(f'{"cusip_identifiers":<28} {seconds * 1000:>10.1f} ms {rows / seconds:>14,.0f} rows/s')
+    # the per-row check only strips whitespace and case, so it disagrees on the zero padded rows alone
+    unpadded = ~sample.str.startswith('000').to_numpy()
+    assert (np.array(per_row)[unpadded] == vectorized[:len(sample)][unpadded]).all(), 'validators disagree'
+
+
+NAME_WORDS = ['Acme', 'Apex', 'Atlantic', 'Bio', 'Capital', 'Cedar', 'Coastal', 'Digital', 'Energy', 'First', 'Global',
+              'Harbor', 'Health', 'Summit', 'Midwest', 'National', 'Northern', 'Pacific', 'Pharma', 'Pinnacle',
+              'Realty', 'Resources', 'Systems', 'Therapeutics', 'Trust', 'United', 'Valley', 'Vertex', 'Western']
+LEGAL_FORMS = ['Inc', 'Corp', 'Co', 'Holdings Inc', 'Group Inc', 'Ltd', 'PLC']
+
+
+def synthetic_company_names(companies: int, holdings: int, seed: int = 20) -> tuple[list[str], list[str], list[int]]:
+    """EDGAR-style reference names, N-PORT-style holding names (restyled, some misspelt) and the name each one is."""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < companies:
+        words = rng.sample(NAME_WORDS, rng.randint(1, 3)) + [f'{rng.choice("BCDFGKLMPRSTV")}{rng.randint(1, 999)}']
+        names.add(' '.join(words).upper() + ' ' + rng.choice(LEGAL_FORMS).upper())
+    names = sorted(names)
+    queries, expected = [], rng.choices(range(len(names)), k=holdings)
+    for index in expected:
+        words = names[index].title().split()
+        if rng.random() < 0.3:
+            words[-1] = rng.choice(LEGAL_FORMS)
+        if rng.random() < 0.3:
+            i = rng.randrange(len(words[0]))
+            words[0] = words[0][:i] + words[0][i + 1:]
+        queries.append(' '.join(words) + ('/The' if rng.random() < 0.1 else ''))
+    return names, queries, expected
+
+
+def benchmark_nport_name_match(holdings: int = 3_500, repeat: int = 3) -> None:
+    """Blocked n-gram name matching of N-PORT holdings against an EDGAR-sized company list."""
+    names, queries, expected = synthetic_company_names(10_000, holdings)
+    print(f'{holdings:,} holdings against {len(names):,} company names')
+    seconds, matcher = _measure(lambda: NameMatcher(names), repeat)
+    print(f'{"NameMatcher index":<28} {seconds * 1000:>10.1f} ms')
+    seconds, (best, _) = _measure(lambda: matcher.match(queries), repeat)
+    print(f'{"NameMatcher.match":<28} {seconds * 1000:>10.1f} ms {holdings / seconds:>14,.0f} names/s')
+    matched = best >= 0
+    print(f'{"matched":<28} {matched.mean():>10.1%}')
+    print(f'{"correct when matched":<28} {(best[matched] == np.array(expected)[matched]).mean():>10.1%}')
+
+
+NPORT_HOLDING = """      <invstOrSec>
+        <name>Issuer {i} Inc</name>
+        <lei>{lei}</lei>
+        <title>ISSUER {i}</title>
+        <cusip>{cusip}</cusip>
+        <identifiers>
+          <isin value="US{cusip}0"/>
+        </identifiers>
+        <balance>{balance}.00000000</balance>
+        <units>NS</units>
+        <curCd>USD</curCd>
+        <valUSD>{balance}5.86000000</valUSD>
+        <pctVal>0.003510557808</pctVal>
+        <payoffProfile>Long</payoffProfile>
+        <assetCat>EC</assetCat>
+        <issuerCat>CORP</issuerCat>
+        <invCountry>US</invCountry>
+        <isRestrictedSec>N</isRestrictedSec>
+        <fairValLevel>1</fairValLevel>
+        <securityLending>
+          <isCashCollateral>N</isCashCollateral>
+          <isNonCashCollateral>N</isNonCashCollateral>
+          <isLoanByFund>N</isLoanByFund>
+        </securityLending>
+      </invstOrSec>
+"""
+
+
+def write_synthetic_nport(path: str, holdings: int) -> None:
+    """An NPORT-P XML file with `holdings` invstOrSec entries shaped like vti_nport.xml, written in pieces."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?><edgarSubmission xmlns="http://www.sec.gov/edgar/nport" '
+                'xmlns:com="http://www.sec.gov/edgar/common">\n  <headerData><submissionType>NPORT-P</submissionType>'
+                '</headerData>\n  <formData>\n    <invstOrSecs>\n')
+        for i in range(holdings):
+            f.write(NPORT_HOLDING.format(i=i, lei='N/A' if i % 5 == 0 else f'{i:020d}', cusip=f'{i:09d}',
+                                         balance=i * 37 % 10_000_000))
+        f.write('    </invstOrSecs>\n  </formData>\n</edgarSubmission>\n')
+
+
+def benchmark_nport_stream(holdings: int = 200_000, repeat: int = 3) -> None:
+    """Whole-tree ET.parse + findall (the old parse_nport_xml) versus the streaming lxml iterparse readers.
+
+    The memory column is what tracemalloc sees: the Python objects built while
+    parsing. lxml's own tree lives outside it, but is cleared per holding.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'nport.xml')
+        write_synthetic_nport(path, holdings)
+        size = os.path.getsize(path)
+        print(f'N-PORT: {holdings:,} holdings, {size / 2**20:.1f} MiB')
+
+        def tree():
+            return ET.parse(path).getroot().findall('.//{http://www.sec.gov/edgar/nport}invstOrSec')
+
+        def streamed():
+            return collections.deque(iter_nport_holdings(path), maxlen=0)
+
+        def batched():
+            return collections.deque(iter_nport_batches(path), maxlen=0)
+
+        for name, fn in (('ET.parse + findall', tree), ('iter_nport_holdings', streamed),
+                         ('iter_nport_batches', batched)):
+            seconds, _ = _measure(fn, repeat)
+            _report(name, holdings, seconds, _peak_memory(fn))
+            print(f'{"":<28} {size / 2**20 / seconds:>10.1f} MiB/s')
+        assert sum(batch.num_rows for batch in iter_nport_batches(path)) == holdings, 'holdings lost'
+
+
+TEN_K_ITEMS = [('1.', 'Business'), ('1A.', 'Risk Factors'), ('1B.', 'Unresolved Staff Comments'), ('2.', 'Properties'),
+               ('3.', 'Legal Proceedings'), ('7.', "Management's Discussion and Analysis"),
+               ('7A.', 'Quantitative and Qualitative Disclosures About Market Risk'),
+               ('8.', 'Financial Statements and Supplementary Data'), ('10.', 'Directors and Executive Officers'),
+               ('11.', 'Executive Compensation'), ('15.', 'Exhibits and Financial Statement Schedules')]
+
+
+def synthetic_10k_filing(rng: random.Random, paragraphs: int = 60) -> str:
+    """A 10-K submission in the inline-XBRL style: a linked table of contents, then each item's styled HTML body."""
+    toc = ''.join(f'<tr><td><a href="#i{n}">Item&#160;{item}</a></td><td>{title}</td></tr>'
+                  for n, (item, title) in enumerate(TEN_K_ITEMS))
+    body = []
+    for n, (item, title) in enumerate(TEN_K_ITEMS):
+        body.append(f'<div id="i{n}" style="page-break-before:always"><p style="font-weight:bold">'
+                    f'<span style="font-family:Times">Item&#160;{item}</span><span>&#160;{title}</span></p></div>')
+        for i in range(rng.randint(paragraphs // 2, paragraphs)):
+            body.append(f'<p style="text-align:justify;margin:0 0 8pt"><span style="font-size:10pt">The Company '
+                        f'<ix:nonNumeric name="dei:Text{i}">reported</ix:nonNumeric> revenue of '
+                        f'$<span>{rng.randint(1, 999)}.{rng.randint(0, 9)}</span>&#160;million in fiscal {2000 + i % 24}, '
+                        f'reflecting demand, pricing &amp; mix across segments.</span></p>')
+            if i % 15 == 0:
+                body.append('<table><tr><td>Revenue</td><td>&#160;</td><td>$</td><td>1,234</td></tr>'
+                            '<tr><td>Cost of sales</td><td>&#160;</td><td>$</td><td>(567)</td></tr></table>'
+                            '<!-- page break -->')
+    html = (f'<html><head><style>p {{margin:0}}</style></head><body><table>{toc}</table>{"".join(body)}'
+            '</body></html>')
+    return f'<SEC-DOCUMENT>\n<DOCUMENT>\n<TYPE>10-K\n<TEXT>\n{html}\n</TEXT>\n</DOCUMENT>\n</SEC-DOCUMENT>\n'
+
+
+def benchmark_10k_sections(filings: int = 20, repeat: int = 3) -> None:
+    """DataFrame + BeautifulSoup section extraction versus the one-pass regex + streaming lxml path, per 10-K."""
+    extractor = Form10kExtractor()
+    rng = random.Random(23)
+    docs = [extractor.extract_10_k(synthetic_10k_filing(rng, paragraphs=600)) for _ in range(filings)]
+    print(f'10-K corpus: {filings:,} filings, {sum(map(len, docs)) / 2**20:.1f} M chars')
+    seconds, legacy = _measure(lambda: [extractor.extract_section_text(doc) for doc in docs], repeat)
+    print(f'{"DataFrame + BeautifulSoup":<28} {seconds / filings * 1000:>10.1f} ms/filing {filings / seconds:>10.1f} filings/s')
+    seconds, fast = _measure(lambda: [extractor.extract_sections(doc) for doc in docs], repeat)
+    print(f'{"regex pass + lxml target":<28} {seconds / filings * 1000:>10.1f} ms/filing {filings / seconds:>10.1f} filings/s')
+    assert all(len(sections) == len(SECTIONS) for sections in fast), 'sections missed'
+    assert legacy == fast, 'extractors disagree'
+
+
+def synthetic_chunks(chunks: int, topics: int = 200, seed: int = 25) -> list[dict]:
+    """Chunk records whose text draws most words from one of `topics` vocabularies, spread over 500 filers."""
+    rng = random.Random(seed)
+    common = [f'w{i}' for i in range(2_000)]
+    vocabularies = [[f't{topic}w{i}' for i in range(50)] for topic in range(topics)]
+    records = []
+    for i in range(chunks):
+        vocabulary = vocabularies[rng.randrange(topics)]
+        words = rng.choices(vocabulary, k=30) + rng.choices(common, k=30)
+        rng.shuffle(words)
+        cik = 1_000 + i % 500
+        records.append({'id': f'{cik}-item7-{i}', 'accession': str(cik), 'item': 'item7', 'offset': i, 'cik': str(cik),
+                        'ticker': f'T{cik}', 'date': f'{2015 + i % 10}-03-01', 'text': ' '.join(words)})
+    return records
+
+
+def benchmark_vector_search(chunks: int = 100_000, repeat: int = 3, queries: int = 100, k: int = 10) -> None:
+    """Exact blocked-matmul search versus IVF probing over a memory-mapped index, with recall@k of the IVF."""
+    records = synthetic_chunks(chunks)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        index = VectorIndex.build(records, directory, HashingEmbedder())
+        print(f'{"build (embed + write)":<28} {time.perf_counter() - start:>10.2f} s {chunks:,} chunks')
+        start = time.perf_counter()
+        index.build_ivf()
+        print(f'{"build_ivf":<28} {time.perf_counter() - start:>10.2f} s {len(index.centroids):,} lists')
+        rng = np.random.default_rng(25)
+        vectors = np.asarray(index.vectors[rng.choice(chunks, queries, replace=False)])
+        seconds, exact = _measure(lambda: index.search(vectors, k), repeat)
+        print(f'{"exact":<28} {seconds / queries * 1000:>10.2f} ms/query')
+        truth = exact.groupby('query')['id'].agg(set)
+        for nprobe in (4, 16, 64):
+            seconds, approximate = _measure(lambda: index.search(vectors, k, nprobe=nprobe), repeat)
+            found = approximate.groupby('query')['id'].agg(set)
+            recall = np.mean([len(truth[q] & found.get(q, set())) / len(truth[q]) for q in truth.index])
+            print(f'{f"ivf nprobe={nprobe}":<28} {seconds / queries * 1000:>10.2f} ms/query {recall:>10.3f} recall@{k}')
+        seconds, filtered = _measure(lambda: index.search(vectors, k, cik=list(range(1_000, 1_050)),
+                                                          date_from='2020-01-01'), repeat)
+        print(f'{"exact, cik + date filter":<28} {seconds / queries * 1000:>10.2f} ms/query')
+        assert filtered['date'].ge('2020-01-01').all() and filtered['cik'].astype(int).lt(1_050).all(), 'filter leaked'
+
+
+BENCHMARKS = {
+    '13f-info-table': benchmark_13f_info_table,
+    'cusip-scan': benchmark_cusip_scan,
+    'cusip-identifiers': benchmark_cusip_identifiers,
+    'nport-name-match': benchmark_nport_name_match,
+    'nport-stream': benchmark_nport_stream,
+    '10k-sections': benchmark_10k_sections,
+    'vector-search': benchmark_vector_search,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark SEC parsing paths on synthetic inputs')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--size', type=int, help='rows or files to generate; defaults per benchmark')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    benchmark = BENCHMARKS[args.benchmark]
+    if args.size is None:
+        benchmark(repeat=args.repeat)
+    else:
+        benchmark(args.size, repeat=args.repeat)
@@ -1,12 +1,94 @@
 import csv
+import io
+import numpy as np
 import pandas as pd
 import csv
 import re
 import os
+import time
+import zlib
 from collections import *
+from typing import Iterable
 from glob import glob
 from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
+from .filing_store import FilingStore
+from .identifiers import cusip_identifiers, is_valid_cusip
+from .sgml_submission import SecSubmission
+
+# target bytes of filings per pool task; small filings are grouped, large ones go alone
+BATCH_BYTES = 8 * 2**20
+
+
+def pool_size(n_tasks: int, max_workers: int | None = None) -> int:
+    """Worker count for `n_tasks`: the usable cores, capped by the task count and `max_workers`."""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    return max(1, min(cores, n_tasks, max_workers or cores))
+
+
+def byte_batches(files: list, batch_bytes: int = BATCH_BYTES, sizes: Iterable[int] | None = None) -> list[list]:
+    """Split `files`, in order, into consecutive batches of roughly `batch_bytes` each.
+
+    Sizes are read from disk unless given in `sizes`, one per item of `files`.
+    """
+    batches, batch, size = [], [], 0
+    sizes = map(os.path.getsize, files) if sizes is None else sizes
+    for file, file_size in zip(files, sizes):
+        batch.append(file)
+        size += file_size
+        if size >= batch_bytes:
+            batches.append(batch)
+            batch, size = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+# per-worker state, set once by _init_worker instead of being pickled with every task
+_worker_parser = None
+_worker_ciks = None
+_worker_shm = None
+
+
+def _init_worker(ciks_shm_name: str | None, n_ciks: int) -> None:
+    global _worker_parser, _worker_ciks, _worker_shm
+    _worker_parser = CikCusipParser()
+    if ciks_shm_name is not None:
+        _worker_shm = SharedMemory(name=ciks_shm_name)
+        _worker_ciks = np.ndarray((n_ciks,), dtype=np.int64, buffer=_worker_shm.buf)
+
+
+def _keep(row: list) -> bool:
+    return _worker_ciks is None or _worker_parser.cik_in(row[1], _worker_ciks)
+
+
+def _parse_batch(files: list[str]) -> tuple[list[list], int, int, int, float]:
+    """Parse one batch in a worker; returns its rows and (pid, files, bytes, seconds) for the metrics."""
+    start = time.perf_counter()
+    rows, size = [], 0
+    for file in files:
+        size += os.path.getsize(file)
+        row = _worker_parser._parse(file)
+        if _keep(row):
+            rows.append(row)
+    return rows, os.getpid(), len(files), size, time.perf_counter() - start
+
+
+def _parse_store_batch(frames: list[tuple[str, str, int, int, int]]) -> tuple[list[list], int, int, int, float]:
+    """`_parse_batch` for FilingStore frames given as (accession, segment file, offset, length, size)."""
+    start = time.perf_counter()
+    rows, size = [], 0
+    for accession, segment_file, offset, length, frame_size in frames:
+        size += frame_size
+        with open(segment_file, 'rb') as f:
+            f.seek(offset)
+            cik, cusip = _worker_parser.scan_lines(io.BytesIO(zlib.decompress(f.read(length))))
+        row = [accession, cik, cusip]
+        if _keep(row):
+            rows.append(row)
+    return rows, os.getpid(), len(frames), size, time.perf_counter() - start
+
 
 class CikCusipParser:
   def __init__(self) -> None:
@@ -19,21 +101,84 @@ class CikCusipParser:
 
   w = re.compile('\w+')
 
+  # byte-level equivalents of pat / w for the streaming scanner
+  cusip_pat = re.compile(pat.pattern.encode())
+  word_pat = re.compile(rb'\w+')
+  # lines kept before / read after a line mentioning CUSIP, as in _parse_submission
+  WINDOW_BEFORE = 3
+  WINDOW_AFTER = 2
+  # CUSIP windows to try for a check-digit-valid candidate before settling for the first match
+  MAX_WINDOWS = 8
+
   def _parse(self, file):
-      with open(file, 'r') as f:
-          lines = f.readlines()
+      with open(file, 'rb') as f:
+          cik, cusip = self.scan_lines(f)
+      return [file, cik, cusip]
+
+  def scan_lines(self, lines: Iterable[bytes]) -> tuple[str | None, str | None]:
+      """Single pass over a submission's lines for the subject-company CIK and the filing's CUSIP.
 
-      record = 0
+      The CIK is read from SUBJECT COMPANY in the SEC header. After that only
+      a rolling window of `WINDOW_BEFORE` lines is kept; each line mentioning
+      CUSIP is joined with its neighbours and searched with `cusip_pat`, and
+      the `WINDOW_AFTER` lines read ahead for it are still scanned for CUSIP
+      labels of their own. The scan stops at the first candidate whose check digit is valid. Otherwise
+      the first candidate found is returned, matching `_parse_submission`,
+      once `MAX_WINDOWS` windows have been tried or the file ends.
+      """
+      lines = iter(lines)
       cik = None
+      in_subject = False
       for line in lines:
-          if 'SUBJECT COMPANY' in line:
-              record = 1
-          if 'CENTRAL INDEX KEY' in line and record == 1:
-              cik = line.split('\t\t\t')[-1].strip()
+          if line.startswith(b'</SEC-HEADER>') or line.startswith(b'<DOCUMENT>'):
               break
+          if line.startswith(b'SUBJECT COMPANY:'):
+              in_subject = True
+          elif in_subject and cik is None and b'CENTRAL INDEX KEY:' in line:
+              cik = line.split(b':', 1)[1].strip().decode('latin1')
+          elif line[:1] not in (b'\t', b'\n', b'\r', b''):
+              in_subject = False
+
+      fallback = None
+      windows = 0
+      before = deque(maxlen=self.WINDOW_BEFORE + 1)
+      # lines read ahead as a window's context, still to be scanned as lines of their own
+      pending = deque()
+      while True:
+          line = pending.popleft() if pending else next(lines, None)
+          if line is None:
+              break
+          before.append(line)
+          if b'CUSIP' not in line:
+              continue
+          after = list(pending)[:self.WINDOW_AFTER]
+          while len(after) < self.WINDOW_AFTER:
+              following = next(lines, None)
+              if following is None:
+                  break
+              after.append(following)
+              pending.append(following)
+          window = [*before, *after]
+          for match in self.cusip_pat.finditer(b' '.join(window)):
+              candidate = b''.join(self.word_pat.findall(match.group())).decode('latin1')
+              if is_valid_cusip(candidate):
+                  return cik, candidate
+              if fallback is None:
+                  fallback = candidate
+          windows += 1
+          if fallback is not None and windows >= self.MAX_WINDOWS:
+              break
+      return cik, fallback
+
+  def _parse_submission(self, file, submission: SecSubmission):
+      subject_company = submission.header.get('SUBJECT COMPANY')
+      if isinstance(subject_company, list):
+          subject_company = subject_company[0]
+      cik = subject_company.get('COMPANY DATA', {}).get('CENTRAL INDEX KEY') if subject_company else None
+
+      lines = [line for document in submission.documents for line in document.text().splitlines(keepends=True)]
 
       cusips = []
-      record = 0
       for index,line in enumerate(lines):
           if 'CUSIP' in line:
               lines_to_search = lines[index-3:index+3]
@@ -41,18 +186,6 @@ class CikCusipParser:
               if found:
                   cusips.append(found[0].strip().strip('<>'))
                   break
-
-          # if '<DOCUMENT>' in line:  # lines are after the document preamble
-          #     record = 1
-          # if record == 1:
-          #     if 'IRS' not in line and 'I.R.S' not in line:
-                  # fd = pat.findall(line)
-                  # if fd:
-                  #     cusip = fd[0].strip().strip('<>')
-                  #     if args.debug:
-                  #         print('INFO: added --- ', line, " --- extracted [",
-                  #               cusip, "]")
-                  #     cusips.append(cusip)
       if len(cusips) == 0:
           cusip = None
       else:
@@ -61,33 +194,114 @@ class CikCusipParser:
       return [file, cik, cusip]
 
 
-  def parse_cusip(self, form_name: str, input_form_dir: str, output_dir: str = "../../data/sec_data"):
+  @staticmethod
+  def cik_in(cik: str | None, ciks: np.ndarray) -> bool:
+      # ciks is sorted, so membership is a binary search
+      if cik is None or not cik.strip().isdigit():
+          return False
+      value = int(cik)
+      index = np.searchsorted(ciks, value)
+      return index < len(ciks) and ciks[index] == value
+
+  def parse_cusip(self, form_name: str, input_form_dir: str, output_dir: str = "../../data/sec_data",
+                  max_workers: int | None = None, batch_bytes: int = BATCH_BYTES, ciks: Iterable[int] | None = None):
+      """Parse every filing under `input_form_dir` into `{output_dir}/{form_name}.csv`.
+
+      Files are grouped into batches of about `batch_bytes` and spread over
+      `pool_size` workers. Rows are written in input order as batches finish.
+      If `ciks` is given, only filings whose subject company is in it are
+      kept. The sorted CIK table sits in shared memory that every worker
+      attaches to once.
+      """
       output_csv_file = f"{output_dir}/{form_name}.csv"
-      if os.path.exists(input_form_dir):
+      if os.path.exists(output_csv_file):
           print("Parsed file already exists for form", form_name)
           return
-      
-      with Pool(30) as p:
-          with open(output_csv_file, 'w') as w:
-              wr = csv.writer(w)
-              for res in p.imap(self._parse, glob(input_form_dir + '/*/*'), chunksize=100):
-                  wr.writerow(res)
-
-  def process_cusips_from_files(self, files: list[str], output_dir: str = "../../data/sec_data"):
-    output_csv_file = f"{output_dir}/{self.OUTPUT_CSV_FILE}"
-    df = [pd.read_csv(f, names=['f', 'cik', 'cusip']).dropna() for f in files]
-    df = pd.concat(df)
 
-    df['leng'] = df.cusip.map(len)
+      files = sorted(glob(input_form_dir + '/*/*'))
+      if not files:
+          print(f'No files found in {input_form_dir}')
+          return
+      self._run_batches(_parse_batch, byte_batches(files, batch_bytes), output_csv_file, max_workers, ciks)
+
+  def _run_batches(self, parse_batch, batches: list[list], output_csv_file: str, max_workers: int | None = None,
+                   ciks: Iterable[int] | None = None):
+      """Run `parse_batch` over `batches` in a `pool_size` pool, writing rows in batch order and reporting metrics."""
+      workers = pool_size(len(batches), max_workers)
+      shm = None
+      initargs = (None, 0)
+      if ciks is not None:
+          table = np.unique(np.fromiter((int(c) for c in ciks), dtype=np.int64))
+          shm = SharedMemory(create=True, size=max(table.nbytes, 1))
+          np.ndarray(table.shape, dtype=np.int64, buffer=shm.buf)[:] = table
+          initargs = (shm.name, len(table))
+
+      metrics = defaultdict(lambda: [0, 0, 0.0])
+      start = time.perf_counter()
+      try:
+          with Pool(workers, initializer=_init_worker, initargs=initargs) as p:
+              with open(output_csv_file, 'w') as w:
+                  wr = csv.writer(w)
+                  # imap hands batches back in submission order, so output order is deterministic
+                  for rows, pid, n_files, n_bytes, seconds in p.imap(parse_batch, batches):
+                      wr.writerows(rows)
+                      worker = metrics[pid]
+                      worker[0] += n_files
+                      worker[1] += n_bytes
+                      worker[2] += seconds
+      finally:
+          if shm is not None:
+              shm.close()
+              shm.unlink()
+      self.report_metrics(metrics, time.perf_counter() - start, len(batches))
+
+  @staticmethod
+  def report_metrics(metrics: dict, elapsed: float, n_batches: int):
+      total_files = sum(m[0] for m in metrics.values())
+      total_bytes = sum(m[1] for m in metrics.values())
+      print(f'===== Parsed {total_files} files ({total_bytes / 2**20:.1f} MiB) in {n_batches} batches '
+            f'on {len(metrics)} workers, {elapsed:.2f}s ====')
+      for pid, (n_files, n_bytes, seconds) in sorted(metrics.items()):
+          rate = n_bytes / 2**20 / seconds if seconds else 0.0
+          print(f'worker {pid}: {n_files} files, {n_bytes / 2**20:.1f} MiB, {seconds:.2f}s busy, {rate:.1f} MiB/s')
 
-    df = df[(df.leng == 6) | (df.leng == 8) | (df.leng == 9)]
+  def parse_cusip_from_store(self, store: FilingStore, form_name: str, forms: list[str], output_dir: str = "../../data/sec_data",
+                             max_workers: int | None = None, batch_bytes: int = BATCH_BYTES,
+                             ciks: Iterable[int] | None = None):
+      """`parse_cusip` over the `forms` filings of a FilingStore.
 
-    df['cusip6'] = df.cusip.str[:6]
+      Batches are cut from the catalog by uncompressed size, in on-disk order,
+      and carry only frame locations; workers read and decompress the frames.
+      """
+      output_csv_file = f"{output_dir}/{form_name}.csv"
+      catalog = store.query(forms=forms)
+      if catalog.empty:
+          print(f'No {forms} filings in the store')
+          return
+      frames = [(record.accession, store._segment_file(record.segment), record.offset, record.length, record.size)
+                for record in catalog.itertuples(index=False)]
+      batches = byte_batches(frames, batch_bytes, sizes=catalog['size'])
+      self._run_batches(_parse_store_batch, batches, output_csv_file, max_workers, ciks)
+
+  def process_cusips_from_files(self, files: list[str], output_dir: str = "../../data/sec_data", valid_only: bool = False):
+    """Aggregate parsed (file, cik, cusip) rows into cusip6/cusip8 lists per cik.
 
-    df = df[df.cusip6 != '000000']
-    df = df[df.cusip6 != '0001pt']
+    CUSIPs are normalized (case, separators, padding) and check-digit validated
+    in one vectorized pass. With `valid_only`, 9-character CUSIPs whose check
+    digit fails are dropped; by default they are kept, as before. 6 and 8
+    character prefixes carry no check digit and are always kept.
+    """
+    output_csv_file = f"{output_dir}/{self.OUTPUT_CSV_FILE}"
+    df = [pd.read_csv(f, names=['f', 'cik', 'cusip'], dtype={'cusip': str}).dropna() for f in files]
+    df = pd.concat(df)
 
-    df['cusip8'] = df.cusip.str[:8]
+    identifiers = cusip_identifiers(df.cusip.to_numpy())
+    length = identifiers.cusip.str.len().to_numpy()
+    df['cusip'] = identifiers.cusip.to_numpy()
+    df['cusip6'] = identifiers.cusip.str[:6].to_numpy()
+    df['cusip8'] = identifiers.cusip8.to_numpy()
+    full = identifiers.valid.to_numpy() if valid_only else length == 9
+    df = df[(full | (length == 6) | (length == 8)) & (df.cusip6 != '000000') & (df.cusip6 != '0001PT')]
 
     df.cik = pd.to_numeric(df.cik)
     # Group by 'cik' and aggregate 'cusip6' into a list
@@ -0,0 +1,136 @@
+import json
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+
+COMPANY_FACTS_BULK_URL = "https://www.sec.gov/Archives/edgar/daily-index/xbrl/companyfacts.zip"
+# fields of each fact under facts.<taxonomy>.<concept>.units.<unit>
+FACT_FIELDS = ["start", "end", "val", "accn", "fy", "fp", "form", "filed", "frame"]
+CATEGORY_COLUMNS = ["taxonomy", "concept", "unit", "fp", "form"]
+ANNUAL_FORMS = ["10-K", "10-K/A", "20-F", "20-F/A", "40-F", "40-F/A"]
+
+
+def flatten_company_facts(company_facts: dict) -> pd.DataFrame:
+    """Flatten one companyfacts JSON document into one row per (concept, unit, fact)."""
+    columns = {field: [] for field in FACT_FIELDS}
+    keys = {"taxonomy": [], "concept": [], "unit": []}
+    counts = []
+    for taxonomy, concepts in company_facts.get("facts", {}).items():
+        for concept, detail in concepts.items():
+            for unit, facts in detail.get("units", {}).items():
+                for field in FACT_FIELDS:
+                    columns[field].extend([fact.get(field) for fact in facts])
+                keys["taxonomy"].append(taxonomy)
+                keys["concept"].append(concept)
+                keys["unit"].append(unit)
+                counts.append(len(facts))
+
+    df = pd.DataFrame({
+        "cik": np.full(sum(counts), int(company_facts["cik"]), dtype=np.int64),
+        **{key: np.repeat(np.array(values, dtype=object), counts) for key, values in keys.items()},
+        **columns,
+    })
+    return _normalize(df)
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    for col in ["start", "end", "filed"]:
+        df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
+    df["val"] = pd.to_numeric(df["val"], errors="coerce").astype("float64")
+    df["fy"] = pd.to_numeric(df["fy"], errors="coerce").astype("Int16")
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    return df
+
+
+class CompanyFactsStore:
+    """Columnar store of XBRL company facts keyed by (cik, concept, unit, period end, form).
+
+    Facts are kept in a single Parquet file sorted by concept and CIK, so a
+    query for a handful of concepts across every company only reads the
+    matching row groups and is answered with vectorized filters.
+    """
+    FACTS_FILENAME = "company_facts.parquet"
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.facts_file = f"{directory}/{self.FACTS_FILENAME}"
+        os.makedirs(directory, exist_ok=True)
+
+    def ingest(self, frames: list[pd.DataFrame]) -> int:
+        """Add flattened company facts, replacing any facts already stored for the same CIKs."""
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return 0
+        new_facts = pd.concat(frames, ignore_index=True)
+        if os.path.exists(self.facts_file):
+            existing = pd.read_parquet(self.facts_file)
+            existing = existing[~existing["cik"].isin(new_facts["cik"].unique())]
+            new_facts = pd.concat([existing, new_facts], ignore_index=True)
+        # concat of differing categoricals falls back to object
+        for col in CATEGORY_COLUMNS:
+            new_facts[col] = new_facts[col].astype("category")
+        new_facts = new_facts.sort_values(["concept", "cik", "unit", "end", "filed"], ignore_index=True)
+        tmp_file = f"{self.facts_file}.tmp"
+        new_facts.to_parquet(tmp_file, index=False, row_group_size=250_000)
+        os.replace(tmp_file, self.facts_file)
+        return len(new_facts)
+
+    def ingest_zip(self, zip_file: str, ciks: list | None = None) -> int:
+        """Ingest the SEC bulk `companyfacts.zip`, optionally only the members for `ciks`.
+
+        The full archive covers every filer; without `ciks` it needs memory for all of their facts.
+        """
+        wanted = {f"CIK{str(int(cik)).rjust(10, '0')}.json" for cik in ciks} if ciks is not None else None
+        frames = []
+        with zipfile.ZipFile(zip_file) as archive:
+            for name in archive.namelist():
+                if wanted is not None and name not in wanted:
+                    continue
+                with archive.open(name) as f:
+                    company_facts = json.load(f)
+                if "cik" in company_facts:
+                    frames.append(flatten_company_facts(company_facts))
+        return self.ingest(frames)
+
+    def query(self, concepts: list[str] | None = None, ciks: list | None = None, units: list[str] | None = None,
+              forms: list[str] | None = None, fy_range: tuple[int, int] | None = None,
+              end_range: tuple[str, str] | None = None, taxonomy: str | None = None) -> pd.DataFrame:
+        """Facts matching every given filter. `fy_range` and `end_range` are inclusive."""
+        if not os.path.exists(self.facts_file):
+            return pd.DataFrame(columns=["cik", "taxonomy", "concept", "unit", *FACT_FIELDS])
+        filters = []
+        if concepts is not None:
+            filters.append(("concept", "in", list(concepts)))
+        if ciks is not None:
+            filters.append(("cik", "in", [int(cik) for cik in ciks]))
+        if units is not None:
+            filters.append(("unit", "in", list(units)))
+        if forms is not None:
+            filters.append(("form", "in", list(forms)))
+        if taxonomy is not None:
+            filters.append(("taxonomy", "==", taxonomy))
+        df = pd.read_parquet(self.facts_file, filters=filters or None)
+        if fy_range is not None:
+            df = df[df["fy"].between(*fy_range)]
+        if end_range is not None:
+            df = df[df["end"].between(pd.Timestamp(end_range[0]), pd.Timestamp(end_range[1]))]
+        return df.reset_index(drop=True)
+
+    def annual_series(self, concept: str, unit: str = "USD", ciks: list | None = None,
+                      years: tuple[int, int] | None = None) -> pd.DataFrame:
+        """Fiscal-year values of `concept` as a (period end year x cik) table.
+
+        The same annual value is restated in later annual reports; the most
+        recently filed value for each period is kept. Duration concepts are
+        limited to periods of roughly one year.
+        """
+        df = self.query(concepts=[concept], ciks=ciks, units=[unit], forms=ANNUAL_FORMS)
+        duration = (df["end"] - df["start"]).dt.days
+        df = df[df["start"].isna() | duration.between(350, 380)]
+        df = df.sort_values("filed").drop_duplicates(subset=["cik", "start", "end"], keep="last")
+        df = df.assign(year=df["end"].dt.year)
+        if years is not None:
+            df = df[df["year"].between(*years)]
+        return df.pivot_table(index="year", columns="cik", values="val", aggfunc="last")
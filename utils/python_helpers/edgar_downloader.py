@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import NotRequired, TypedDict
+from .edgar_http import CircuitOpenError, RequestController
+from .filing_store import FILING_PATH_PATTERN, FilingStore
+
+MANIFEST_FILENAME = "download_manifest.jsonl"
+
+
+class FilingDownload(TypedDict):
+    accession: str
+    url: str
+    file_path: str
+    # set instead of a file path for filings downloaded into a FilingStore
+    cik: NotRequired[str]
+    date_filed: NotRequired[str]
+
+
+class DownloadManifest:
+    """Append-only journal of accession numbers and their download status.
+
+    Every status change is written as one JSON line and flushed, so a crashed run
+    loses at most the line being written. The latest line per accession wins when
+    the journal is replayed.
+    """
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, manifest_file: str) -> None:
+        self.manifest_file = manifest_file
+        self._status: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # partially written last line of a crashed run
+                        continue
+                    self._status[record["accession"]] = record
+        Path(manifest_file).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(manifest_file, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def status(self, accession: str) -> str | None:
+        record = self._status.get(accession)
+        return record["status"] if record else None
+
+    def mark(self, accession: str, status: str, **fields) -> None:
+        record = {"accession": accession, "status": status, **fields}
+        with self._lock:
+            self._status[accession] = record
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def accessions(self, status: str) -> list[str]:
+        return [accession for accession, record in self._status.items() if record["status"] == status]
+
+    def records(self, status: str) -> list[dict]:
+        return [record for record in self._status.values() if record["status"] == status]
+
+    def summary(self) -> dict[str, int]:
+        counts = {self.PENDING: 0, self.DONE: 0, self.FAILED: 0}
+        for record in self._status.values():
+            counts[record["status"]] += 1
+        return counts
+
+    def compact(self) -> None:
+        """Rewrite the journal with a single line per accession."""
+        with self._lock:
+            self._file.close()
+            tmp_file = f"{self.manifest_file}.tmp"
+            with open(tmp_file, "w") as f:
+                for record in self._status.values():
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp_file, self.manifest_file)
+            self._file = open(self.manifest_file, "a")
+
+
+class FilingDownloader:
+    """Downloads filings concurrently through the shared `RequestController`.
+
+    Filings are written to their `file_path`, or into `store` under `form` when one is given.
+    """
+
+    def __init__(self, controller: RequestController, max_workers: int = 8, timeout: int = 60,
+                 store: FilingStore | None = None, form: str | None = None) -> None:
+        self.controller = controller
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.store = store
+        self.form = form
+
+    @staticmethod
+    def _cik_and_date(filing: FilingDownload) -> tuple[str, str]:
+        if filing.get("cik"):
+            return filing["cik"], filing["date_filed"]
+        cik, date_filed, _ = FILING_PATH_PATTERN.search(filing["file_path"]).groups()
+        return cik, date_filed
+
+    def _manifest_fields(self, filing: FilingDownload) -> dict:
+        """Where a filing goes, as recorded in the manifest: its file path, or its store key with an empty path."""
+        if self.store is None:
+            return {"url": filing["url"], "file_path": filing["file_path"]}
+        cik, date_filed = self._cik_and_date(filing)
+        return {"url": filing["url"], "file_path": "", "store_key": filing["accession"], "cik": cik, "date_filed": date_filed}
+
+    def _download(self, filing: FilingDownload) -> None:
+        response = self.controller.get(filing["url"], endpoint="archives", timeout=self.timeout)
+        if self.store is not None:
+            cik, date_filed = self._cik_and_date(filing)
+            self.store.put(filing["accession"], cik, self.form, date_filed, response.content)
+            return
+        # write to a temporary file first so an interrupted write never looks complete
+        tmp_path = f"{filing['file_path']}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, filing["file_path"])
+
+    def download(self, filings: list[FilingDownload], manifest: DownloadManifest) -> dict[str, int]:
+        to_dl = []
+        for filing in filings:
+            status = manifest.status(filing["accession"])
+            if status == DownloadManifest.DONE:
+                continue
+            if status is None:
+                manifest.mark(filing["accession"], DownloadManifest.PENDING, **self._manifest_fields(filing))
+            to_dl.append(filing)
+
+        if self.store is None:
+            for directory in {os.path.dirname(filing["file_path"]) for filing in to_dl}:
+                Path(directory).mkdir(parents=True, exist_ok=True)
+
+        len_ = len(to_dl)
+        print(f"{len(filings) - len_} already downloaded, {len_} to download")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._download, filing): filing for filing in to_dl}
+            for n, future in enumerate(as_completed(futures), start=1):
+                filing = futures[future]
+                try:
+                    future.result()
+                    manifest.mark(filing["accession"], DownloadManifest.DONE, **self._manifest_fields(filing))
+                except CircuitOpenError:
+                    # never attempted, leave it queued for the next run
+                    pass
+                except Exception as e:
+                    print(f"{filing['url']} failed to download: {e}")
+                    manifest.mark(filing["accession"], DownloadManifest.FAILED, **self._manifest_fields(filing), error=str(e))
+                if n % 100 == 0:
+                    print(f"{n} out of {len_}")
+        manifest.compact()
+        self.controller.print_stats()
+        return manifest.summary()
@@ -0,0 +1,281 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# https://www.sec.gov/os/accessing-edgar-data - fair access policy
+SEC_MAX_REQUESTS_PER_SECOND = 10
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request made to sec.gov.
+
+    `capacity` bounds the burst size; the default of one token spaces requests
+    evenly so a run never exceeds `rate` requests in any one second window.
+    """
+
+    def __init__(self, rate: float = SEC_MAX_REQUESTS_PER_SECOND, capacity: float = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(user_agent_header: dict, pool_size: int = 10) -> requests.Session:
+    """Create a keep-alive session whose connection pool is sized for `pool_size` concurrent workers."""
+    session = requests.Session()
+    session.headers.update(user_agent_header)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# sec.gov answers 403 "Request Rate Threshold Exceeded" as well as 429 when a client is going too fast
+THROTTLE_STATUS_CODES = {403, 429, 503}
+RETRY_STATUS_CODES = THROTTLE_STATUS_CODES | {500, 502, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    throttled: int = 0
+    retries: int = 0
+    bytes: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    started: float | None = None
+    finished: float | None = None
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished - self.started) if self.started is not None and self.finished is not None else 0.0
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "mean_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+            "requests_per_second": self.requests / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on the number of requests in flight.
+
+    Each success grows the limit by `1 / limit` (about one slot per window of
+    successful requests); a throttled or retryable failure (429/503, 5xx,
+    connection error) multiplies it by `decrease_factor`, at most once per
+    `decrease_cooldown` seconds so a single burst of failures only counts once.
+    """
+
+    def __init__(self, initial_limit: float = 4, min_limit: float = 1, max_limit: float = 10,
+                 decrease_factor: float = 0.5, decrease_cooldown: float = 1.0) -> None:
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, overloaded: bool = False) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Stops all traffic after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds a single trial request is let through
+    (half-open); its outcome closes the circuit again or re-opens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 60) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(f"Circuit open after {self.failures} consecutive failures")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class RequestController:
+    """Single gateway for every HTTP call made to sec.gov.
+
+    Requests are paced by the shared token bucket, bounded by an AIMD
+    concurrency limit, retried with exponential backoff and full jitter on
+    throttling, server errors and connection errors, and short-circuited once
+    too many consecutive requests fail. Throughput and latency are tracked per
+    endpoint label.
+    """
+
+    def __init__(self, session: requests.Session, rate_limiter: TokenBucket | None = None,
+                 concurrency: AdaptiveConcurrencyLimiter | None = None, circuit_breaker: CircuitBreaker | None = None,
+                 max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 60) -> None:
+        self.session = session
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self._stats_lock = threading.Lock()
+
+    def backoff_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def _record(self, endpoint: str, latency: float, size: int, throttled: bool, success: bool, retry: bool) -> None:
+        with self._stats_lock:
+            stats = self._stats[endpoint]
+            now = time.monotonic()
+            if stats.started is None:
+                stats.started = now - latency
+            stats.finished = now
+            stats.requests += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.bytes += size
+            if success:
+                stats.successes += 1
+            else:
+                stats.failures += 1
+            if throttled:
+                stats.throttled += 1
+            if retry:
+                stats.retries += 1
+
+    def get(self, url: str, endpoint: str | None = None, **kwargs) -> requests.Response:
+        """GET `url`, returning the response for 2xx/3xx (including 304) and raising once retries are exhausted.
+
+        Non-retryable client errors such as 404 are raised immediately as `requests.HTTPError`.
+        """
+        endpoint = endpoint or urlparse(url).netloc
+        for attempt in range(self.max_retries + 1):
+            self.circuit_breaker.before_request()
+            self.rate_limiter.acquire()
+            self.concurrency.acquire()
+            response, error = None, None
+            # anything but a clean answer, including an unexpected exception, shrinks the limit
+            overloaded = True
+            start = time.monotonic()
+            try:
+                try:
+                    response = self.session.get(url, **kwargs)
+                except requests.RequestException as e:
+                    error = e
+                latency = time.monotonic() - start
+                size = 0
+                if response is not None:
+                    # streamed bodies are not read here; count the size the server announced
+                    size = int(response.headers.get("Content-Length", 0)) if kwargs.get("stream") else len(response.content)
+                overloaded = response is None or response.status_code in RETRY_STATUS_CODES
+            finally:
+                # the slot is given back whatever happened, or it would be lost for good
+                self.concurrency.release(overloaded=overloaded)
+            throttled = response is not None and response.status_code in THROTTLE_STATUS_CODES
+
+            if response is not None and response.status_code < 400:
+                self.circuit_breaker.record_success()
+                self._record(endpoint, latency, size, throttled=False, success=True, retry=False)
+                return response
+
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            if not retryable:
+                # the server answered; a 404 says nothing about the health of the connection
+                self.circuit_breaker.record_success()
+                self._record(endpoint, latency, size, throttled=False, success=False, retry=False)
+                response.raise_for_status()
+
+            self.circuit_breaker.record_failure()
+            last_attempt = attempt == self.max_retries
+            self._record(endpoint, latency, size, throttled=throttled, success=False, retry=not last_attempt)
+            if last_attempt:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+            time.sleep(self.backoff_delay(attempt, response.headers.get("Retry-After") if response is not None else None))
+
+    def stats(self) -> dict[str, dict]:
+        with self._stats_lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self._stats.items()}
+
+    def print_stats(self) -> None:
+        for endpoint, stats in self.stats().items():
+            print(f"{endpoint}: {stats['requests']} requests ({stats['requests_per_second']:.2f}/s), "
+                  f"{stats['failures']} failed, {stats['throttled']} throttled, {stats['retries']} retried, "
+                  f"mean latency {stats['mean_latency'] * 1000:.0f}ms, max {stats['max_latency'] * 1000:.0f}ms")
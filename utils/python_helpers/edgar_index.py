@@ -0,0 +1,168 @@
+import csv
+import io
+import os
+import sqlite3
+import pandas as pd
+
+MASTER_INDEX_COLUMNS = ["cik", "company", "form", "date_filed", "filename"]
+
+
+def read_master_index(path: str) -> pd.DataFrame:
+    """Parse an EDGAR `master.idx` (full-index or daily-index) into a DataFrame in one vectorized pass."""
+    with open(path, "rb") as f:
+        data = f.read()
+    # rows start after the dashed line that follows the `CIK|Company Name|...` header
+    separator = data.find(b"\n---")
+    if separator != -1:
+        data = data[data.index(b"\n", separator + 1) + 1:]
+    df = pd.read_csv(
+        io.BytesIO(data),
+        sep="|",
+        names=MASTER_INDEX_COLUMNS,
+        dtype=str,
+        encoding="latin1",
+        quoting=csv.QUOTE_NONE,
+        on_bad_lines="skip",
+    )
+    df = df.dropna(subset=["cik", "form", "date_filed", "filename"])
+    # full-index files use yyyy-mm-dd, older daily-index files use yyyymmdd
+    df["date_filed"] = df["date_filed"].str.replace(r"^(\d{4})(\d{2})(\d{2})$", r"\1-\2-\3", regex=True)
+    df["cik"] = pd.to_numeric(df["cik"], errors="coerce")
+    df = df.dropna(subset=["cik"])
+    df["cik"] = df["cik"].astype("int64")
+    df["accession"] = df["filename"].str.rsplit("/", n=1).str[-1].str.removesuffix(".txt")
+    return df
+
+
+class MasterIndex:
+    """Local, queryable copy of the EDGAR master index.
+
+    Quarter (and daily) index files are parsed once and stored in SQLite,
+    indexed by CIK, form type and filing date, so a new CIK filter or form
+    type is a query rather than a rescan of every `master.idx` line.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS filings (
+                cik INTEGER NOT NULL,
+                company TEXT,
+                form TEXT NOT NULL,
+                date_filed TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                accession TEXT NOT NULL,
+                source TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_filings_filename ON filings (filename);
+            CREATE INDEX IF NOT EXISTS ix_filings_cik ON filings (cik, form, date_filed);
+            CREATE INDEX IF NOT EXISTS ix_filings_form ON filings (form, date_filed);
+            CREATE INDEX IF NOT EXISTS ix_filings_date ON filings (date_filed);
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                rows INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def is_ingested(self, path: str, source: str | None = None) -> bool:
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime FROM sources WHERE source = ?", (source or os.path.basename(path),)).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def ingest(self, path: str, source: str | None = None, force: bool = False) -> int:
+        """Load an index file, replacing any rows previously loaded from the same source.
+
+        Files that have not changed since they were last ingested are skipped. Returns the number of rows loaded.
+        """
+        source = source or os.path.basename(path)
+        if not force and self.is_ingested(path, source):
+            return 0
+        df = read_master_index(path)
+        stat = os.stat(path)
+        with self.conn:
+            self.conn.execute("DELETE FROM filings WHERE source = ?", (source,))
+            return self._insert(df, source, stat.st_size, stat.st_mtime)
+
+    def append(self, df: pd.DataFrame, source: str) -> pd.DataFrame:
+        """Insert rows not already in the index and return the ones that were new."""
+        existing = set()
+        filenames = df["filename"].tolist()
+        for i in range(0, len(filenames), 500):
+            batch = filenames[i:i + 500]
+            existing.update(row[0] for row in self.conn.execute(
+                f"SELECT filename FROM filings WHERE filename IN ({','.join('?' * len(batch))})", batch))
+        new_rows = df[~df["filename"].isin(existing)]
+        with self.conn:
+            self._insert(new_rows, source, None, None)
+        return new_rows
+
+    def _insert(self, df: pd.DataFrame, source: str, size: int | None, mtime: float | None) -> int:
+        rows = zip(df["filename"], df["cik"].tolist(), df["company"], df["form"], df["date_filed"], df["accession"])
+        cursor = self.conn.executemany(
+            "INSERT OR REPLACE INTO filings (filename, cik, company, form, date_filed, accession, source) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((filename, cik, company, form, date_filed, accession, source) for filename, cik, company, form, date_filed, accession in rows),
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sources (source, size, mtime, rows) VALUES (?, ?, ?, ?)",
+            (source, size, mtime, len(df)),
+        )
+        return cursor.rowcount
+
+    def query(self, ciks: list | None = None, forms: list[str] | None = None,
+              date_range: tuple[str | None, str | None] | None = None) -> pd.DataFrame:
+        """Filings matching every given filter; forms match exactly (`10-K` does not match `10-K/A`).
+
+        `date_range` is an inclusive `(start, end)` pair of `yyyy-mm-dd` strings, either of which may be None.
+        """
+        sql = "SELECT f.cik, f.company, f.form, f.date_filed, f.filename, f.accession FROM filings f"
+        clauses = []
+        params = []
+        if ciks is not None:
+            # a temp table keeps large CIK lists clear of SQLite's bound parameter limit
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query_ciks (cik INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM query_ciks")
+            self.conn.executemany("INSERT OR IGNORE INTO query_ciks (cik) VALUES (?)", ((int(cik),) for cik in ciks))
+            sql += " JOIN query_ciks q ON q.cik = f.cik"
+        if forms is not None:
+            forms = [forms] if isinstance(forms, str) else list(forms)
+            clauses.append(f"f.form IN ({','.join('?' * len(forms))})")
+            params.extend(forms)
+        if date_range is not None:
+            start, end = date_range
+            if start is not None:
+                clauses.append("f.date_filed >= ?")
+                params.append(str(start))
+            if end is not None:
+                clauses.append("f.date_filed <= ?")
+                params.append(str(end))
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY f.date_filed, f.cik"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM filings").fetchone()[0]
+
+    def max_date_filed(self) -> str | None:
+        return self.conn.execute("SELECT MAX(date_filed) FROM filings").fetchone()[0]
+
+    def get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
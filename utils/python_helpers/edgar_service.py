@@ -1,10 +1,20 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from glob import glob
 from pathlib import Path
 from typing import TypedDict
-import urllib
 import requests
 import csv 
+from .edgar_http import SEC_MAX_REQUESTS_PER_SECOND, AdaptiveConcurrencyLimiter, CircuitOpenError, RequestController, TokenBucket, create_session
+from .edgar_downloader import MANIFEST_FILENAME, DownloadManifest, FilingDownload, FilingDownloader
+from .edgar_index import MasterIndex, read_master_index
+from .edgar_company_facts import COMPANY_FACTS_BULK_URL, CompanyFactsStore, flatten_company_facts
+from .edgar_submissions import SubmissionsFetcher, SubmissionsStore
+from .edger_types import SubmissionsResponse
+from .filing_store import FilingStore
+import pandas as pd
 
 class SecCompanyTicker(TypedDict):
   cik: int
@@ -23,8 +33,15 @@ class EdgarService:
   SEC_TICKER_FILENAME = "sec_company_tickers.json"
   MASTER_INDEX_FILENAME = "master.idx"
   MASTER_INDEX_CSV_FILENAME = "master.csv"
+  MASTER_INDEX_DB_FILENAME = "edgar_index.db"
+  SUBMISSIONS_DB_FILENAME = "edgar_submissions.db"
+  COMPANY_FACTS_DIR = "company_facts"
+  FULL_INDEX_DIR = "full-index"
+  DAILY_INDEX_DIR = "daily-index"
+  DAILY_INDEX_HIGH_WATER_MARK = "daily_index_high_water_mark"
 
-  def __init__(self, user_name: str, email: str, master_idx_filename: str = MASTER_INDEX_FILENAME, sec_ticker_filename = SEC_TICKER_FILENAME):
+  def __init__(self, user_name: str, email: str, master_idx_filename: str = MASTER_INDEX_FILENAME, sec_ticker_filename = SEC_TICKER_FILENAME,
+               requests_per_second: float = SEC_MAX_REQUESTS_PER_SECOND, max_concurrency: int = 10, data_dir: str = "../../data/sec_data"):
     self.user_name = user_name
     self.email = email
     self.user_agent_header = {
@@ -32,6 +49,27 @@ class EdgarService:
     }
     self.master_idx_filename = master_idx_filename
     self.sec_ticker_filename = sec_ticker_filename
+    self.data_dir = data_dir
+    self._indexes: dict[str, MasterIndex] = {}
+    self._submissions_stores: dict[str, SubmissionsStore] = {}
+    # every call to sec.gov goes through one controller so they all share the same rate and concurrency budget
+    self.session = create_session(self.user_agent_header, pool_size=max_concurrency)
+    self.controller = RequestController(
+        self.session,
+        rate_limiter=TokenBucket(min(requests_per_second, SEC_MAX_REQUESTS_PER_SECOND)),
+        concurrency=AdaptiveConcurrencyLimiter(max_limit=max_concurrency),
+    )
+
+  @property
+  def index(self) -> MasterIndex:
+    """Master index for `data_dir`, e.g. `edgar.index.query(ciks=[320193], forms=["10-K"], date_range=("2019-01-01", None))`."""
+    return self.get_index(self.data_dir)
+
+  def get_index(self, output_dir: str = "../../data/sec_data") -> MasterIndex:
+    db_file = f"{output_dir}/{self.MASTER_INDEX_DB_FILENAME}"
+    if db_file not in self._indexes:
+      self._indexes[db_file] = MasterIndex(db_file)
+    return self._indexes[db_file]
 
   def get_company_tickers(self, output_file_dir: str = "../../data/sec_data") -> list[SecCompanyTicker] | None: 
     output_file = f"{output_file_dir}/{self.sec_ticker_filename}"
@@ -40,7 +78,7 @@ class EdgarService:
             return json.load(jsonfile, object_hook=lambda d: SecCompanyTicker(**d))
         return result
       
-    ticker_response = requests.get(self.SEC_TICKER_URL, headers=self.user_agent_header)
+    ticker_response = self.controller.get(self.SEC_TICKER_URL, endpoint="tickers")
     data = json.loads(ticker_response.content)
     result = None
     with open(output_file, "w") as jsonfile:
@@ -49,96 +87,300 @@ class EdgarService:
         json.dump(result, jsonfile, indent=4)
     return result
       
-  def get_master_index_file(self, start_year: int, end_year: int, output_dir: str = "../../data/sec_data"):
-      output_file = f"{output_dir}/{self.master_idx_filename}"
-      with open(output_file, "wb") as f:
-          for year in range(start_year, end_year):
-              for q in range(1, 5):
-                  print(year, q)
-                  content = requests.get(
-                      f"https://www.sec.gov/Archives/edgar/full-index/{year}/QTR{q}/master.idx",
-                      headers=self.user_agent_header,
-                  ).content
-                  f.write(content)
+  def get_master_index_file(self, start_year: int, end_year: int, output_dir: str = "../../data/sec_data", max_workers: int = 4) -> list[str]:
+      """Fetch the full-index `master.idx` of every quarter from `start_year` through `end_year` (inclusive).
+
+      Each quarter is cached as its own file under `<output_dir>/full-index`. Quarters
+      fetched after they closed are final and never requested again; the current
+      quarter is revalidated with a conditional GET. New or changed quarters are
+      loaded into the local `MasterIndex` for `<output_dir>`.
+      """
+      today = date.today()
+      quarters = [(year, q) for year in range(start_year, end_year + 1) for q in range(1, 5)
+                  if date(year, 3 * q - 2, 1) <= today]
+      Path(f"{output_dir}/{self.FULL_INDEX_DIR}").mkdir(parents=True, exist_ok=True)
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+          paths = [path for path in executor.map(lambda yq: self._get_quarter_index_file(*yq, output_dir), quarters) if path]
+
+      index = self.get_index(output_dir)
+      for path in paths:
+          index.ingest(path)
+      return paths
+
+  def _get_quarter_index_file(self, year: int, q: int, output_dir: str) -> str | None:
+      index_file = f"{output_dir}/{self.FULL_INDEX_DIR}/{year}_QTR{q}.idx"
+      meta_file = f"{index_file}.json"
+      meta = {}
+      if os.path.exists(index_file) and os.path.exists(meta_file):
+          with open(meta_file, "r") as f:
+              meta = json.load(f)
+          # a quarter's index is final once it has been fetched after the quarter closed
+          if meta.get("final"):
+              return index_file
+
+      headers = {}
+      if meta.get("etag"):
+          headers["If-None-Match"] = meta["etag"]
+      if meta.get("last_modified"):
+          headers["If-Modified-Since"] = meta["last_modified"]
+      try:
+          response = self.controller.get(
+              f"https://www.sec.gov/Archives/edgar/full-index/{year}/QTR{q}/master.idx",
+              endpoint="full-index",
+              headers=headers,
+          )
+      except requests.HTTPError as e:
+          # the current quarter's index does not exist until its first business day is published
+          print(f"{year} QTR{q} master index not available: {e}")
+          return None
+
+      fetched = date.today()
+      quarter_end = date(year + 1, 1, 1) if q == 4 else date(year, 3 * q + 1, 1)
+      if response.status_code == 304:
+          print(year, q, "not modified")
+      else:
+          print(year, q)
+          with open(f"{index_file}.part", "wb") as f:
+              f.write(response.content)
+          os.replace(f"{index_file}.part", index_file)
+          meta = {
+              "etag": response.headers.get("ETag"),
+              "last_modified": response.headers.get("Last-Modified"),
+          }
+      meta["fetched"] = fetched.isoformat()
+      meta["final"] = fetched >= quarter_end
+      with open(meta_file, "w") as f:
+          json.dump(meta, f, indent=4)
+      return index_file
+
+  def sync_daily_index(self, forms: list[str] | None = None, ciks: list | None = None, output_dir: str = "../../data/sec_data",
+                       since: date | None = None) -> pd.DataFrame:
+      """Add the filings published in EDGAR's daily index since the last sync to the master index.
+
+      The last synced day is persisted in the index as a high-water mark (initially
+      `since`, or the latest filing date already in the index). New filings matching
+      `forms` and `ciks` are queued as pending in each form's download manifest, to
+      be fetched with `download_pending`. Returns the new index rows.
+      """
+      index = self.get_index(output_dir)
+      high_water_mark = index.get_meta(self.DAILY_INDEX_HIGH_WATER_MARK) or index.max_date_filed()
+      if high_water_mark is None and since is None:
+          print("Master index is empty. First run `get_master_index_file` or pass `since`")
+          return pd.DataFrame()
+      day = since if since is not None else date.fromisoformat(high_water_mark) + timedelta(days=1)
+      Path(f"{output_dir}/{self.DAILY_INDEX_DIR}").mkdir(parents=True, exist_ok=True)
+
+      new_filings = []
+      today = date.today()
+      while day <= today:
+          # EDGAR does not disseminate on weekends
+          if day.weekday() < 5:
+              try:
+                  daily_file = self._get_daily_index_file(day, output_dir)
+              except (requests.HTTPError, CircuitOpenError) as e:
+                  # leave the high-water mark on the last good day so the next run fetches this one again
+                  print(f"Daily index for {day} not fetched, stopping: {e}")
+                  break
+              if daily_file is None:
+                  if day == today:
+                      # today's index is published in the evening
+                      break
+              else:
+                  new_filings.append(index.append(read_master_index(daily_file), source=os.path.basename(daily_file)))
+          index.set_meta(self.DAILY_INDEX_HIGH_WATER_MARK, day.isoformat())
+          day += timedelta(days=1)
+
+      if not new_filings:
+          print("No new filings")
+          return pd.DataFrame()
+      new_filings = pd.concat(new_filings, ignore_index=True)
+      print(f"{len(new_filings)} new filings up to {index.get_meta(self.DAILY_INDEX_HIGH_WATER_MARK)}")
+
+      to_queue = new_filings[new_filings["filename"].str.endswith(".txt")]
+      if ciks is not None:
+          to_queue = to_queue[to_queue["cik"].isin([int(cik) for cik in ciks])]
+      if forms is not None:
+          to_queue = to_queue[to_queue["form"].isin(forms)]
+      for form, filings in to_queue.groupby("form"):
+          with DownloadManifest(f"{output_dir}/{form}/{MANIFEST_FILENAME}") as manifest:
+              for filing in filings.itertuples(index=False):
+                  to_dl = self._filing_download({"cik": str(filing.cik), "date": filing.date_filed, "url": filing.filename}, form, output_dir)
+                  if manifest.status(to_dl["accession"]) is None:
+                      manifest.mark(to_dl["accession"], DownloadManifest.PENDING, url=to_dl["url"], file_path=to_dl["file_path"])
+          print(f"Queued {len(filings)} Form {form} filings")
+      return new_filings
+
+  def _get_daily_index_file(self, day: date, output_dir: str) -> str | None:
+      daily_file = f"{output_dir}/{self.DAILY_INDEX_DIR}/master.{day:%Y%m%d}.idx"
+      if os.path.exists(daily_file):
+          return daily_file
+      q = (day.month - 1) // 3 + 1
+      try:
+          response = self.controller.get(
+              f"https://www.sec.gov/Archives/edgar/daily-index/{day.year}/QTR{q}/master.{day:%Y%m%d}.idx",
+              endpoint="daily-index",
+          )
+      except requests.HTTPError as e:
+          if e.response is not None and e.response.status_code == 404:
+              # no index is published for market holidays
+              return None
+          raise
+      with open(f"{daily_file}.part", "wb") as f:
+          f.write(response.content)
+      os.replace(f"{daily_file}.part", daily_file)
+      return daily_file
+
+  def download_pending(self, form: str, output_dir: str = "../../data/sec_data", max_workers: int = 8, store: FilingStore | None = None):
+      """Download the filings queued in `form`'s manifest, including earlier failures."""
+      with DownloadManifest(f"{output_dir}/{form}/{MANIFEST_FILENAME}") as manifest:
+          # store-backed records carry cik and date_filed in place of a file path
+          to_dl = [FilingDownload(accession=record["accession"], url=record["url"], file_path=record["file_path"],
+                                  **{key: record[key] for key in ("cik", "date_filed") if record.get(key)})
+                   for record in manifest.records(DownloadManifest.PENDING) + manifest.records(DownloadManifest.FAILED)]
+          print(f"Downloading {len(to_dl)} queued Form {form} filings to folder {output_dir}/{form}")
+          summary = FilingDownloader(self.controller, max_workers=max_workers, store=store, form=form).download(to_dl, manifest)
+      print(f"Done: {summary[DownloadManifest.DONE]}, failed: {summary[DownloadManifest.FAILED]}, pending: {summary[DownloadManifest.PENDING]}")
+      return summary
 
   def parse_master_index_file(self, cik_filter: list[str], output_dir: str = "../../data/sec_data"):
+    """Write the filings of the CIKs in `cik_filter` to `master.csv`.
+
+    Prefer `get_index(output_dir).query(...)`; this keeps the CSV used by
+    `download_filings_for_form` for callers that do not pass `ciks`.
+    """
     output_index_csv_file = f"{output_dir}/{self.MASTER_INDEX_CSV_FILENAME}"
+    index = self.get_index(output_dir)
+    quarter_files = sorted(glob(f"{output_dir}/{self.FULL_INDEX_DIR}/*.idx"))
+    # a concatenated master.idx from earlier versions is still accepted
     master_index_file = f"{output_dir}/{self.master_idx_filename}"
+    if not quarter_files and os.path.exists(master_index_file):
+        quarter_files = [master_index_file]
 
-    if not os.path.exists(master_index_file):
+    if not quarter_files and index.count() == 0:
         print("Master index file not found. First run `get_master_index_file`")
         return
-    
-    with open(output_index_csv_file, "w", errors="ignore") as csvfile:
-        wr = csv.writer(csvfile)
-        wr.writerow(["cik", "comnam", "form", "date", "url"])
-        with open(master_index_file, "r", encoding="latin1") as f:
-            for r in f:
-                if r.startswith("CIK") or r.startswith("--"):
-                    continue
-                split = r.split("|")
-                cik_value = split[0]
-                if cik_value in cik_filter:
-                    if ".txt" in r:
-                        wr.writerow(r.strip().split("|"))
-
-  def download_filings_for_form(self, form: str, output_dir: str = "../../data/sec_data"):
-      master_index_csv_file = f"{output_dir}/{self.MASTER_INDEX_CSV_FILENAME}"
-      if not os.path.exists(master_index_csv_file):
-          print("Master index file not found. First run `parse_master_index_file`")
-          return
-      
-      print(f"Downloading Form {form} filings to folder {output_dir}/{form}")
 
-      to_dl = []
-      with open(master_index_csv_file, "r") as f:
-          reader = csv.DictReader(f)
-          for row in reader:
-              if form in row["form"]:
-                  to_dl.append(row)
+    for quarter_file in quarter_files:
+        index.ingest(quarter_file)
+
+    filings = index.query(ciks=[int(cik) for cik in cik_filter])
+    filings = filings[filings["filename"].str.endswith(".txt")]
+    filings[["cik", "company", "form", "date_filed", "filename"]] \
+        .to_csv(output_index_csv_file, header=["cik", "comnam", "form", "date", "url"], index=False)
+
+  def download_filings_for_form(self, form: str, output_dir: str = "../../data/sec_data", max_workers: int = 8,
+                                ciks: list | None = None, date_range: tuple[str | None, str | None] | None = None,
+                                store: FilingStore | None = None):
+      """Download `form` filings, selected from the master index when `ciks` is given and from `master.csv` otherwise.
 
-      len_ = len(to_dl)
-      print(len_)
+      Filings are written under `<output_dir>/<form>`, or compressed into `store` when one is given.
+      """
+      to_dl: list[FilingDownload] = []
+      if ciks is not None:
+          filings = self.get_index(output_dir).query(ciks=ciks, forms=[form], date_range=date_range)
+          for filing in filings.itertuples(index=False):
+              to_dl.append(self._filing_download({"cik": str(filing.cik), "date": filing.date_filed, "url": filing.filename}, form, output_dir))
+      else:
+          master_index_csv_file = f"{output_dir}/{self.MASTER_INDEX_CSV_FILENAME}"
+          if not os.path.exists(master_index_csv_file):
+              print("Master index file not found. First run `parse_master_index_file`")
+              return
+          with open(master_index_csv_file, "r") as f:
+              reader = csv.DictReader(f)
+              for row in reader:
+                  if form in row["form"]:
+                      to_dl.append(self._filing_download(row, form, output_dir))
+
+      print(f"Downloading Form {form} filings to folder {output_dir}/{form}")
+      print(len(to_dl))
       print("start to download")
 
-      for n, row in enumerate(to_dl):
-          print(f"{n} out of {len_}")
-          cik = row["cik"].strip()
-          date = row["date"].strip()
-          year = row["date"].split("-")[0].strip()
-          month = row["date"].split("-")[1].strip()
-          url = row["url"].strip()
-          accession = url.split(".")[0].split("-")[-1]
-          Path(f"{output_dir}/{form}/{year}_{month}").mkdir(parents=True, exist_ok=True)
-          file_path = f"{output_dir}/{form}/{year}_{month}/{cik}_{date}_{accession}.txt"
-          if os.path.exists(file_path):
-              continue
-          try:
-              txt = requests.get(
-                  f"https://www.sec.gov/Archives/{url}", headers=self.user_agent_header, timeout=60
-              ).text
-              with open(file_path, "w", errors="ignore") as f:
-                  f.write(txt)
-          except:
-              print(f"{cik}, {date} failed to download")
+      downloader = FilingDownloader(self.controller, max_workers=max_workers, store=store, form=form)
+      with DownloadManifest(f"{output_dir}/{form}/{MANIFEST_FILENAME}") as manifest:
+          summary = downloader.download(to_dl, manifest)
+      print(f"Done: {summary[DownloadManifest.DONE]}, failed: {summary[DownloadManifest.FAILED]}, pending: {summary[DownloadManifest.PENDING]}")
+      return summary
+
+  def _filing_download(self, row: dict, form: str, output_dir: str) -> FilingDownload:
+      # <output_dir>/<form>/<yyyy_mm>/<cik>_<yyyy>-<mm>-<dd>_<sequence>.txt
+      cik = row["cik"].strip()
+      date = row["date"].strip()
+      year = row["date"].split("-")[0].strip()
+      month = row["date"].split("-")[1].strip()
+      url = row["url"].strip()
+      accession = url.split(".")[0].split("-")[-1]
+      return FilingDownload(
+          accession=os.path.basename(url).split(".")[0],
+          url=f"https://www.sec.gov/Archives/{url}",
+          file_path=f"{output_dir}/{form}/{year}_{month}/{cik}_{date}_{accession}.txt",
+      )
 
   def get_company_facts(self, cik: str) -> dict:
     url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik.rjust(10, '0')}.json"
-    request = urllib.request.Request(url, None, self.user_agent_header)
     try:
-      with urllib.urlopen(request) as response:
-        data = json.loads(response.read())
-        return data
-      response = urlopen(url)
-      data = json.loads(response.read())
-      return data
-    except urllib.error.HTTPError as e:
+      return self.controller.get(url, endpoint="companyfacts", timeout=60).json()
+    except requests.HTTPError as e:
       return {"error": f"HTTPError: {e}"}
-    except urllib.error.URLError as e:
-      return {"error": f"URLError: {e}"}
+    except requests.RequestException as e:
+      return {"error": f"RequestException: {e}"}
     except Exception as e:
       return {"error": f"Exception: {e}"}
   
-  def get_company_submissions(self, cik: str):
+  def get_company_facts_store(self, output_dir: str = "../../data/sec_data") -> CompanyFactsStore:
+      return CompanyFactsStore(f"{output_dir}/{self.COMPANY_FACTS_DIR}")
+
+  def ingest_company_facts(self, ciks: list, output_dir: str = "../../data/sec_data", max_workers: int = 8) -> CompanyFactsStore:
+      """Fetch companyfacts for many CIKs concurrently and store them as one columnar table.
+
+      Query the result with e.g. `store.annual_series("Revenues", years=(2019, 2024))`.
+      """
+      store = self.get_company_facts_store(output_dir)
+      frames = []
+      failures = []
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+          futures = {executor.submit(self.get_company_facts, str(cik)): cik for cik in ciks}
+          for future in as_completed(futures):
+              facts = future.result()
+              if "error" in facts:
+                  print(f"{futures[future]} company facts failed: {facts['error']}")
+                  failures.append(futures[future])
+              else:
+                  frames.append(flatten_company_facts(facts))
+      rows = store.ingest(frames)
+      print(f"Stored {rows} facts for {len(frames)} companies, {len(failures)} failed")
+      return store
+
+  def ingest_company_facts_bulk(self, ciks: list | None = None, output_dir: str = "../../data/sec_data") -> CompanyFactsStore:
+      """Ingest companyfacts from the SEC's nightly bulk `companyfacts.zip`, downloading it if it is not cached."""
+      zip_file = f"{output_dir}/companyfacts.zip"
+      if not os.path.exists(zip_file):
+          print(f"Downloading {COMPANY_FACTS_BULK_URL}")
+          response = self.controller.get(COMPANY_FACTS_BULK_URL, endpoint="bulk", stream=True, timeout=600)
+          with open(f"{zip_file}.part", "wb") as f:
+              for chunk in response.iter_content(chunk_size=1 << 20):
+                  f.write(chunk)
+          os.replace(f"{zip_file}.part", zip_file)
+      store = self.get_company_facts_store(output_dir)
+      rows = store.ingest_zip(zip_file, ciks=ciks)
+      print(f"Stored {rows} facts")
+      return store
+
+  def get_company_submissions(self, cik: str) -> SubmissionsResponse:
       url = f"https://data.sec.gov/submissions/CIK{cik.rjust(10, '0')}.json"
-      
\ No newline at end of file
+      return self.controller.get(url, endpoint="submissions", timeout=60).json()
+
+  def get_submissions_store(self, output_dir: str = "../../data/sec_data") -> SubmissionsStore:
+      db_file = f"{output_dir}/{self.SUBMISSIONS_DB_FILENAME}"
+      if db_file not in self._submissions_stores:
+          self._submissions_stores[db_file] = SubmissionsStore(db_file)
+      return self._submissions_stores[db_file]
+
+  def update_company_submissions(self, ciks: list, output_dir: str = "../../data/sec_data", max_workers: int = 8) -> SubmissionsStore:
+      """Fetch submissions for `ciks` concurrently and top up the local store with filings it has not seen.
+
+      Look-ups such as `store.latest_filing(cik, "10-K")` are then answered locally.
+      """
+      store = self.get_submissions_store(output_dir)
+      summary = SubmissionsFetcher(self.controller, store, max_workers=max_workers).update(ciks)
+      print(f"Updated {summary['companies']} companies, {summary['filings_added']} new filings, {summary['failed']} failed")
+      return store
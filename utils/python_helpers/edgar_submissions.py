@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import pandas as pd
+from .edgar_http import RequestController
+from .edger_types import RecentFilings, SubmissionsResponse
+
+SUBMISSIONS_URL = "https://data.sec.gov/submissions"
+
+# RecentFilings arrays stored per filing, keyed by column name
+FILING_COLUMNS = {
+    "accessionNumber": "accession",
+    "form": "form",
+    "filingDate": "filing_date",
+    "reportDate": "report_date",
+    "acceptanceDateTime": "acceptance_date_time",
+    "primaryDocument": "primary_document",
+    "primaryDocDescription": "primary_doc_description",
+    "items": "items",
+    "size": "size",
+    "isXBRL": "is_xbrl",
+}
+
+
+class SubmissionsStore:
+    """Local per-CIK store of EDGAR submissions history.
+
+    Filings are keyed by (cik, accession) so refreshing a company only adds
+    accession numbers that are not stored yet. Paginated history shards from
+    `filings.files` are fetched once; the `recent` block is re-read on every
+    update.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS companies (
+                cik INTEGER PRIMARY KEY,
+                name TEXT,
+                tickers TEXT,
+                exchanges TEXT,
+                sic TEXT,
+                fiscal_year_end TEXT,
+                updated TEXT,
+                data TEXT
+            );
+            CREATE TABLE IF NOT EXISTS filings (
+                cik INTEGER NOT NULL,
+                accession TEXT NOT NULL,
+                form TEXT,
+                filing_date TEXT,
+                report_date TEXT,
+                acceptance_date_time TEXT,
+                primary_document TEXT,
+                primary_doc_description TEXT,
+                items TEXT,
+                size INTEGER,
+                is_xbrl INTEGER,
+                PRIMARY KEY (cik, accession)
+            );
+            CREATE INDEX IF NOT EXISTS ix_filings_form ON filings (cik, form, filing_date);
+            CREATE TABLE IF NOT EXISTS shards (
+                name TEXT PRIMARY KEY,
+                cik INTEGER NOT NULL,
+                filing_from TEXT,
+                filing_to TEXT
+            );
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def known_shards(self, cik: int) -> set[str]:
+        return {row[0] for row in self.conn.execute("SELECT name FROM shards WHERE cik = ?", (int(cik),))}
+
+    def add_submissions(self, submissions: SubmissionsResponse, shards: dict[str, RecentFilings]) -> int:
+        """Store a submissions response and any newly fetched history shards. Returns the number of new filings."""
+        cik = int(submissions["cik"])
+        company = {k: v for k, v in submissions.items() if k != "filings"}
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO companies (cik, name, tickers, exchanges, sic, fiscal_year_end, updated, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cik, submissions.get("name"), json.dumps(submissions.get("tickers", [])), json.dumps(submissions.get("exchanges", [])),
+                 submissions.get("sic"), submissions.get("fiscalYearEnd"), datetime.now(timezone.utc).isoformat(), json.dumps(company)),
+            )
+            added = self._add_filings(cik, submissions["filings"]["recent"])
+            files = {f["name"]: f for f in submissions["filings"].get("files", [])}
+            for name, filings in shards.items():
+                added += self._add_filings(cik, filings)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO shards (name, cik, filing_from, filing_to) VALUES (?, ?, ?, ?)",
+                    (name, cik, files.get(name, {}).get("filingFrom"), files.get(name, {}).get("filingTo")),
+                )
+        return added
+
+    def _add_filings(self, cik: int, filings: RecentFilings) -> int:
+        keys = [key for key in FILING_COLUMNS if key in filings]
+        columns = ", ".join(["cik"] + [FILING_COLUMNS[key] for key in keys])
+        rows = zip(*(filings[key] for key in keys))
+        cursor = self.conn.executemany(
+            f"INSERT OR IGNORE INTO filings ({columns}) VALUES ({', '.join('?' * (len(keys) + 1))})",
+            ((cik, *row) for row in rows),
+        )
+        return cursor.rowcount
+
+    def latest_filing(self, cik: int, form: str) -> dict | None:
+        """Most recent filing of `form` for `cik`, e.g. the latest 10-K accession number."""
+        cursor = self.conn.execute(
+            "SELECT * FROM filings WHERE cik = ? AND form = ? ORDER BY filing_date DESC, accession DESC LIMIT 1",
+            (int(cik), form),
+        )
+        row = cursor.fetchone()
+        return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def filings(self, cik: int, forms: list[str] | None = None) -> pd.DataFrame:
+        sql = "SELECT * FROM filings WHERE cik = ?"
+        params = [int(cik)]
+        if forms is not None:
+            sql += f" AND form IN ({','.join('?' * len(forms))})"
+            params.extend(forms)
+        return pd.read_sql_query(sql + " ORDER BY filing_date DESC", self.conn, params=params)
+
+    def company(self, cik: int) -> dict | None:
+        row = self.conn.execute("SELECT data FROM companies WHERE cik = ?", (int(cik),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class SubmissionsFetcher:
+    """Fetches submissions JSON, and the history shards a store does not have yet, for many CIKs concurrently."""
+
+    def __init__(self, controller: RequestController, store: SubmissionsStore, max_workers: int = 8) -> None:
+        self.controller = controller
+        self.store = store
+        self.max_workers = max_workers
+
+    def fetch(self, cik: str | int, known_shards: set[str] = frozenset()) -> tuple[SubmissionsResponse, dict[str, RecentFilings]]:
+        submissions = self.controller.get(f"{SUBMISSIONS_URL}/CIK{str(cik).rjust(10, '0')}.json", endpoint="submissions", timeout=60).json()
+        shards = {}
+        for file in submissions["filings"].get("files", []):
+            if file["name"] not in known_shards:
+                shards[file["name"]] = self.controller.get(f"{SUBMISSIONS_URL}/{file['name']}", endpoint="submissions", timeout=60).json()
+        return submissions, shards
+
+    def update(self, ciks: list) -> dict[str, int]:
+        # known shards are read up front; sqlite connections stay on the calling thread
+        known = {cik: self.store.known_shards(int(cik)) for cik in ciks}
+        added = 0
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, cik, known[cik]): cik for cik in ciks}
+            for future in as_completed(futures):
+                cik = futures[future]
+                try:
+                    added += self.store.add_submissions(*future.result())
+                except Exception as e:
+                    print(f"{cik} submissions failed: {e}")
+                    failures.append(cik)
+        return {"companies": len(ciks) - len(failures), "filings_added": added, "failed": len(failures)}
@@ -25,10 +25,27 @@ class RecentFilings(TypedDict):
     filingDate: List[str]
     reportDate: List[str]
     acceptanceDateTime: List[str]
+    act: List[str]
     form: List[str]
+    fileNumber: List[str]
+    filmNumber: List[str]
+    items: List[str]
+    size: List[int]
+    isXBRL: List[int]
+    isInlineXBRL: List[int]
+    primaryDocument: List[str]
+    primaryDocDescription: List[str]
+
+class FilingsFile(TypedDict):
+    # Older filings are paginated into https://data.sec.gov/submissions/{name}, each shaped like RecentFilings
+    name: str
+    filingCount: int
+    filingFrom: str
+    filingTo: str
 
 class Filings(TypedDict):
     recent: RecentFilings
+    files: List[FilingsFile]
 
 class SubmissionsResponse(TypedDict):
     cik: str
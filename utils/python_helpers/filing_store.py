@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from glob import glob
+from typing import Iterator
+import pandas as pd
+from .sgml_submission import SecSubmission
+
+# <root>/<yyyy_mm>/<cik>_<yyyy>-<mm>-<dd>_<sequence>.txt as written by EdgarService.download_filings_for_form
+FILING_PATH_PATTERN = re.compile(r"(\d+)_(\d{4}-\d{2}-\d{2})_([^_]+)\.txt$")
+
+
+class FilingStore:
+    """Compressed, content-addressed store for raw EDGAR submission text files.
+
+    Each distinct filing body is zlib-compressed as an independent frame and
+    appended to a segment file; identical bodies (by SHA-256) are stored once.
+    A SQLite catalog maps accession numbers to (segment, offset, length) and
+    carries CIK, form and filing date, so single filings can be read at random
+    and filtered subsets streamed in on-disk order.
+    """
+    CATALOG_FILENAME = "catalog.db"
+
+    def __init__(self, directory: str, segment_size: int = 1 << 30, compression_level: int = 6) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(f"{directory}/{self.CATALOG_FILENAME}", check_same_thread=False)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS filings (
+                accession TEXT PRIMARY KEY,
+                cik INTEGER NOT NULL,
+                form TEXT NOT NULL,
+                date_filed TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs (hash)
+            );
+            CREATE INDEX IF NOT EXISTS ix_filings_cik ON filings (cik, form, date_filed);
+            CREATE INDEX IF NOT EXISTS ix_filings_form ON filings (form, date_filed);
+        """)
+        row = self.conn.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        self._segment = row[0] if row[0] is not None else 0
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _segment_file(self, segment: int) -> str:
+        return f"{self.directory}/segment_{segment:05d}.bin"
+
+    def has(self, accession: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM filings WHERE accession = ?", (accession,)).fetchone() is not None
+
+    def put(self, accession: str, cik: int | str, form: str, date_filed: str, content: bytes | str) -> str:
+        """Store a filing body and catalog it under `accession`. Returns the content hash."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+                frame = zlib.compress(content, self.compression_level)
+                segment_file = self._segment_file(self._segment)
+                if os.path.exists(segment_file) and os.path.getsize(segment_file) + len(frame) > self.segment_size:
+                    self._segment += 1
+                    segment_file = self._segment_file(self._segment)
+                # the frame is on disk before it is cataloged; a crash leaves at most unreferenced bytes
+                with open(segment_file, "ab") as f:
+                    offset = f.tell()
+                    f.write(frame)
+                self.conn.execute(
+                    "INSERT INTO blobs (hash, segment, offset, length, size) VALUES (?, ?, ?, ?, ?)",
+                    (digest, self._segment, offset, len(frame), len(content)),
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO filings (accession, cik, form, date_filed, hash) VALUES (?, ?, ?, ?, ?)",
+                (accession, int(cik), form, date_filed, digest),
+            )
+            self.conn.commit()
+        return digest
+
+    def get(self, accession: str) -> bytes:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT b.segment, b.offset, b.length FROM filings f JOIN blobs b ON b.hash = f.hash WHERE f.accession = ?",
+                (accession,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(accession)
+        segment, offset, length = row
+        with open(self._segment_file(segment), "rb") as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length))
+
+    def get_text(self, accession: str) -> str:
+        return self.get(accession).decode("utf-8", errors="ignore")
+
+    def query(self, ciks: list | None = None, forms: list[str] | None = None,
+              date_range: tuple[str | None, str | None] | None = None) -> pd.DataFrame:
+        """Catalog rows (accession, cik, form, date_filed, segment, offset, length, size) matching every filter."""
+        sql = ("SELECT f.accession, f.cik, f.form, f.date_filed, b.segment, b.offset, b.length, b.size "
+               "FROM filings f JOIN blobs b ON b.hash = f.hash")
+        clauses = []
+        params = []
+        if ciks is not None:
+            ciks = [int(cik) for cik in ciks]
+            clauses.append(f"f.cik IN ({','.join('?' * len(ciks))})")
+            params.extend(ciks)
+        if forms is not None:
+            clauses.append(f"f.form IN ({','.join('?' * len(forms))})")
+            params.extend(forms)
+        if date_range is not None:
+            if date_range[0] is not None:
+                clauses.append("f.date_filed >= ?")
+                params.append(date_range[0])
+            if date_range[1] is not None:
+                clauses.append("f.date_filed <= ?")
+                params.append(date_range[1])
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        # the connection is shared across threads; reads take the lock as writes do
+        with self._lock:
+            return pd.read_sql_query(sql + " ORDER BY b.segment, b.offset", self.conn, params=params)
+
+    def iter_filings(self, ciks: list | None = None, forms: list[str] | None = None,
+                     date_range: tuple[str | None, str | None] | None = None) -> Iterator[tuple[dict, str]]:
+        """Stream `(catalog record, text)` for matching filings, reading each segment sequentially."""
+        catalog = self.query(ciks=ciks, forms=forms, date_range=date_range)
+        for segment, records in catalog.groupby("segment", sort=True):
+            with open(self._segment_file(segment), "rb") as f:
+                for record in records.to_dict(orient="records"):
+                    f.seek(record["offset"])
+                    yield record, zlib.decompress(f.read(record["length"])).decode("utf-8", errors="ignore")
+
+    def import_directory(self, input_directory: str, form: str) -> int:
+        """Load an existing `<form>/<yyyy_mm>/<cik>_<date>_<sequence>.txt` download tree into the store.
+
+        Filings are keyed by the ACCESSION NUMBER of their SEC header, as
+        `FilingDownloader` keys them, so a filing imported here and downloaded
+        later is stored once. A file without one is keyed `<cik>-<date>-<sequence>`.
+        """
+        imported = 0
+        for path in glob(f"{input_directory}/*/*.txt"):
+            match = FILING_PATH_PATTERN.search(os.path.basename(path))
+            if not match:
+                continue
+            cik, date_filed, sequence = match.groups()
+            with open(path, "rb") as f:
+                content = f.read()
+            accession = SecSubmission(content).header.get("ACCESSION NUMBER") or f"{cik}-{date_filed}-{sequence}"
+            if self.has(accession):
+                continue
+            self.put(accession, cik, form, date_filed, content)
+            imported += 1
+        return imported
+
+    def stats(self) -> dict:
+        with self._lock:
+            filings, blobs, raw, compressed = self.conn.execute(
+                "SELECT (SELECT COUNT(*) FROM filings), COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length), 0) FROM blobs"
+            ).fetchone()
+        return {"filings": filings, "blobs": blobs, "raw_bytes": raw, "stored_bytes": compressed,
+                "ratio": raw / compressed if compressed else 0.0}
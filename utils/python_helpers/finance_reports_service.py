@@ -11,6 +11,7 @@ from requests import Session
 from requests_cache import CacheMixin, SQLiteCache
 from requests_ratelimiter import LimiterMixin, MemoryQueueBucket
 from pyrate_limiter import Duration, RequestRate, Limiter
+from .identifier_crosswalk import IdentifierCrosswalk
 
 import nest_asyncio
 import os
@@ -23,13 +24,16 @@ class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
 
 
 class FinanceReportsService:
-  def __init__(self, user_name: str, email: str, company_cik_ticker_ref: pd.DataFrame, output_dir: str = "../../data/sec_data"):
+  def __init__(self, user_name: str, email: str, company_cik_ticker_ref: pd.DataFrame, output_dir: str = "../../data/sec_data",
+               crosswalk: IdentifierCrosswalk = None):
     self.user_name = user_name
     self.email = email
     self.user_agent_header = {
         "User-Agent": f"{self.user_name} ({self.email})"
     }
     self.company_cik_ticker_ref = company_cik_ticker_ref
+    # cik/ticker lookups go through hash indexes built once, not a mask over the frame per call
+    self.crosswalk = crosswalk or IdentifierCrosswalk.from_frame(company_cik_ticker_ref)
     self.output_dir = output_dir
     self.session = CachedLimiterSession(
         limiter=Limiter(RequestRate(2, Duration.SECOND*5)),  # max 2 requests per 5 seconds
@@ -43,13 +47,25 @@ class FinanceReportsService:
   def get_company_by_ticker(self, ticker: str):
     return self.company_cik_ticker_ref[self.company_cik_ticker_ref["ticker"] == ticker]
 
+  def lookup_company_by_cik(self, cik: int) -> dict | None:
+    return self.crosswalk.lookup("cik", cik)
+
+  def lookup_company_by_ticker(self, ticker: str) -> dict | None:
+    return self.crosswalk.lookup("ticker", ticker)
+
+  def lookup_companies_by_cik(self, ciks: list[int]) -> list[dict | None]:
+    return self.crosswalk.lookup_many("cik", ciks)
+
+  def lookup_companies_by_ticker(self, tickers: list[str]) -> list[dict | None]:
+    return self.crosswalk.lookup_many("ticker", tickers)
+
   def get_sec_filings(self, cik: int, output_dir: str = "../../data/sec_data"):
     pass
 
   def get_current_market_data(self, cik: int):
     output_file = f"{self.output_dir}/{cik}.json"
     print(cik)
-    ticker = self.get_company_by_cik(cik)["ticker"].values[0]
+    ticker = self.lookup_company_by_cik(cik)["tickers"][0]
     print(ticker)
     response = yf.Ticker(ticker, session=self.session)
     info = response.financials
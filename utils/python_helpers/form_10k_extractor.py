@@ -1,62 +1,219 @@
+import csv
 import json
+from contextlib import nullcontext
 from typing import Dict
 import os
 import re
+import time
 import pandas as pd
+import pyarrow as pa
 from bs4 import BeautifulSoup
 from glob import glob
+from lxml import etree
+from multiprocessing import Pool
+from .cusip_cik_parsing import pool_size
+from .filing_store import FilingStore
+from .identifier_crosswalk import IdentifierCrosswalk
+from .record_io import RecordWriter, output_path
+from .section_chunker import ChunkWriter
+from .sgml_submission import SecSubmission
+
+SECTIONS = ['item1', 'item1a', 'item1b','item2','item3', 'item7', 'item7a', 'item8', 'item10', 'item11', 'item15']
+# columns of the single-file ndjson/parquet output; keys match the per-filing JSON files
+SECTIONS_SCHEMA = pa.schema(
+    [(section, pa.string()) for section in SECTIONS]
+    + [('cik', pa.string()), ('cusips', pa.list_(pa.string())), ('name', pa.string()), ('primaryExchange', pa.string()),
+       ('ticker', pa.string()), ('date', pa.string()), ('accession ', pa.string())]
+)
+
+# item headings such as ">Item 1A." or "ITEM&#160;7"; the last heading of an item starts its section.
+# The same pattern as extract_section_text's, behind a lookahead that lets most positions fail on one character.
+ITEM_PATTERN = re.compile(r'(?=[>I])(?:(>(Item|ITEM)(\s|&#160;|&nbsp;)(1A|1B|1\.|2|3|7A|7|8|10|11|15)\.{0,1})|((Item|ITEM)(\s*)(1A|1B|1\.|2|3|7A|7|8|10|11|15)))')
+# elements whose text BeautifulSoup's get_text leaves out
+SKIPPED_TAGS = frozenset(['script', 'style', 'template'])
+TIMINGS_FILENAME = '10k_timings.csv'
+
+
+def item_key(heading: str) -> str:
+    # ">Item&#160;1A." -> "item1a", the same keys the pandas replace passes in extract_section_text produce
+    key = heading.lower().replace('&#160;', ' ').replace('&nbsp;', ' ')
+    return key.replace(' ', '').replace('.', '').replace('>', '')
+
+
+def item_boundaries(doc: str) -> dict[str, tuple[int, int]]:
+    """(start, end) of every item in `doc` from one pass of ITEM_PATTERN; an item ends where the next one starts."""
+    last_start = {}
+    for match in ITEM_PATTERN.finditer(doc):
+        last_start[item_key(match.group())] = match.start()
+    starts = sorted(last_start.items(), key=lambda item: item[1])
+    ends = [start for _, start in starts[1:]] + [len(doc)]
+    return {item: (start, end) for (item, start), end in zip(starts, ends)}
+
+
+class _TextTarget:
+    """lxml parser target collecting stripped text runs, as BeautifulSoup's get_text(strip=True) does, without a tree."""
+
+    def __init__(self) -> None:
+        self.parts = []
+        self.run = []
+        self.skipped = 0
+
+    def _flush(self) -> None:
+        if self.run:
+            text = ''.join(self.run).strip()
+            if text and not self.skipped:
+                self.parts.append(text)
+            self.run = []
+
+    def start(self, tag, attrib) -> None:
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self.skipped += 1
+
+    def end(self, tag) -> None:
+        self._flush()
+        if tag in SKIPPED_TAGS:
+            self.skipped -= 1
+
+    def data(self, data) -> None:
+        self.run.append(data)
+
+    def comment(self, text) -> None:
+        self._flush()
+
+    def close(self) -> str:
+        self._flush()
+        return ''.join(self.parts)
+
+
+def html_to_text(html: str) -> str:
+    """Text of an HTML fragment, equal to BeautifulSoup(html, 'lxml').get_text(strip=True), streamed through lxml's parser."""
+    parser = etree.HTMLParser(target=_TextTarget())
+    parser.feed(html)
+    return parser.close()
+
 
 class Form10kExtractor:
   def __init__(self) -> None:
     pass
 
-  def process_directory_files(self, cik_cusip_csv: str, input_directory: str, output_directory: str):
+  def open_sections_writer(self, output_directory: str, output_format: str, compression: str = None,
+                           chunk_tokens: int = None) -> RecordWriter | ChunkWriter | None:
+      # "json" keeps one file per filing; ndjson/parquet stream every filing to one 10k_sections file
+      # with chunk_tokens, filings are chunked as they are extracted and only the 10k_chunks file is written
+      if chunk_tokens is not None:
+          return ChunkWriter(output_path(f"{output_directory}/10k_chunks", output_format, compression),
+                             compression=compression, max_tokens=chunk_tokens)
+      if output_format == 'json':
+          return None
+      return RecordWriter(output_path(f"{output_directory}/10k_sections", output_format, compression),
+                          compression=compression, row_group_size=500, schema=SECTIONS_SCHEMA)
+
+  def load_reference(self, cik_cusip_csv: str) -> IdentifierCrosswalk:
+      # reference_data.csv rows: cik,name,ticker,exchange,cusips
+      return IdentifierCrosswalk.from_frame(pd.read_csv(cik_cusip_csv, dtype={'cusips': str}))
+
+  def reference_fields(self, reference: dict) -> tuple[list[str], str, str, str]:
+      # cusips, name, primaryExchange, ticker as written to the sections output
+      tickers = reference['tickers']
+      return reference['cusips'], reference.get('companyName'), reference.get('exchange'), tickers[0] if tickers else None
+
+  def process_directory_files(self, cik_cusip_csv: str, input_directory: str, output_directory: str,
+                              output_format: str = 'json', compression: str = None, parallel: bool = False,
+                              max_workers: int = None, chunk_tokens: int = None):
+          """Extract the sections of every 10-K under `input_directory`.
+
+          With `parallel`, filings are parsed across a process pool and written
+          by this process as they complete. Either way the time spent on each
+          filing is written to `10k_timings.csv` and summarised as 10-Ks per second.
+          With `chunk_tokens`, sections are streamed as chunks of that many
+          tokens to `10k_chunks` instead (see `section_chunker`).
+          """
           if not os.path.exists(output_directory):
               os.makedirs(output_directory)
-          reference_df = pd.read_csv(cik_cusip_csv)
+          crosswalk = self.load_reference(cik_cusip_csv)
+          writer = self.open_sections_writer(output_directory, output_format, compression, chunk_tokens)
 
+          tasks = []
           for file in glob(f"{input_directory}/*/*"):
               file_id = os.path.splitext(os.path.split(file)[1])[0]
               cik,date,accession = file_id.split("_")
               print(f"Processing: {cik} - {date} - {file_id}")
               output_file_path = os.path.join(output_directory, f"{file_id}.json")
 
-              if int(cik) not in reference_df['cik'].values:
+              reference = crosswalk.lookup('cik', cik)
+              if reference is None:
                   print(f"{cik} not found in reference file")
                   continue
-              reference = reference_df.loc[reference_df['cik'] == int(cik)].iloc[0]
+              if writer is None and os.path.exists(output_file_path):
+                  continue
+              tasks.append((file, output_file_path, cik, *self.reference_fields(reference), date, accession))
 
+          start = time.perf_counter()
+          timings = []
+          parallel = parallel and len(tasks) > 1
+          with Pool(pool_size(len(tasks), max_workers)) if parallel else nullcontext() as p:
+              results = p.imap_unordered(self.extract_filing, tasks, chunksize=4) if parallel else map(self.extract_filing, tasks)
+              for output_file_path, record, timing in results:
+                  self.save_record(record, output_file_path, writer)
+                  timings.append(timing)
+          if writer is not None:
+              writer.close()
+          self.report_timings(timings, time.perf_counter() - start, os.path.join(output_directory, TIMINGS_FILENAME))
 
-              cusips = str(reference['cusips']).split(',')
+  def extract_filing(self, task: tuple) -> tuple[str, Dict | None, tuple]:
+      # one process_directory_files task: returns the output path, the record and (file, chars, sections, seconds, pid)
+      file, output_file_path, cik, cusips, name, primaryExchange, ticker, date, accession = task
+      start = time.perf_counter()
+      with open(file, 'r', encoding='utf-8') as f:
+          raw_txt = f.read()
+      record = self.parse(raw_txt, cik, cusips, name, primaryExchange, ticker, date, accession)
+      sections = sum(section in record for section in SECTIONS) if record is not None else 0
+      return output_file_path, record, (file, len(raw_txt), sections, time.perf_counter() - start, os.getpid())
 
-              self.load_parse_save(file, output_file_path, cik, cusips, reference['name'], reference['exchange'], reference['ticker'], date, accession)
+  @staticmethod
+  def report_timings(timings: list[tuple], elapsed: float, timings_file: str):
+      with open(timings_file, 'w', newline='') as f:
+          wr = csv.writer(f)
+          wr.writerow(['file', 'chars', 'sections', 'seconds', 'worker'])
+          wr.writerows(timings)
+      if not timings:
+          print('===== No 10-K filings extracted ====')
+          return
+      seconds = sorted(timing[3] for timing in timings)
+      chars = sum(timing[1] for timing in timings)
+      print(f'===== Extracted {len(timings)} 10-K filings ({chars / 2**20:.1f} M chars) in {elapsed:.2f}s, '
+            f'{len(timings) / elapsed:.1f} filings/s on {len({timing[4] for timing in timings})} workers ====')
+      print(f'per filing: median {seconds[len(seconds) // 2] * 1000:.1f} ms, '
+            f'p95 {seconds[int(len(seconds) * 0.95)] * 1000:.1f} ms, max {seconds[-1] * 1000:.1f} ms; '
+            f'timings in {timings_file}')
+
+  def process_store_filings(self, store: FilingStore, cik_cusip_csv: str, output_directory: str, forms: list[str] = ['10-K'],
+                            output_format: str = 'json', compression: str = None, chunk_tokens: int = None):
+          if not os.path.exists(output_directory):
+              os.makedirs(output_directory)
+          crosswalk = self.load_reference(cik_cusip_csv)
+          ciks = list(crosswalk.records)
+          writer = self.open_sections_writer(output_directory, output_format, compression, chunk_tokens)
+
+          for record, raw_txt in store.iter_filings(ciks=ciks, forms=forms):
+              cik, date, accession = str(record['cik']), record['date_filed'], record['accession']
+              file_id = f"{cik}_{date}_{accession.split('-')[-1]}"
+              print(f"Processing: {cik} - {date} - {file_id}")
+              output_file_path = os.path.join(output_directory, f"{file_id}.json")
+              if writer is None and os.path.exists(output_file_path):
+                  continue
+              reference = crosswalk.lookup('cik', cik)
+
+              self.parse_save(raw_txt, output_file_path, cik, *self.reference_fields(reference), date, accession, writer)
+          if writer is not None:
+              writer.close()
 
   def extract_10_k(self, txt: str) -> str:
-      # Regex to find <DOCUMENT> tags
-      doc_start_pattern = re.compile(r'<DOCUMENT>')
-      doc_end_pattern = re.compile(r'</DOCUMENT>')
-      # Regex to find <TYPE> tag proceeding any characters, terminating at new line
-      type_pattern = re.compile(r'<TYPE>[^\n]+')
-      # Create 3 lists with the span idices for each regex
-
-      # There are many <Document> Tags in this text file, each as specific exhibit like 10-K, EX-10.17 etc
-      # First filter will give us document tag start <end> and document tag end's <start>
-      # We will use this to later grab content in between these tags
-      doc_start_is = [x.end() for x in doc_start_pattern.finditer(txt)]
-      doc_end_is = [x.start() for x in doc_end_pattern.finditer(txt)]
-
-      # Type filter is interesting, it looks for <TYPE> with Not flag as new line, ie terminare there, with + sign
-      # to look for any char afterwards until new line \n. This will give us <TYPE> followed Section Name like '10-K'
-      # Once we have this, it returns String Array, below line will with find content after <TYPE> ie, '10-K'
-      # as section names
-      doc_types = [x[len('<TYPE>'):] for x in type_pattern.findall(txt)]
-      # Create a loop to go through each section type and save only the 10-K section in the dictionary
-      # there is just one 10-K section
-      for doc_type, doc_start, doc_end in zip(doc_types, doc_start_is, doc_end_is):
-          if doc_type == '10-K':
-              return txt[doc_start:doc_end]
-          else:
-              return ""
+      # There are many <DOCUMENT> tags in this text file, each a specific exhibit like 10-K, EX-10.17 etc.
+      # Return the body of the 10-K document, or "" if the submission has none
+      doc = SecSubmission(txt).find('10-K')
+      return doc.text() if doc is not None else ""
           
   def beautify_text(self, txt: str) -> str:
       stg_txt = BeautifulSoup(txt, 'lxml')
@@ -88,26 +245,56 @@ class Form10kExtractor:
       # Add section end using start of next section
       all_pos_df['sectionEnd'] = all_pos_df.start.iloc[1:].tolist() + [len(doc)]
       # filter to just the sections we care about
-      sections = ['item1', 'item1a', 'item1b','item2','item3', 'item7', 'item7a', 'item8', 'item10', 'item11', 'item15']
       res = dict()
       # Iterate over the sections directly, accessing each from the original DataFrame
-      for section in sections:
+      for section in SECTIONS:
           if section in all_pos_df.index:  # Check if the section exists in the DataFrame
               row = all_pos_df.loc[section]
               res[section] = self.extract_text(row, doc).encode('utf-8', 'ignore').decode('utf-8')
       return res
 
-  def load_parse_save(self, input_file_path: str, output_file_path: str, cik: str, cusips: list[str], name: str, primaryExchange: str, ticker: str, date: str, accession: str):
-      if os.path.exists(output_file_path):
+  def extract_sections(self, doc: str) -> Dict[str, str]:
+      # same output as extract_section_text: one regex pass for the boundaries, lxml streaming for the text
+      boundaries = item_boundaries(doc)
+      res = dict()
+      for section in SECTIONS:
+          if section in boundaries:
+              start, end = boundaries[section]
+              section_txt = doc[start:end].replace('Error! Bookmark not defined.', '')
+              res[section] = html_to_text(section_txt).encode('utf-8', 'ignore').decode('utf-8')
+      return res
+
+  def load_parse_save(self, input_file_path: str, output_file_path: str, cik: str, cusips: list[str], name: str, primaryExchange: str, ticker: str, date: str, accession: str,
+                      writer: RecordWriter = None):
+      if writer is None and os.path.exists(output_file_path):
           return
       with open(input_file_path, 'r', encoding='utf-8') as file:
           raw_txt = file.read()
       print(f'Extracting 10-K from {input_file_path}')
+      self.parse_save(raw_txt, output_file_path, cik, cusips, name, primaryExchange, ticker, date, accession, writer)
+
+  def parse_save(self, raw_txt: str, output_file_path: str, cik: str, cusips: list[str], name: str, primaryExchange: str, ticker: str, date: str, accession: str,
+                 writer: RecordWriter = None):
+      cleaned_json_txt = self.parse(raw_txt, cik, cusips, name, primaryExchange, ticker, date, accession)
+      self.save_record(cleaned_json_txt, output_file_path, writer)
+
+  def save_record(self, cleaned_json_txt: Dict | None, output_file_path: str, writer: RecordWriter = None):
+      if cleaned_json_txt is None:
+          return
+      # a shared writer streams the record into one corpus file instead of its own JSON file
+      if writer is not None:
+          writer.write(cleaned_json_txt)
+          return
+
+      with open(output_file_path, 'w', encoding='utf-8') as json_file:
+          json.dump(cleaned_json_txt, json_file, indent=4, ensure_ascii=False)
+
+  def parse(self, raw_txt: str, cik: str, cusips: list[str], name: str, primaryExchange: str, ticker: str, date: str, accession: str) -> Dict | None:
       doc = self.extract_10_k(raw_txt)
       if doc == "":
-          return
+          return None
 
-      cleaned_json_txt = self.extract_section_text(doc)
+      cleaned_json_txt = self.extract_sections(doc)
       cleaned_json_txt['cik'] = cik
       cleaned_json_txt['cusips'] = cusips
       cleaned_json_txt['name'] = name
@@ -115,6 +302,4 @@ class Form10kExtractor:
       cleaned_json_txt['ticker'] = ticker
       cleaned_json_txt['date'] = date
       cleaned_json_txt['accession '] = accession 
-
-      with open(output_file_path, 'w', encoding='utf-8') as json_file:
-          json.dump(cleaned_json_txt, json_file, indent=4, ensure_ascii=False)
\ No newline at end of file
+      return cleaned_json_txt
\ No newline at end of file
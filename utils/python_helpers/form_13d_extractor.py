@@ -1,8 +1,10 @@
 import re
 import sys
 from glob import glob
-import json
 import os
+from .filing_store import FilingStore
+from .record_io import RecordWriter, output_path
+from .sgml_submission import SecSubmission
 def extract_company_name(text):
     # Extract company name
     name_match = re.search(r"COMPANY CONFORMED NAME:\s*(.+)", text)
@@ -41,39 +43,65 @@ def extract_cusip(text):
     
     return None
 
-def process_directory(input_directory: str, output_dir: str):
+def extract_record(text: str, cik: str, date: str, accession: str):
+    submission = SecSubmission(text)
+    company_name = submission.subject_company().get("COMPANY CONFORMED NAME") or extract_company_name(text)
+    document = submission.documents[0] if submission.documents else None
+    cusip = extract_cusip(document.text() if document is not None else text)
+    if not cusip:
+        return None
+    print("CIK:", cik)
+    print("Company Name:", company_name)
+    print("CUSIP:", cusip)
+    return {
+        "CIK": cik,
+        "companyName": company_name,
+        "CUSIP": cusip,
+        "date": date,
+        "accession": accession
+    }
+
+def report_results(written: int, failures: list):
+    print(f'===== Processed {written} files ====')
+    print(f'===== Had {len(failures)} failed file parsings ====')
+    print(failures)
+
+def open_results_writer(output_dir: str, output_format: str = "json", compression: str = None) -> RecordWriter:
+    # records are streamed to 13d-data.json / .ndjson[.gz] / .parquet as they are extracted
+    return RecordWriter(output_path(f"{output_dir}/13d-data", output_format, compression), compression=compression)
+
+def process_directory(input_directory: str, output_dir: str, output_format: str = "json", compression: str = None):
     files = glob(f"{input_directory}/*/*")
     if not files:
         print(f'No files found in {input_directory}')
         return
-    results = []
     failures = []
-    for file in files:
-        if file.endswith(".txt"):
-            file_id = os.path.splitext(os.path.split(file)[1])[0]
-            cik,date,accession = file_id.split("_")
+    with open_results_writer(output_dir, output_format, compression) as writer:
+        for file in files:
+            if file.endswith(".txt"):
+                file_id = os.path.splitext(os.path.split(file)[1])[0]
+                cik,date,accession = file_id.split("_")
 
-            print("Processing", file)
-            with open(file, 'r') as f:
-                text = f.read()
+                print("Processing", file)
+                with open(file, 'r') as f:
+                    text = f.read()
 
-            company_name = extract_company_name(text)
-            cusip = extract_cusip(text)
-            if cusip:
-                results.append({
-                    "CIK": cik,
-                    "companyName": company_name,
-                    "CUSIP": cusip,
-                    "date": date,
-                    "accession": accession
-                })
-                print("CIK:", cik)
-                print("Company Name:", company_name)
-                print("CUSIP:", cusip)
-            else:
-                failures.append(file)
-    print(f'===== Processed {len(results)} files ====')
-    print(f'===== Had {len(failures)} failed file parsings ====')
-    print(failures)
-    json.dump(results, open(f"{output_dir}/13d-data.json", 'w'), indent=4)
+                record = extract_record(text, cik, date, accession)
+                if record:
+                    writer.write(record)
+                else:
+                    failures.append(file)
+    report_results(writer.count, failures)
 
+def process_store(store: FilingStore, output_dir: str, forms: list[str] = ["SC 13D", "SC 13D/A"],
+                  output_format: str = "json", compression: str = None):
+    failures = []
+    with open_results_writer(output_dir, output_format, compression) as writer:
+        for filing, text in store.iter_filings(forms=forms):
+            print("Processing", filing["accession"])
+            record = extract_record(text, str(filing["cik"]), filing["date_filed"], filing["accession"].split("-")[-1])
+            if record:
+                writer.write(record)
+            else:
+                failures.append(filing["accession"])
+    report_results(writer.count, failures)
@@ -1,12 +1,23 @@
 # Extract 13F-HR data
 
 from datetime import datetime
-from typing import List, Dict
+from multiprocessing import Pool
+from typing import Iterator, List, Dict
+import xml.etree.ElementTree as ET
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import xmltodict
 from glob import glob
 import json
+import os
+from .cusip_cik_parsing import pool_size
+from .filing_store import FilingStore, FILING_PATH_PATTERN
+from .holdings_store import HoldingsStore
+from .identifiers import estimate_cusip6s
+from .record_io import RecordWriter, output_path
+from .sgml_submission import SecSubmission
 FILING_MANAGER_ADDRESS_COL = 'managerAddress'
 FILING_MANAGER_NAME_COL = 'managerName'
 FILING_MANAGER_CIK_COL = 'managerCik'
@@ -17,38 +28,144 @@ COMPANY_NAME_COL = 'companyName'
 SOURCE_ID_COL = 'source'
 VALUE_COL = 'value'
 SHARES_COL = 'shares'
+# infoTable fields read by filter_and_format; sshPrnamt and sshPrnamtType are nested under shrsOrPrnAmt
+INFO_TABLE_FIELDS = {'nameOfIssuer', 'titleOfClass', 'cusip', 'value', 'sshPrnamt', 'sshPrnamtType'}
+XML_FEED_SIZE = 1 << 16
+
+
+def iter_xml_events(xml: str, events: tuple[str, ...] = ('end',)) -> Iterator[tuple[str, ET.Element]]:
+    # fed in slices, unlike iterparse over a StringIO, so no second full-size copy of the document is made
+    parser = ET.XMLPullParser(events=events)
+    for offset in range(0, len(xml), XML_FEED_SIZE):
+        parser.feed(xml[offset:offset + XML_FEED_SIZE])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+# column layout of parsed holdings, as streamed to disk by parse_from_dir_parallel
+FILING_SCHEMA = pa.schema([
+    (FILING_MANAGER_CIK_COL, pa.string()),
+    (FILING_MANAGER_NAME_COL, pa.string()),
+    (FILING_MANAGER_ADDRESS_COL, pa.string()),
+    (REPORT_PERIOD_COL, pa.date32()),
+    (COMPANY_CUSIP_COL, pa.string()),
+    (COMPANY_CUSIP6_COL, pa.string()),
+    (COMPANY_NAME_COL, pa.string()),
+    (VALUE_COL, pa.float64()),
+    (SHARES_COL, pa.int64()),
+    (SOURCE_ID_COL, pa.string()),
+])
 class Form13F_HR_Extractor:
 
-    def __init__(self, input_dir: str, output_dir: str, output_filename: str = '13f_hr_data.json') -> None:
+    def __init__(self, input_dir: str, output_dir: str, output_filename: str = '13f_hr_data.json',
+                 output_format: str = 'json', compression: str = None) -> None:
         self.input_directory = input_dir
+        self.output_dir = output_dir
         self.output_filename = output_filename
         self.output_json_file = f"{output_dir}/{output_filename}"
+        # ndjson/parquet outputs are streamed to <output_filename stem>.ndjson[.gz] / .parquet
+        self.output_compression = compression
+        self.output_file = self.output_json_file if output_format == 'json' else \
+            output_path(f"{output_dir}/{os.path.splitext(output_filename)[0]}", output_format, compression)
+        self.parsed_parquet_file = f"{output_dir}/13f_hr_filings.parquet"
+        self.failures_json_file = f"{output_dir}/13f_hr_failures.json"
     
-    def process_directory_files(self, top_n_periods: int = None):
+    def process_directory_files(self, top_n_periods: int = None, parallel: bool = False, max_workers: int = None):
         # <root>/<yyyy_mm>/<cik>_<yyyy>-<mm>-<dd>_<sequence>.txt
         files = glob(f"{self.input_directory}/*/*")
-        print(files)
         if not files:
             print(f'No files found in {self.input_directory}')
             return
-        filings_df, failures = self.parse_from_dir(files)
+        print(f'Found {len(files)} files in {self.input_directory}')
+        if parallel:
+            parsed_file, failures = self.parse_from_dir_parallel(files, max_workers=max_workers)
+            filings_df = pd.read_parquet(parsed_file)
+        else:
+            filings_df, failures = self.parse_from_dir(files)
+        return self.aggregate_and_save(filings_df, failures, top_n_periods)
+
+    def process_store_filings(self, store: FilingStore, top_n_periods: int = None, forms: list[str] = ['13F-HR'],
+                              date_range: tuple[str, str] = None):
+        filings_df, failures = self.parse_from_store(store, forms=forms, date_range=date_range)
+        return self.aggregate_and_save(filings_df, failures, top_n_periods)
+
+    def process_directory_incremental(self, holdings_store: HoldingsStore, top_n_periods: int = None, parallel: bool = False,
+                                      max_workers: int = None, retry_failed: bool = False, write_output: bool = True):
+        """Parse only filings whose accession is not in `holdings_store` yet and merge them into its period partitions.
+
+        Filings that failed before are skipped unless `retry_failed`. With
+        `write_output` the `top_n_periods` most recent periods are then written to
+        `output_file`, as `process_directory_files` does.
+        """
+        ingested = holdings_store.ingested_accessions(include_failed=not retry_failed)
+        new_files = {}
+        for path in glob(f"{self.input_directory}/*/*.txt"):
+            match = FILING_PATH_PATTERN.search(os.path.basename(path))
+            # keyed like FilingStore.import_directory, as the file name has no full accession number
+            if match and '-'.join(match.groups()) not in ingested:
+                new_files[path] = match.groups()
+        print(f'Found {len(new_files)} new filings in {self.input_directory}')
+
+        if new_files:
+            if parallel:
+                parsed_file, failures = self.parse_from_dir_parallel(list(new_files), max_workers=max_workers)
+                filings_df = pd.read_parquet(parsed_file)
+                failures = {failure['file']: f"{failure['error']}: {failure['message']}" for failure in failures}
+            else:
+                filing_dfs = []
+                failures = {}
+                for path in new_files:
+                    try:
+                        filing_dfs.append(self.parse_file(path))
+                    except Exception as e:
+                        failures[path] = f'{type(e).__name__}: {e}'
+                filing_dfs = [df for df in filing_dfs if not df.empty]
+                filings_df = self.combine_filings(filing_dfs) if filing_dfs else pd.DataFrame()
+            rows = {}
+            if not filings_df.empty:
+                stg_df = self.aggregate_data(filings_df)
+                touched = holdings_store.merge(stg_df)
+                print(f'===== Updated {len(touched)} report periods: {", ".join(touched)} ====')
+                rows = stg_df.groupby(SOURCE_ID_COL).size().to_dict()
+            records = []
+            for path, (cik, date, sequence) in new_files.items():
+                accession = f'{cik}-{date}-{sequence}'
+                source = self.source_id(cik, date, sequence)
+                if path in failures:
+                    records.append({'accession': accession, 'source': source, 'status': HoldingsStore.FAILED, 'error': failures[path]})
+                else:
+                    records.append({'accession': accession, 'source': source, 'status': HoldingsStore.DONE, 'rows': rows.get(source, 0)})
+            holdings_store.mark(records)
+            print(f'===== Had {len(failures)} failed file parsings ====')
+            for path, error in failures.items():
+                print(f'{path}: {error}')
+
+        if write_output:
+            self.save_output(holdings_store.read(top_n_periods=top_n_periods))
+        return 0
+
+    def aggregate_and_save(self, filings_df: pd.DataFrame, failures: list[str], top_n_periods: int = None):
         stg_df = self.aggregate_data(filings_df)
         if top_n_periods is not None:
             stg_df = self.filter_data(stg_df, top_n_periods)
-        # pandas to_json outputs urls with a redundant backslash
-        # stg_df.to_json(path_or_buf=self.output_json_file, indent=4, orient='records')
-
-        results = stg_df.to_dict(orient='records')
-        with open(self.output_json_file, 'w') as f:
-            json.dump(results, f, indent=4, default=str)
- 
-        print(f'===== Processed {len(stg_df)} files ====')
+        self.save_output(stg_df)
 
         print(f'===== Had {len(failures)} failed file parsings ====')
         for failure in failures:
             print(failure)
         return 0
 
+    def save_output(self, stg_df: pd.DataFrame):
+        # pandas to_json outputs urls with a redundant backslash
+        # stg_df.to_json(path_or_buf=self.output_json_file, indent=4, orient='records')
+
+        # rows are converted and written a chunk at a time rather than as one list of dicts
+        with RecordWriter(self.output_file, compression=self.output_compression) as writer:
+            writer.write_frame(stg_df)
+ 
+        print(f'===== Processed {len(stg_df)} files ====')
+
     # function to strip namespaces post xmltodict transformation
     def strip_ns(self, x):
         if isinstance(x, dict):
@@ -62,32 +179,56 @@ class Form13F_HR_Extractor:
         return x_striped
 
 
-    def extract_submission_info(self, contents: list[str]) -> str:
+    def extract_submission_info(self, xml: str) -> str:
         namespaces = {
             'http://www.sec.gov/edgar/common/': None, # skip this namespace
         }
-        xml = contents[1].split('</XML>')[0].strip()
         return self.strip_ns(xmltodict.parse(xml, process_namespaces=True, namespaces=namespaces))['edgarSubmission']
     
-    def extract_file_id(self, contents: str) -> str:
+    def extract_file_id(self, xml: str) -> str:
             namespaces = {
                 'http://www.sec.gov/edgar/common/': None, # skip this namespace
             }
-            xml = contents[1].split('</XML>')[0].strip()
             return self.strip_ns(xmltodict.parse(xml, process_namespaces=True, namespaces=namespaces))['edgarSubmission']
 
 
 
-    def extract_investment_info(self, contents: str) -> str:
-        xml = contents[2].split('</XML>')[0].strip()
+    def extract_investment_info(self, xml: str) -> str:
         return self.strip_ns(xmltodict.parse(xml))['informationTable']['infoTable']
 
 
+    def iter_investment_info(self, xml: str) -> Iterator[Dict]:
+        """Stream the infoTable rows of an information table, shaped like `extract_investment_info` rows.
+
+        Only the fields `filter_and_format` reads are kept. Tags are matched on
+        their local name, whatever namespace prefix the filer used, and each
+        infoTable element is discarded once it has been read.
+        """
+        root = None
+        for event, elem in iter_xml_events(xml, ('start', 'end')):
+            if root is None:
+                root = elem
+            if event != 'end' or elem.tag.rpartition('}')[2] != 'infoTable':
+                continue
+            fields = dict.fromkeys(INFO_TABLE_FIELDS, '')
+            for child in elem.iter():
+                tag = child.tag.rpartition('}')[2]
+                if tag in INFO_TABLE_FIELDS:
+                    fields[tag] = (child.text or '').strip()
+            yield {
+                'nameOfIssuer': fields['nameOfIssuer'],
+                'titleOfClass': fields['titleOfClass'],
+                'cusip': fields['cusip'],
+                'value': fields['value'],
+                'shrsOrPrnAmt': {'sshPrnamt': fields['sshPrnamt'], 'sshPrnamtType': fields['sshPrnamtType']},
+            }
+            # drops this row and any siblings already read
+            root.clear()
+
+
     def estimate_cusip6(self, cusip: str) -> str:
-        # Padding of 3 zeros is suspect - likely has a padded zero. This is inconsistent among form13 filers
-        if cusip.startswith('000'):
-            return cusip.upper()[1:7]
-        return cusip.upper()[:6]
+        # Padding of 3 zeros is suspect - likely has a padded zero, unless the CUSIP is valid as written
+        return estimate_cusip6s([cusip]).iloc[0]
 
 
     def filter_and_format(self, info_tables: str, manager_address: str, manager_cik: str, manager_name: str,
@@ -119,7 +260,6 @@ class Form13F_HR_Extractor:
                     FILING_MANAGER_ADDRESS_COL: manager_address,
                     REPORT_PERIOD_COL: report_period,
                     COMPANY_CUSIP_COL: info_table['cusip'].upper(),
-                    COMPANY_CUSIP6_COL: self.estimate_cusip6(info_table['cusip']),
                     COMPANY_NAME_COL: info_table['nameOfIssuer'],
                     VALUE_COL: info_table['value'].replace(' ', '') + '000',
                     SHARES_COL: info_table['shrsOrPrnAmt']['sshPrnamt']})
@@ -127,18 +267,37 @@ class Form13F_HR_Extractor:
 
 
     def extract_dicts(self, txt: str) -> List[Dict]:
-        contents = txt.split('<XML>')
-        submt_dict = self.extract_submission_info(contents)
+        # the first two XML documents are the 13F-HR cover page and the INFORMATION TABLE
+        xml_docs = [xml for xml in (doc.xml() for doc in SecSubmission(txt).documents) if xml is not None]
+        submt_dict = self.extract_submission_info(xml_docs[0])
         mng_cik = submt_dict['headerData']['filerInfo']['filer']['credentials']['cik']
         mng_name = submt_dict['formData']['coverPage']['filingManager']['name']
         try:
             mng_address = ", ".join(list(submt_dict['formData']['coverPage']['filingManager']['address'].values()))
-        except:
-            print(submt_dict['formData']['coverPage']['filingManager']['address'])
-            exit()
+        except Exception:
+            # raised rather than exiting so a bad filing only fails itself, also inside pool workers
+            raise ValueError(f"Unparseable manager address: {submt_dict['formData']['coverPage']['filingManager'].get('address')}")
         report_period = submt_dict['formData']['coverPage']['reportCalendarOrQuarter']
-        info_dict = self.extract_investment_info(contents)
-        return self.filter_and_format(info_dict, mng_address, mng_cik, mng_name, report_period)
+        info_tables = self.iter_investment_info(xml_docs[1])
+        return self.filter_and_format(info_tables, mng_address, mng_cik, mng_name, report_period)
+
+
+    def parse_filing(self, txt: str, cik: str, date: str, sequence: str) -> pd.DataFrame:
+        filing = self.extract_dicts(txt)
+        tmp_filing_df = pd.DataFrame(filing)
+        tmp_filing_df[SOURCE_ID_COL] = self.source_id(cik, date, sequence)
+        return tmp_filing_df
+
+
+    def source_id(self, cik: str, date: str, sequence: str) -> str:
+        # edgar files are formated {cik}-{yy}-{sequence}.txt
+        return f'https://sec.gov/Archives/edgar/data/{cik}-{date[-2:]}-{sequence}.txt'
+
+
+    def parse_file(self, path: str) -> pd.DataFrame:
+        with open(path, 'r') as file:
+            cik,date,sequence = os.path.basename(path).split('.')[0].split('_')
+            return self.parse_filing(file.read(), cik, date, sequence)
 
 
     def parse_from_dir(self, file_paths: list[str]):
@@ -149,21 +308,79 @@ class Form13F_HR_Extractor:
             if path.endswith('.txt'):
                 print(f'parsing {path}')
                 try:
-                    with open(path, 'r') as file:
-                        filing = self.extract_dicts(file.read())
-                        tmp_filing_df = pd.DataFrame(filing)
-                        cik,date,sequence = path.split('\\')[-1].split('.')[0].split('_')
-                        # edgar files are formated {cik}-{yy}-{sequence}.txt
-                        tmp_filing_df[SOURCE_ID_COL] = f'https://sec.gov/Archives/edgar/data/{cik}-{date[-2:]}-{sequence}.txt'
-                        filing_dfs.append(tmp_filing_df)
+                    filing_dfs.append(self.parse_file(path))
                 except Exception as e:
                     print(e)
                     failures.append(path)
+        return self.combine_filings(filing_dfs), failures
+
+
+    def parse_batch(self, file_paths: list[str]) -> tuple[pa.Table | None, list[dict]]:
+        """Parse a batch of filings in a pool worker into one Arrow table plus failure records."""
+        filing_dfs = []
+        failures = []
+        for path in file_paths:
+            try:
+                filing_dfs.append(self.parse_file(path))
+            except Exception as e:
+                failures.append({'file': path, 'error': type(e).__name__, 'message': str(e)})
+        filing_dfs = [df for df in filing_dfs if not df.empty]
+        if not filing_dfs:
+            return None, failures
+        filing_df = self.combine_filings(filing_dfs)
+        return pa.Table.from_pandas(filing_df[FILING_SCHEMA.names], schema=FILING_SCHEMA, preserve_index=False), failures
+
+
+    def parse_from_dir_parallel(self, file_paths: list[str], max_workers: int = None, batch_size: int = 32) -> tuple[str, list[dict]]:
+        """Parse filings across a process pool, streaming each worker's batch to a Parquet file as it completes.
+
+        Memory stays bounded by the batches in flight rather than the whole corpus.
+        Returns the Parquet file and the failure records, which are also written
+        to `failures_json_file`.
+        """
+        file_paths = [path for path in file_paths if path.endswith('.txt')]
+        batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+        failures = []
+        parsed = 0
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_file = f'{self.parsed_parquet_file}.tmp'
+        with pq.ParquetWriter(tmp_file, FILING_SCHEMA) as writer, Pool(pool_size(len(batches), max_workers)) as p:
+            for batch, batch_failures in p.imap_unordered(self.parse_batch, batches):
+                if batch is not None:
+                    writer.write_table(batch)
+                failures.extend(batch_failures)
+                parsed += batch_size
+                print(f'parsed {min(parsed, len(file_paths))}/{len(file_paths)} files, {len(failures)} failures')
+        os.replace(tmp_file, self.parsed_parquet_file)
+        with open(self.failures_json_file, 'w') as f:
+            json.dump(failures, f, indent=4)
+        return self.parsed_parquet_file, failures
+
+
+    def parse_from_store(self, store: FilingStore, forms: list[str] = ['13F-HR'], date_range: tuple[str, str] = None):
+        filing_dfs = []
+        failures = []
+        for record, txt in store.iter_filings(forms=forms, date_range=date_range):
+            try:
+                sequence = record['accession'].split('-')[-1]
+                filing_dfs.append(self.parse_filing(txt, str(record['cik']), record['date_filed'], sequence))
+            except Exception as e:
+                print(e)
+                failures.append(record['accession'])
+        return self.combine_filings(filing_dfs), failures
+
+
+    def combine_filings(self, filing_dfs: list[pd.DataFrame]) -> pd.DataFrame:
         filing_df = pd.concat(filing_dfs, ignore_index=True)
+        if COMPANY_CUSIP_COL in filing_df:
+            # Padding of 3 zeros is suspect - likely has a padded zero. This is inconsistent among form13 filers,
+            # so the column is estimated for all rows at once, trusting a '000' CUSIP whose check digit is valid
+            filing_df.insert(filing_df.columns.get_loc(COMPANY_CUSIP_COL) + 1, COMPANY_CUSIP6_COL,
+                             estimate_cusip6s(filing_df[COMPANY_CUSIP_COL]))
         filing_df[REPORT_PERIOD_COL] = pd.to_datetime(filing_df[REPORT_PERIOD_COL]).dt.date
         filing_df[VALUE_COL] = filing_df[VALUE_COL].astype(float)
         filing_df[SHARES_COL] = filing_df[SHARES_COL].astype(np.int64)
-        return filing_df, failures
+        return filing_df
 
 
     # This data contains duplicates where an asset is reported more than once for the same filing manager within the same
@@ -0,0 +1,236 @@
+import glob
+import os
+from multiprocessing import Pool
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from .cusip_cik_parsing import pool_size
+from .sec_nport_processor import (
+    FUND_FIELDS,
+    HOLDING_FIELDS,
+    iter_nport_holdings,
+    load_json_securities,
+    match_securities,
+    normalize_name,
+    nport_fund_info,
+)
+
+# holding fields read for the matrix; pctVal is the position as a percent of the fund's net assets
+FUND_HOLDING_FIELDS = {**HOLDING_FIELDS, 'pctVal': 'pct', 'valUSD': 'value'}
+SECURITY_COLUMNS = ['key', 'name', 'cusip', 'isin', 'lei']
+# (fund, fund) pairs expanded at once by `overlap`; bounds its memory to a few hundred MB
+PAIR_BUDGET = 16_000_000
+WEIGHTS_FILENAME = 'weights.npz'
+FUNDS_FILENAME = 'funds.parquet'
+SECURITIES_FILENAME = 'securities.parquet'
+
+
+def security_key(sec: dict) -> str:
+    """The column a holding is filed under: its CUSIP, else its ISIN, else its normalized issuer name (or title)."""
+    cusip = (sec.get('cusip') or '').strip().upper()
+    if len(cusip) == 9 and cusip != '000000000':
+        return cusip
+    isin = (sec.get('isin') or '').strip().upper()
+    if isin and isin != 'N/A':
+        return isin
+    name = sec.get('name') if sec.get('name') not in (None, '', 'N/A') else sec.get('title')
+    return f"NAME:{normalize_name(name or '')}"
+
+
+def _read_fund(path: str) -> tuple[dict, dict]:
+    """Fund info and the long positions of one N-PORT file, as columns; runs in a pool worker."""
+    info = {**nport_fund_info(path), 'file': path}
+    columns = {column: [] for column in SECURITY_COLUMNS + ['weight', 'value']}
+    for sec in iter_nport_holdings(path, FUND_HOLDING_FIELDS):
+        try:
+            weight = float(sec['pct']) / 100
+        except (TypeError, ValueError):
+            continue
+        if not weight > 0:
+            continue
+        columns['key'].append(security_key(sec))
+        for column in ('name', 'cusip', 'isin', 'lei'):
+            columns[column].append(sec[column])
+        columns['weight'].append(weight)
+        columns['value'].append(float(sec['value'] or 0))
+    return info, columns
+
+
+def load_sectors(sector_directory: str = '../../data/sector_data') -> pd.DataFrame:
+    """Symbol, Sector, Industry and Sub-Industry from every CSV under `sector_directory`, one row per symbol."""
+    frames = [pd.read_csv(path) for path in sorted(glob.glob(f'{sector_directory}/*.csv'))]
+    return pd.concat(frames, ignore_index=True).drop_duplicates('Symbol')
+
+
+class FundHoldings:
+    """Holdings of many funds as one sparse (fund x security) matrix of portfolio weights.
+
+    `weights[f, s]` is security s as a fraction of fund f's net assets
+    (pctVal / 100); short and zero positions are left out. `funds` and
+    `securities` are frames describing the rows and columns. Overlap and
+    concentration queries are sparse products and reductions over `weights`.
+    """
+
+    def __init__(self, funds: pd.DataFrame, securities: pd.DataFrame, weights: sparse.csr_matrix) -> None:
+        self.funds = funds.reset_index(drop=True)
+        self.securities = securities.reset_index(drop=True)
+        self.weights = sparse.csr_matrix(weights)
+
+    @classmethod
+    def from_nport_files(cls, files: list[str], reference_file: str | None = None,
+                         max_workers: int | None = None) -> 'FundHoldings':
+        """Parse N-PORT files in a process pool into one matrix, one row per file.
+
+        With `reference_file` (e.g. sec_company_tickers.json), each security
+        is matched once with `match_securities` and gets the cik and ticker
+        that `sector_exposure` needs.
+        """
+        if not files:
+            funds = pd.DataFrame(columns=[*FUND_FIELDS.values(), 'file', 'value'])
+            return cls(funds, pd.DataFrame(columns=SECURITY_COLUMNS), sparse.csr_matrix((0, 0)))
+        with Pool(pool_size(len(files), max_workers)) as p:
+            results = p.map(_read_fund, files, chunksize=1)
+
+        funds = pd.DataFrame([info for info, _ in results])
+        holdings = pd.concat([pd.DataFrame(columns).assign(fund=row) for row, (_, columns) in enumerate(results)],
+                             ignore_index=True)
+        codes, keys = pd.factorize(holdings['key'])
+        # the first filing of a security describes it; factorize codes follow the same first-appearance order
+        securities = holdings.drop_duplicates('key')[SECURITY_COLUMNS].reset_index(drop=True)
+        weights = sparse.csr_matrix((holdings['weight'].to_numpy(), (holdings['fund'].to_numpy(), codes)),
+                                    shape=(len(funds), len(keys)))
+        weights.sum_duplicates()
+        funds['value'] = np.bincount(holdings['fund'], weights=holdings['value'], minlength=len(funds))
+
+        if reference_file is not None:
+            matches = match_securities(securities.to_dict(orient='records'), load_json_securities(reference_file))
+            securities['cik'] = pd.array([match.get('cik') if match else None for match in matches], dtype='Int64')
+            securities['ticker'] = [(match.get('ticker') or (match.get('tickers') or [None])[0]) if match else None
+                                    for match in matches]
+        return cls(funds, securities, weights)
+
+    @classmethod
+    def from_directory(cls, input_directory: str, reference_file: str | None = None,
+                       max_workers: int | None = None) -> 'FundHoldings':
+        return cls.from_nport_files(sorted(glob.glob(f'{input_directory}/*.xml')), reference_file, max_workers)
+
+    def _fund_labels(self) -> pd.Index:
+        """One unique label per fund row: the series id, then `seriesId@periodEnd` for a series filed for several
+        periods, then the file path for what is still ambiguous."""
+        stems = self.funds['file'].map(lambda path: Path(path).stem)
+        labels = self.funds['seriesId'].fillna(stems).astype(str)
+        repeated = labels.duplicated(keep=False)
+        labels = labels.where(~repeated, labels + '@' + self.funds['periodEnd'].fillna('').astype(str))
+        repeated = labels.duplicated(keep=False)
+        labels = labels.where(~repeated, self.funds['file'].astype(str))
+        return pd.Index(labels, name='fund')
+
+    def _rows(self, funds) -> np.ndarray:
+        """Row numbers of `funds`, given as row numbers or fund labels (see `_fund_labels`)."""
+        labels = self._fund_labels()
+        if not labels.is_unique:
+            raise ValueError('Fund labels are not unique; the same N-PORT file was ingested more than once')
+        return np.array([fund if isinstance(fund, (int, np.integer)) else labels.get_loc(fund) for fund in funds],
+                        dtype=np.int64)
+
+    def overlap(self) -> pd.DataFrame:
+        """Pairwise weight overlap: for funds a and b, the sum over securities of min(weight in a, weight in b).
+
+        Column by column, every pair of funds holding the security is expanded
+        from the CSC arrays and the pairwise minimums are summed into the
+        (fund, fund) grid with one bincount per chunk of columns. The diagonal
+        is each fund's total long weight.
+        """
+        csc = self.weights.tocsc()
+        n = csc.shape[0]
+        lengths = np.diff(csc.indptr)
+        pair_ends = np.cumsum(lengths ** 2)
+        total = np.zeros(n * n)
+        start = 0
+        while start < len(lengths):
+            stop = max(int(np.searchsorted(pair_ends, pair_ends[start] - lengths[start] ** 2 + PAIR_BUDGET, 'right')),
+                       start + 1)
+            columns = np.repeat(np.arange(start, stop), lengths[start:stop])
+            entries = np.arange(csc.indptr[start], csc.indptr[stop])
+            counts = lengths[columns]
+            left = np.repeat(entries, counts)
+            right = np.repeat(csc.indptr[columns] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            total += np.bincount(csc.indices[left] * n + csc.indices[right],
+                                 weights=np.minimum(csc.data[left], csc.data[right]), minlength=n * n)
+            start = stop
+        labels = self._fund_labels()
+        return pd.DataFrame(total.reshape(n, n), index=labels, columns=labels)
+
+    def common_holdings(self) -> pd.DataFrame:
+        """Number of securities each pair of funds both hold, as the product of the 0/1 holdings matrix."""
+        held = self.weights.copy()
+        held.data[:] = 1
+        labels = self._fund_labels()
+        return pd.DataFrame((held @ held.T).toarray(), index=labels, columns=labels)
+
+    def top_shared_holdings(self, n: int = 20, funds: list | None = None) -> pd.DataFrame:
+        """The securities held by the most of `funds` (default all), then by the weight every one of them holds.
+
+        `funds` counts the funds holding the security, `shared_weight` is its
+        smallest weight across `funds` (its contribution to their overlap) and
+        `total_weight` the sum of its weights.
+        """
+        weights = self.weights if funds is None else self.weights[self._rows(funds)]
+        holders = np.diff(weights.tocsc().indptr)
+        shared = weights.min(axis=0).toarray().ravel()
+        total = np.asarray(weights.sum(axis=0)).ravel()
+        order = np.lexsort((-total, -shared, -holders))[:n]
+        return self.securities.iloc[order].assign(
+            funds=holders[order], shared_weight=shared[order], total_weight=total[order]).reset_index(drop=True)
+
+    def concentration(self, n: int = 10) -> pd.DataFrame:
+        """Per fund: holdings count, long weight, weight of the top `n` positions, Herfindahl index and its inverse."""
+        weights = self.weights
+        rows = np.repeat(np.arange(weights.shape[0]), np.diff(weights.indptr))
+        # rank positions within each row by weight, largest first
+        order = np.lexsort((-weights.data, rows))
+        rank = np.arange(len(order)) - weights.indptr[rows[order]]
+        top = np.bincount(rows[order], weights=np.where(rank < n, weights.data[order], 0), minlength=weights.shape[0])
+        total = np.asarray(weights.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hhi = np.asarray(weights.multiply(weights).sum(axis=1)).ravel() / total ** 2
+            return pd.DataFrame({
+                'holdings': np.diff(weights.indptr),
+                'weight': total,
+                f'top{n}_weight': top,
+                'hhi': hhi,
+                'effective_holdings': 1 / hhi,
+            }, index=self._fund_labels())
+
+    def sector_exposure(self, sectors: pd.DataFrame | None = None, level: str = 'Sector') -> pd.DataFrame:
+        """Fund weight per sector (or Industry / Sub-Industry) as weights @ (security x sector indicator).
+
+        Securities are classified by ticker against `sectors` (default
+        `load_sectors()`); whatever is left is reported as Unclassified.
+        """
+        if 'ticker' not in self.securities:
+            raise ValueError('Securities have no tickers, build FundHoldings with a reference_file')
+        sectors = load_sectors() if sectors is None else sectors
+        sector_of = sectors.dropna(subset=[level]).drop_duplicates('Symbol').set_index('Symbol')[level]
+        codes, names = pd.factorize(self.securities['ticker'].map(sector_of), use_na_sentinel=True)
+        classified = codes >= 0
+        indicator = sparse.csr_matrix((np.ones(classified.sum()), (np.flatnonzero(classified), codes[classified])),
+                                      shape=(len(self.securities), len(names)))
+        exposure = pd.DataFrame((self.weights @ indicator).toarray(), index=self._fund_labels(), columns=names)
+        exposure = exposure[sorted(names)]
+        exposure['Unclassified'] = np.asarray(self.weights.sum(axis=1)).ravel() - exposure.sum(axis=1)
+        return exposure
+
+    def save(self, output_directory: str) -> None:
+        """Write the matrix (scipy .npz) and its fund and security frames (Parquet) to `output_directory`."""
+        os.makedirs(output_directory, exist_ok=True)
+        sparse.save_npz(os.path.join(output_directory, WEIGHTS_FILENAME), self.weights)
+        self.funds.to_parquet(os.path.join(output_directory, FUNDS_FILENAME), index=False)
+        self.securities.to_parquet(os.path.join(output_directory, SECURITIES_FILENAME), index=False)
+
+    @classmethod
+    def load(cls, input_directory: str) -> 'FundHoldings':
+        return cls(pd.read_parquet(os.path.join(input_directory, FUNDS_FILENAME)),
+                   pd.read_parquet(os.path.join(input_directory, SECURITIES_FILENAME)),
+                   sparse.load_npz(os.path.join(input_directory, WEIGHTS_FILENAME)))
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from .holdings_store import (
+    COMPANY_CUSIP_COL,
+    COMPANY_NAME_COL,
+    FILING_MANAGER_CIK_COL,
+    FILING_MANAGER_NAME_COL,
+    REPORT_PERIOD_COL,
+    SHARES_COL,
+    VALUE_COL,
+)
+
+PREVIOUS_PERIOD_COL = 'previousReportDate'
+CHANGE_COL = 'change'
+
+# position change classifications
+NEW = 'new'
+EXIT = 'exit'
+INCREASE = 'increase'
+DECREASE = 'decrease'
+UNCHANGED = 'unchanged'
+# positions in a manager's first report, which has nothing to compare against
+FIRST_REPORT = 'first_report'
+
+def _run_starts(sorted_keys: np.ndarray) -> np.ndarray:
+    """Index of the first element of each run of equal keys."""
+    starts = np.ones(len(sorted_keys), dtype=bool)
+    starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    return np.flatnonzero(starts)
+
+
+def _categorical(values: pd.Series) -> pd.Categorical:
+    return values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values.astype(str))
+
+
+class _EncodedPositions:
+    """Positions summed per (manager, CUSIP, period) and sorted by one int64 composite key.
+
+    Managers and CUSIPs are category codes and periods are indexes into the
+    sorted distinct report periods, so
+    `composite = (manager * n_cusips + cusip) * n_periods + period`.
+    """
+
+    def __init__(self, holdings_df: pd.DataFrame) -> None:
+        managers = _categorical(holdings_df[FILING_MANAGER_CIK_COL])
+        cusips = _categorical(holdings_df[COMPANY_CUSIP_COL])
+        period_values = pd.to_datetime(holdings_df[REPORT_PERIOD_COL]).to_numpy(dtype='datetime64[ns]')
+        period_codes, self.periods = pd.factorize(period_values, sort=True)
+        self.periods = np.asarray(self.periods, dtype='datetime64[ns]')
+        self.managers = managers.categories
+        self.cusips = cusips.categories
+        composite = ((managers.codes.astype(np.int64) * len(self.cusips) + cusips.codes) * len(self.periods)
+                     + period_codes)
+        order = np.argsort(composite, kind='stable')
+        composite = composite[order]
+        starts = _run_starts(composite)
+        self.composite = composite[starts]
+        self.value = np.add.reduceat(pd.to_numeric(holdings_df[VALUE_COL]).to_numpy(dtype=np.float64)[order], starts) \
+            if len(starts) else np.zeros(0)
+        self.shares = np.add.reduceat(pd.to_numeric(holdings_df[SHARES_COL]).to_numpy(dtype=np.float64)[order], starts) \
+            if len(starts) else np.zeros(0)
+
+    def split(self, composite: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(manager code, CUSIP code, period index) of composite keys."""
+        key, period = np.divmod(composite, max(len(self.periods), 1))
+        manager, cusip = np.divmod(key, max(len(self.cusips), 1))
+        return manager, cusip, period
+
+    def frame(self, composite: np.ndarray, columns: dict) -> pd.DataFrame:
+        manager, cusip, period = self.split(composite)
+        return pd.DataFrame({
+            FILING_MANAGER_CIK_COL: pd.Categorical.from_codes(manager, self.managers),
+            COMPANY_CUSIP_COL: pd.Categorical.from_codes(cusip, self.cusips),
+            REPORT_PERIOD_COL: self.periods[period],
+            **columns,
+        })
+
+
+def positions(holdings_df: pd.DataFrame) -> pd.DataFrame:
+    """Sum holdings to one row per (manager, CUSIP, report period), sorted by those keys.
+
+    Several filings (e.g. a 13F-HR and its amendment) for the same manager and
+    period are summed, as `Form13F_HR_Extractor.aggregate_data` does for
+    duplicate rows within one filing.
+    """
+    pos = _EncodedPositions(holdings_df)
+    return pos.frame(pos.composite, {VALUE_COL: pos.value, SHARES_COL: pos.shares})
+
+
+def position_changes(holdings_df: pd.DataFrame) -> pd.DataFrame:
+    """Quarter-over-quarter position changes for every manager, CUSIP and report period.
+
+    Each manager's report is compared with that manager's previous report, so
+    gaps in filing history do not produce spurious exits. Positions are encoded
+    as sorted int64 (manager, CUSIP, period) keys; each position is shifted
+    forward onto the manager's next report period, and the shifted and current
+    keys are merge-joined with `searchsorted`. A position only in the current
+    report is NEW, one only in the previous report is an EXIT.
+
+    Returns one row per position and period with current and previous value and
+    shares, absolute and percent changes (NaN where the previous amount is 0 or
+    missing) and the `change` classification.
+    """
+    pos = _EncodedPositions(holdings_df)
+    n_periods = len(pos.periods)
+    manager, _, period = pos.split(pos.composite)
+
+    # previous/next report period of every (manager, period), -1/n_periods where there is none
+    reported = np.zeros((len(pos.managers), n_periods), dtype=bool)
+    reported[manager, period] = True
+    period_index = np.arange(n_periods)
+    last_reported = np.maximum.accumulate(np.where(reported, period_index, -1), axis=1)
+    previous_of = np.hstack([np.full((len(pos.managers), 1), -1), last_reported[:, :-1]])
+    next_reported = np.minimum.accumulate(np.where(reported, period_index, n_periods)[:, ::-1], axis=1)[:, ::-1]
+    next_of = np.hstack([next_reported[:, 1:], np.full((len(pos.managers), 1), n_periods)])
+
+    # the shifted keys stay sorted: a manager's next periods increase with its periods
+    next_period = next_of[manager, period]
+    has_next = next_period < n_periods
+    shifted = pos.composite[has_next] - period[has_next] + next_period[has_next]
+
+    # both inputs are sorted runs, which a stable sort merges in linear time
+    composite = np.sort(np.concatenate([pos.composite, shifted]), kind='stable')
+    composite = composite[_run_starts(composite)]
+    value = np.zeros(len(composite))
+    shares = np.zeros(len(composite))
+    value_previous = np.zeros(len(composite))
+    shares_previous = np.zeros(len(composite))
+    current_rows = np.searchsorted(composite, pos.composite)
+    value[current_rows] = pos.value
+    shares[current_rows] = pos.shares
+    previous_rows = np.searchsorted(composite, shifted)
+    value_previous[previous_rows] = pos.value[has_next]
+    shares_previous[previous_rows] = pos.shares[has_next]
+
+    all_manager, _, all_period = pos.split(composite)
+    previous_period = previous_of[all_manager, all_period]
+    has_previous = previous_period >= 0
+    previous_dates = np.where(has_previous, pos.periods[np.maximum(previous_period, 0)], np.datetime64('NaT'))
+
+    columns = {
+        VALUE_COL: value,
+        SHARES_COL: shares,
+        f'{VALUE_COL}Previous': value_previous,
+        f'{SHARES_COL}Previous': shares_previous,
+        PREVIOUS_PERIOD_COL: previous_dates.astype('datetime64[ns]'),
+    }
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for col, current, previous in [(VALUE_COL, value, value_previous), (SHARES_COL, shares, shares_previous)]:
+            columns[f'{col}Change'] = current - previous
+            columns[f'{col}PctChange'] = np.where(previous > 0, (current - previous) / previous, np.nan)
+
+    in_current = (shares > 0) | (value > 0)
+    in_previous = (shares_previous > 0) | (value_previous > 0)
+    categories = [NEW, EXIT, INCREASE, DECREASE, UNCHANGED, FIRST_REPORT]
+    codes = np.select(
+        [~has_previous, in_current & ~in_previous, ~in_current & in_previous,
+         shares > shares_previous, shares < shares_previous],
+        [categories.index(c) for c in [FIRST_REPORT, NEW, EXIT, INCREASE, DECREASE]],
+        default=categories.index(UNCHANGED),
+    )
+    columns[CHANGE_COL] = pd.Categorical.from_codes(codes, categories)
+    return pos.frame(composite, columns)
+
+
+def _attach_names(changes: pd.DataFrame, holdings_df: pd.DataFrame) -> pd.DataFrame:
+    managers = holdings_df[[FILING_MANAGER_CIK_COL, FILING_MANAGER_NAME_COL]].astype(str) \
+        .drop_duplicates(FILING_MANAGER_CIK_COL, keep='last').set_index(FILING_MANAGER_CIK_COL)[FILING_MANAGER_NAME_COL]
+    companies = holdings_df[[COMPANY_CUSIP_COL, COMPANY_NAME_COL]].astype(str) \
+        .drop_duplicates(COMPANY_CUSIP_COL, keep='last').set_index(COMPANY_CUSIP_COL)[COMPANY_NAME_COL]
+    return changes.assign(**{
+        FILING_MANAGER_NAME_COL: changes[FILING_MANAGER_CIK_COL].map(managers),
+        COMPANY_NAME_COL: changes[COMPANY_CUSIP_COL].map(companies),
+    })
+
+
+def top_movers(changes: pd.DataFrame, n: int = 10, by: str = f'{VALUE_COL}Change', periods: list | None = None,
+               change_types: list[str] | None = None, largest: bool = True,
+               holdings_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    """The `n` largest (or smallest) rows of `by` within each report period.
+
+    `changes` is the output of `position_changes`, optionally narrowed to
+    `periods` and `change_types` (e.g. `[NEW]` for the biggest new positions).
+    Passing the source `holdings_df` adds manager and issuer names.
+    """
+    df = changes
+    if periods is not None:
+        df = df[df[REPORT_PERIOD_COL].isin(pd.to_datetime(pd.Series(periods)))]
+    if change_types is not None:
+        df = df[df[CHANGE_COL].isin(change_types)]
+    by_period = df.groupby(REPORT_PERIOD_COL, sort=True)[by]
+    top = by_period.nlargest(n) if largest else by_period.nsmallest(n)
+    df = df.loc[top.index.get_level_values(-1)].reset_index(drop=True)
+    return _attach_names(df, holdings_df) if holdings_df is not None else df
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+import pandas as pd
+import pyarrow as pa
+
+# column names match form_13f_hr_extractor; repeated here to keep the store importable on its own
+FILING_MANAGER_ADDRESS_COL = 'managerAddress'
+FILING_MANAGER_NAME_COL = 'managerName'
+FILING_MANAGER_CIK_COL = 'managerCik'
+REPORT_PERIOD_COL = 'reportDate'
+COMPANY_CUSIP_COL = 'cusip'
+COMPANY_CUSIP6_COL = 'cusip6'
+COMPANY_NAME_COL = 'companyName'
+SOURCE_ID_COL = 'source'
+VALUE_COL = 'value'
+SHARES_COL = 'shares'
+
+# string columns repeat heavily across rows and are stored dictionary-encoded
+CATEGORY_COLUMNS = [SOURCE_ID_COL, FILING_MANAGER_CIK_COL, FILING_MANAGER_ADDRESS_COL, FILING_MANAGER_NAME_COL,
+                    COMPANY_CUSIP6_COL, COMPANY_CUSIP_COL, COMPANY_NAME_COL]
+COMPACT_SCHEMA = pa.schema(
+    [(col, pa.dictionary(pa.int32(), pa.string())) for col in CATEGORY_COLUMNS]
+    + [(REPORT_PERIOD_COL, pa.date32()), (VALUE_COL, pa.int64()), (SHARES_COL, pa.int64())]
+)
+
+
+def compact_holdings(holdings_df: pd.DataFrame) -> pd.DataFrame:
+    """Holdings with categorical string columns, int64 value/shares and the report period as a date.
+
+    The frame holds the period as datetime64 for pandas; `write_compact_holdings`
+    stores it as date32, per `COMPACT_SCHEMA`.
+    """
+    return pd.DataFrame({
+        **{col: holdings_df[col].astype('category') for col in CATEGORY_COLUMNS},
+        REPORT_PERIOD_COL: pd.to_datetime(holdings_df[REPORT_PERIOD_COL]),
+        VALUE_COL: pd.to_numeric(holdings_df[VALUE_COL]).round().astype('int64'),
+        SHARES_COL: pd.to_numeric(holdings_df[SHARES_COL]).round().astype('int64'),
+    })
+
+
+def write_compact_holdings(holdings_df: pd.DataFrame, path: str) -> int:
+    """Write holdings as an uncompressed Arrow IPC (Feather v2) file, which `read_compact_holdings` can memory-map."""
+    table = pa.Table.from_pandas(compact_holdings(holdings_df), preserve_index=False)
+    # one dictionary per column; the IPC file format cannot replace dictionaries between batches
+    table = table.cast(COMPACT_SCHEMA).unify_dictionaries().combine_chunks()
+    tmp_file = f"{path}.tmp"
+    with pa.OSFile(tmp_file, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=1 << 20)
+    os.replace(tmp_file, path)
+    return table.num_rows
+
+
+def read_compact_holdings(path: str, columns: list[str] | None = None) -> pa.Table:
+    """Memory-map a compact holdings file; column buffers are read from the page cache without copying."""
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def load_compact_holdings(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Compact holdings as a DataFrame; dictionary columns become categoricals."""
+    return read_compact_holdings(path, columns).to_pandas(date_as_object=False)
+
+
+class HoldingsStore:
+    """Persistent, incrementally updated store of aggregated 13F-HR holdings.
+
+    Aggregated rows are kept in one Parquet partition per report period, and a
+    SQLite ledger records which accessions have been ingested. Adding filings
+    only parses the new accessions and rewrites the partitions for the report
+    periods they cover.
+    """
+    LEDGER_FILENAME = "ingested.db"
+    COMPACT_FILENAME = "holdings.arrow"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.partition_dir = f"{directory}/periods"
+        os.makedirs(self.partition_dir, exist_ok=True)
+        self.conn = sqlite3.connect(f"{directory}/{self.LEDGER_FILENAME}")
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS ingested (
+                accession TEXT PRIMARY KEY,
+                source TEXT,
+                status TEXT NOT NULL,
+                rows INTEGER,
+                error TEXT,
+                ingested_at TEXT NOT NULL
+            );
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def ingested_accessions(self, include_failed: bool = True) -> set[str]:
+        sql = "SELECT accession FROM ingested"
+        if not include_failed:
+            sql += f" WHERE status = '{self.DONE}'"
+        return {row[0] for row in self.conn.execute(sql)}
+
+    def mark(self, records: list[dict]) -> None:
+        """Record accessions as ingested; each record has accession, status and optionally source, rows, error."""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ingested (accession, source, status, rows, error, ingested_at) VALUES (?, ?, ?, ?, ?, ?)",
+                ((r["accession"], r.get("source"), r["status"], r.get("rows"), r.get("error"), now) for r in records),
+            )
+
+    def _partition_file(self, period: str) -> str:
+        return f"{self.partition_dir}/{period}.parquet"
+
+    def periods(self) -> list[str]:
+        """Stored report periods as sorted `yyyy-mm-dd` strings."""
+        return sorted(name.removesuffix(".parquet") for name in os.listdir(self.partition_dir) if name.endswith(".parquet"))
+
+    def merge(self, holdings_df: pd.DataFrame) -> dict[str, int]:
+        """Merge aggregated holdings into their report-period partitions.
+
+        Rows from a source already in a partition replace the stored ones, so
+        re-ingesting a filing is idempotent. Returns the row count per touched period.
+        """
+        touched = {}
+        for period, period_df in holdings_df.groupby(REPORT_PERIOD_COL, sort=True):
+            period = str(period)
+            partition_file = self._partition_file(period)
+            if os.path.exists(partition_file):
+                existing = pd.read_parquet(partition_file)
+                existing = existing[~existing[SOURCE_ID_COL].isin(period_df[SOURCE_ID_COL].unique())]
+                period_df = pd.concat([existing, period_df], ignore_index=True)
+            period_df = period_df.sort_values(SOURCE_ID_COL, ignore_index=True)
+            tmp_file = f"{partition_file}.tmp"
+            period_df.to_parquet(tmp_file, index=False)
+            os.replace(tmp_file, partition_file)
+            touched[period] = len(period_df)
+        return touched
+
+    def read(self, periods: list[str] | None = None, top_n_periods: int | None = None) -> pd.DataFrame:
+        """Holdings for the given periods, or for the `top_n_periods` most recent ones, or for all periods."""
+        if periods is None:
+            periods = self.periods()
+            if top_n_periods is not None:
+                periods = periods[-top_n_periods:] if top_n_periods > 0 else []
+        frames = [pd.read_parquet(self._partition_file(str(period))) for period in periods
+                  if os.path.exists(self._partition_file(str(period)))]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def export_compact(self, path: str | None = None) -> str:
+        """Write every period to one compact holdings file (see `write_compact_holdings`) and return its path."""
+        path = path or f"{self.directory}/{self.COMPACT_FILENAME}"
+        write_compact_holdings(self.read(), path)
+        return path
+
+    def load_compact(self, columns: list[str] | None = None) -> pd.DataFrame:
+        return load_compact_holdings(f"{self.directory}/{self.COMPACT_FILENAME}", columns)
@@ -0,0 +1,192 @@
+import json
+import os
+import pickle
+from typing import Iterable
+import pandas as pd
+
+# identifier kinds that can be looked up; every one resolves to a CIK first
+KINDS = ("cik", "ticker", "cusip", "cusip8", "cusip6", "isin", "lei")
+# source files under data/sec_data, merged in this order (later files only fill gaps)
+SOURCE_FILES = ("company_data.json", "merged_data.json", "sec_company_tickers.json", "reference_data.csv")
+SNAPSHOT_FILENAME = "identifier_crosswalk.pickle"
+SNAPSHOT_VERSION = 1
+
+
+def _normalize(kind: str, value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if kind == "cik":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    value = str(value).strip().upper()
+    return value or None
+
+
+def _as_list(value) -> list:
+    if isinstance(value, list):
+        return value
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value == "":
+        return []
+    return [part.strip() for part in str(value).split(",") if part.strip()]
+
+
+class IdentifierCrosswalk:
+    """One record per CIK, with hash indexes from every identifier kind back to the CIK.
+
+    Records merge the company fields of the source files (companyName, lei,
+    tickers, securities, cusips, exchange, sector, ...). `lookup` and
+    `lookup_many` are dict lookups, so resolving a ticker, CUSIP, ISIN or LEI
+    costs the same however large the reference data is. CUSIP lookups fall
+    back from nine to eight to six characters.
+    """
+
+    def __init__(self, records: Iterable[dict] = ()) -> None:
+        self.records: dict[int, dict] = {}
+        self.indexes: dict[str, dict] = {kind: {} for kind in KINDS if kind != "cik"}
+        for record in records:
+            self.add(record)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, record: dict) -> None:
+        """Merge `record` into the record for its CIK; fields already set are kept."""
+        cik = _normalize("cik", record.get("cik"))
+        if cik is None:
+            return
+        merged = self.records.setdefault(cik, {"cik": cik, "tickers": [], "securities": [], "cusips": []})
+        for key, value in record.items():
+            if key in ("cik", "tickers", "securities", "cusips", "ticker", "name"):
+                continue
+            if merged.get(key) in (None, "") and not (isinstance(value, float) and pd.isna(value)):
+                merged[key] = value
+        if not merged.get("companyName") and record.get("name"):
+            merged["companyName"] = record["name"]
+        for ticker in _as_list(record.get("tickers")) + _as_list(record.get("ticker")):
+            if ticker not in merged["tickers"]:
+                merged["tickers"].append(ticker)
+        for security in record.get("securities") or []:
+            if security not in merged["securities"]:
+                merged["securities"].append(security)
+        for cusip in _as_list(record.get("cusips")):
+            if cusip not in merged["cusips"]:
+                merged["cusips"].append(cusip)
+        self._index(merged)
+
+    def _index(self, record: dict) -> None:
+        cik = record["cik"]
+        keys = {
+            "ticker": record["tickers"],
+            "lei": [record.get("lei")],
+            "isin": [security.get("isin") for security in record["securities"]],
+            "cusip": [security.get("cusip") for security in record["securities"]],
+            "cusip8": [], "cusip6": [record.get("cusip6")],
+        }
+        for cusip in keys["cusip"] + record["cusips"]:
+            cusip = _normalize("cusip", cusip)
+            if cusip is None:
+                continue
+            if len(cusip) >= 8:
+                keys["cusip8"].append(cusip[:8])
+            keys["cusip6"].append(cusip[:6])
+        for kind, values in keys.items():
+            index = self.indexes[kind]
+            for value in values:
+                value = _normalize(kind, value)
+                # first company to claim an identifier keeps it
+                if value is not None:
+                    index.setdefault(value, cik)
+
+    def cik(self, kind: str, value) -> int | None:
+        """The CIK that `value`, an identifier of `kind`, belongs to."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown identifier kind {kind}, expected one of {KINDS}")
+        value = _normalize(kind, value)
+        if value is None:
+            return None
+        if kind == "cik":
+            return value if value in self.records else None
+        if kind == "cusip":
+            return (self.indexes["cusip"].get(value) or self.indexes["cusip8"].get(value[:8])
+                    or self.indexes["cusip6"].get(value[:6]))
+        return self.indexes[kind].get(value)
+
+    def lookup(self, kind: str, value) -> dict | None:
+        """The company record for an identifier, or None."""
+        cik = self.cik(kind, value)
+        return self.records.get(cik) if cik is not None else None
+
+    def lookup_many(self, kind: str, values: Iterable) -> list[dict | None]:
+        return [self.lookup(kind, value) for value in values]
+
+    def ciks(self, kind: str, values: Iterable) -> pd.Series:
+        """CIK per value (nullable Int64), resolved with one hash map over the whole batch."""
+        values = pd.Series(list(values) if not isinstance(values, pd.Series) else values)
+        if kind == "cik":
+            normalized = pd.to_numeric(values, errors="coerce").astype("Int64")
+            return normalized.where(normalized.isin(list(self.records))).astype("Int64")
+        normalized = values.astype("string").str.strip().str.upper()
+        resolved = normalized.map(self.indexes[kind] if kind != "cusip" else self.indexes["cusip"])
+        if kind == "cusip":
+            resolved = resolved.fillna(normalized.str[:8].map(self.indexes["cusip8"]))
+            resolved = resolved.fillna(normalized.str[:6].map(self.indexes["cusip6"]))
+        return resolved.astype("Int64")
+
+    def frame(self, kind: str, values: Iterable, fields: list[str] = ("companyName", "tickers", "lei")) -> pd.DataFrame:
+        """Batch lookup as a frame: the input values, their CIK and the requested record fields."""
+        values = list(values)
+        ciks = self.ciks(kind, values)
+        df = pd.DataFrame({kind: values, "cik": ciks.array})
+        for field in fields:
+            df[field] = [self.records[cik].get(field) if not pd.isna(cik) else None for cik in ciks]
+        return df
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "IdentifierCrosswalk":
+        """Crosswalk over a reference frame with a cik column (e.g. reference_data.csv or sec_company_tickers.json)."""
+        return cls(df.to_dict(orient="records"))
+
+    @classmethod
+    def from_sources(cls, directory: str = "../../data/sec_data") -> "IdentifierCrosswalk":
+        """Merge whichever of SOURCE_FILES exist under `directory`."""
+        crosswalk = cls()
+        for filename in SOURCE_FILES:
+            path = os.path.join(directory, filename)
+            if not os.path.exists(path):
+                continue
+            if filename.endswith(".csv"):
+                records = pd.read_csv(path, dtype={"cusips": str}).to_dict(orient="records")
+            else:
+                with open(path, "r") as f:
+                    records = json.load(f)
+            for record in records:
+                crosswalk.add(record)
+        return crosswalk
+
+    def save(self, path: str, sources: dict[str, float] | None = None) -> None:
+        """Write a snapshot of the records and indexes; `sources` are the source mtimes it was built from."""
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "sources": sources or {},
+                         "records": self.records, "indexes": self.indexes}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, directory: str = "../../data/sec_data", snapshot_path: str | None = None) -> "IdentifierCrosswalk":
+        """Load the snapshot, rebuilding it from the source files when it is missing or older than them."""
+        snapshot_path = snapshot_path or os.path.join(directory, SNAPSHOT_FILENAME)
+        sources = {filename: os.path.getmtime(os.path.join(directory, filename))
+                   for filename in SOURCE_FILES if os.path.exists(os.path.join(directory, filename))}
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            if snapshot.get("version") == SNAPSHOT_VERSION and snapshot.get("sources") == sources:
+                crosswalk = cls()
+                crosswalk.records = snapshot["records"]
+                crosswalk.indexes = snapshot["indexes"]
+                return crosswalk
+        crosswalk = cls.from_sources(directory)
+        crosswalk.save(snapshot_path, sources)
+        return crosswalk
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from numpy.lib.stride_tricks import sliding_window_view
+
+# CUSIP character values for the check digit: 0-9, A-Z = 10-35, * = 36, @ = 37, # = 38
+CUSIP_CHAR_VALUES = {
+    **{str(d): d for d in range(10)},
+    **{chr(ord('A') + i): 10 + i for i in range(26)},
+    '*': 36, '@': 37, '#': 38,
+}
+
+
+def cusip_check_digit(cusip8: str) -> int | None:
+    """Check digit of the first eight CUSIP characters (modulus 10 "double add double"), None if it has invalid characters."""
+    total = 0
+    for i, char in enumerate(cusip8[:8].upper()):
+        value = CUSIP_CHAR_VALUES.get(char)
+        if value is None:
+            return None
+        if i % 2:
+            value *= 2
+        total += value // 10 + value % 10
+    return (10 - total % 10) % 10
+
+
+def is_valid_cusip(cusip: str) -> bool:
+    """Whether `cusip` is nine characters whose last one is its check digit."""
+    return len(cusip) == 9 and cusip[8].isdigit() and cusip_check_digit(cusip) == int(cusip[8])
+
+
+# Vectorized versions for whole columns of identifiers (lists, NumPy or pandas arrays).
+# Values are packed into fixed-width uint8 matrices so every step is a NumPy
+# operation over all rows; the rarer repairs (separators, padding) only touch
+# the rows that need them. Flags and digits come back as NumPy arrays, strings
+# as str-dtype Series keeping a pandas input's index.
+
+CUSIP_LENGTH = 9
+# widest value still repaired; longer ones are left invalid
+RAW_WIDTH = 12
+
+_CHAR_VALUE_TABLE = np.full(256, -1, dtype=np.int16)
+for _char, _value in CUSIP_CHAR_VALUES.items():
+    _CHAR_VALUE_TABLE[ord(_char)] = _value
+_IS_CUSIP_CHAR = _CHAR_VALUE_TABLE >= 0
+# a clean row holds only CUSIP characters followed by zero padding
+_IS_CLEAN = _IS_CUSIP_CHAR.copy()
+_IS_CLEAN[0] = True
+# what each character adds to the check digit total at even and at odd (doubled) positions
+_DIGIT_SUMS = tuple(np.where(_IS_CUSIP_CHAR, v // 10 + v % 10, 0).astype(np.int16)
+                    for v in (_CHAR_VALUE_TABLE, _CHAR_VALUE_TABLE * 2))
+_ZERO = ord('0')
+
+
+def _luhn_tables() -> tuple[np.ndarray, np.ndarray]:
+    # ISIN characters expand to one digit (0-9) or two (A = 10 ... Z = 35). Per character and per
+    # whether its last digit is doubled: its Luhn sum (index char * 2 + doubled) and whether the
+    # doubling of the next character to the left flips (odd digit count).
+    sums = np.zeros(512, dtype=np.int16)
+    flips = np.zeros(256, dtype=np.uint8)
+    for char in range(256):
+        value = _CHAR_VALUE_TABLE[char]
+        if not 0 <= value <= 35:
+            continue
+        digits = [int(d) for d in str(value)]
+        flips[char] = len(digits) % 2
+        for doubled in (0, 1):
+            for position, digit in enumerate(reversed(digits)):
+                weighted = digit * 2 if (position % 2 == 0) == bool(doubled) else digit
+                sums[char * 2 + doubled] += weighted // 10 + weighted % 10
+    return sums, flips
+
+
+_LUHN_SUMS, _LUHN_FLIPS = _luhn_tables()
+
+
+def _char_matrix(values, width: int = RAW_WIDTH + 1) -> tuple[np.ndarray, np.ndarray]:
+    """Trimmed, upper-cased values as a (rows, width) uint8 matrix, zero padded, plus their full lengths.
+
+    Rows are copied out of the Arrow string buffer through one strided window
+    view per distinct length. Non-ASCII bytes become '?'.
+    """
+    try:
+        strings = pa.array(values, type=pa.large_string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        strings = pa.array([None if pd.isna(v) else str(v) for v in values], type=pa.large_string())
+    strings = pc.utf8_trim_whitespace(pc.fill_null(strings, ''))
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks() if strings.num_chunks else pa.array([], pa.large_string())
+    offsets = np.frombuffer(strings.buffers()[1], dtype=np.int64)[strings.offset:strings.offset + len(strings) + 1]
+    lengths = np.diff(offsets)
+    data = np.zeros(offsets[-1] + width, dtype=np.uint8)
+    data[:offsets[-1]] = np.frombuffer(strings.buffers()[2], dtype=np.uint8)[:offsets[-1]]
+    data[data >= 128] = ord('?')
+    data -= ((data - np.uint8(ord('a'))) < 26).view(np.uint8) * np.uint8(32)
+
+    matrix = np.zeros((len(strings), width), dtype=np.uint8)
+    clipped = np.minimum(lengths, width)
+    present = np.flatnonzero(np.bincount(clipped, minlength=width + 1))
+    if len(present) == 1 and present[0] > 0 and present[0] == lengths[0]:
+        # every value has the same length: the buffer already is the matrix
+        matrix[:, :present[0]] = data[offsets[0]:offsets[-1]].reshape(len(strings), present[0])
+        return matrix, lengths
+    for length in present[present > 0]:
+        rows = np.flatnonzero(clipped == length)
+        matrix[rows, :length] = sliding_window_view(data, length)[offsets[rows]]
+    return matrix, lengths
+
+
+def _strings(matrix: np.ndarray, index=None) -> pd.Series:
+    """Inverse of _char_matrix: one str per row, trailing zero bytes dropped, as a str-dtype Series."""
+    fixed = pa.Array.from_buffers(pa.binary(matrix.shape[1]), len(matrix), [None, pa.py_buffer(np.ascontiguousarray(matrix))])
+    strings = pc.utf8_rtrim(fixed.cast(pa.binary()).cast(pa.string()), '\x00')
+    return pd.Series(strings, dtype='str', index=index)
+
+
+def _shift(matrix: np.ndarray, offsets: np.ndarray, fill: int) -> np.ndarray:
+    """Shift each row left by its offset (right if negative); vacated cells become `fill`."""
+    columns = np.arange(matrix.shape[1]) + offsets[:, None]
+    inside = (columns >= 0) & (columns < matrix.shape[1])
+    shifted = np.take_along_axis(matrix, np.clip(columns, 0, matrix.shape[1] - 1), axis=1)
+    return np.where(inside, shifted, np.uint8(fill))
+
+
+def _check_digits(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """CUSIP check digit of normalized rows, -1 for rows shorter than eight characters."""
+    total = np.zeros(len(matrix), dtype=np.int16)
+    for column in range(8):
+        total += _DIGIT_SUMS[column % 2][matrix[:, column]]
+    return np.where(lengths < 8, -1, (10 - total % 10) % 10).astype(np.int8)
+
+
+def _valid(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    return (lengths == CUSIP_LENGTH) & (_check_digits(matrix, lengths) == matrix[:, 8].astype(np.int16) - _ZERO)
+
+
+def _normalized_matrix(values) -> tuple[np.ndarray, np.ndarray]:
+    """Normalized CUSIPs as a (rows, 9) matrix plus each one's length (RAW_WIDTH + 1 if too long)."""
+    matrix, lengths = _char_matrix(values)
+
+    # drop separators (spaces, dashes, dots) while keeping the order of the remaining characters
+    clean = _IS_CLEAN[matrix]
+    if not clean.all():
+        dirty = np.flatnonzero(~clean.all(axis=1))
+        keep = _IS_CUSIP_CHAR[matrix[dirty]]
+        kept = keep.sum(axis=1)
+        compacted = np.take_along_axis(matrix[dirty], np.argsort(~keep, axis=1, kind='stable'), axis=1)
+        matrix[dirty] = np.where(np.arange(matrix.shape[1]) < kept[:, None], compacted, np.uint8(0))
+        lengths[dirty] = np.where(lengths[dirty] > RAW_WIDTH, lengths[dirty], kept)
+    lengths = np.minimum(lengths, RAW_WIDTH + 1)
+    matrix = matrix[:, :RAW_WIDTH]
+
+    # over-padded: more than nine characters, the extra ones all leading zeros
+    long = np.flatnonzero((lengths > CUSIP_LENGTH) & (lengths <= RAW_WIDTH))
+    if len(long):
+        extra = lengths[long] - CUSIP_LENGTH
+        leading_zeros = np.argmin(np.append(matrix[long], np.zeros((len(long), 1), np.uint8), axis=1) == _ZERO, axis=1)
+        trim = np.where(leading_zeros >= extra, extra, 0)
+        matrix[long] = _shift(matrix[long], trim, 0)
+        lengths[long] -= trim
+
+    matrix = np.ascontiguousarray(matrix[:, :CUSIP_LENGTH])
+    # under-padded: leading zeros lost (e.g. by a spreadsheet); restored only if that yields a valid check digit
+    short = np.flatnonzero((lengths > 0) & (lengths < CUSIP_LENGTH))
+    if len(short):
+        padded = _shift(matrix[short], lengths[short] - CUSIP_LENGTH, _ZERO)
+        restore = _valid(padded, np.full(len(short), CUSIP_LENGTH))
+        matrix[short[restore]] = padded[restore]
+        lengths[short[restore]] = CUSIP_LENGTH
+    return matrix, lengths
+
+
+def _index_of(values):
+    return values.index if isinstance(values, pd.Series) else None
+
+
+def normalize_cusips(values) -> pd.Series:
+    """Upper-cased CUSIPs without whitespace, separators or zero padding; longer values are cut to nine characters."""
+    return _strings(_normalized_matrix(values)[0], _index_of(values))
+
+
+def cusip_check_digits(values) -> np.ndarray:
+    """Vectorized `cusip_check_digit` over normalized CUSIPs: int8, -1 where it cannot be computed."""
+    return _check_digits(*_normalized_matrix(values))
+
+
+def valid_cusips(values) -> np.ndarray:
+    """Vectorized `is_valid_cusip` over normalized CUSIPs."""
+    return _valid(*_normalized_matrix(values))
+
+
+def _estimated_cusip6(matrix: np.ndarray, lengths: np.ndarray, index=None) -> pd.Series:
+    padded = (matrix[:, 0] == _ZERO) & (matrix[:, 1] == _ZERO) & (matrix[:, 2] == _ZERO) & ~_valid(matrix, lengths)
+    cusip6 = matrix[:, :6].copy()
+    cusip6[padded] = matrix[padded, 1:7]
+    return _strings(cusip6, index)
+
+
+def estimate_cusip6s(values) -> pd.Series:
+    """Issuer CUSIP6 per value. A '000' prefix is read as a padded zero, unless the CUSIP is valid as written."""
+    return _estimated_cusip6(*_normalized_matrix(values), _index_of(values))
+
+
+def _isins(matrix: np.ndarray, lengths: np.ndarray, country: str = 'US', index=None) -> pd.Series:
+    body = np.concatenate([np.tile(np.frombuffer(country.upper().encode(), np.uint8), (len(matrix), 1)), matrix], axis=1)
+    # Luhn over the digit expansion, right to left with the rightmost digit doubled
+    total = np.zeros(len(matrix), dtype=np.int16)
+    doubled = np.ones(len(matrix), dtype=np.uint8)
+    for column in range(body.shape[1] - 1, -1, -1):
+        chars = body[:, column].astype(np.intp)
+        total += _LUHN_SUMS[chars * 2 + doubled]
+        doubled ^= _LUHN_FLIPS[chars]
+    check = ((10 - total % 10) % 10 + _ZERO).astype(np.uint8)
+    isin = np.concatenate([body, check[:, None]], axis=1)
+    isin[~_valid(matrix, lengths)] = 0
+    return _strings(isin, index)
+
+
+def cusips_to_isins(values, country: str = 'US') -> pd.Series:
+    """ISIN = country + CUSIP + Luhn check digit, '' where the CUSIP is not valid."""
+    return _isins(*_normalized_matrix(values), country, _index_of(values))
+
+
+def cusip_identifiers(values) -> pd.DataFrame:
+    """Normalized cusip, cusip6 (as `estimate_cusip6s`), cusip8, isin and a valid flag per value, in one frame."""
+    matrix, lengths = _normalized_matrix(values)
+    index = _index_of(values)
+    return pd.DataFrame({
+        'cusip': _strings(matrix, index),
+        'cusip6': _estimated_cusip6(matrix, lengths, index),
+        'cusip8': _strings(matrix[:, :8], index),
+        'isin': _isins(matrix, lengths, index=index),
+        'valid': _valid(matrix, lengths),
+    }, index=index)
@@ -0,0 +1,145 @@
+import re
+from typing import Iterable
+import numpy as np
+
+# legal-form and filler words that say nothing about which company a name is
+STOP_WORDS = frozenset([
+    'THE', 'AND', 'OF', 'INC', 'INCORPORATED', 'CORP', 'CORPORATION', 'CO', 'COMPANY', 'COS', 'COMPANIES', 'LTD',
+    'LIMITED', 'PLC', 'LLC', 'LP', 'NV', 'SA', 'AG', 'SE', 'HOLDINGS', 'HOLDING', 'GROUP', 'CLASS', 'CL', 'NEW',
+    'DE', 'NJ', 'NY', 'MD', 'MA', 'TX', 'PA', 'CA',
+])
+# spellings that differ between N-PORT and EDGAR names for the same word
+SYNONYMS = {'BANCORPORATION': 'BANCORP', 'BROTHERS': 'BROS', 'MANUFACTURING': 'MFG'}
+NGRAM = 3
+# n-grams found in more names than this are too common to narrow the search and are not indexed
+MAX_POSTINGS = 200
+# queries scored together; each chunk scores a dense (chunk, names) block
+QUERY_CHUNK = 128
+
+
+def name_key(name: str) -> str:
+    """Upper-case words of `name` without punctuation, qualifiers and stop words; the text that is n-grammed."""
+    name = (name or '').upper()
+    # "Inc/The", "Bank/Hamilton NJ", "CORP /DE/": a qualifier after a slash, when a full name precedes it
+    head = re.split(r'\s*[/\\]', name, maxsplit=1)[0]
+    if len(head.split()) >= 2:
+        name = head
+    words = [SYNONYMS.get(word, word) for word in re.sub(r'[^A-Z0-9]+', ' ', name).split()]
+    kept = [word for word in words if word not in STOP_WORDS]
+    return ' '.join(kept or words)
+
+
+def ngrams(key: str, n: int = NGRAM) -> set[str]:
+    padded = f' {key} '
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+# set bits per byte, for counting shared common n-grams held as bitsets
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+class NameMatcher:
+    """Approximate company-name lookup over a fixed list of names.
+
+    Names are broken into character n-grams. N-grams found in at most
+    `max_postings` names go into an inverted index (n-gram -> name ids, stored
+    CSR-style in NumPy arrays); only names sharing one of those with a query
+    become candidates (blocking). The few common n-grams (" IN", "ORP") are kept
+    as a bitset per name instead, so candidates are still scored on their full
+    n-gram sets. The score is the Dice coefficient, and every step after
+    n-gram extraction is vectorized over a chunk of queries.
+    """
+
+    def __init__(self, names: Iterable[str], n: int = NGRAM, max_postings: int = MAX_POSTINGS) -> None:
+        self.names = list(names)
+        self.n = n
+        self.vocabulary: dict[str, int] = {}
+        gram_ids, name_ids = [], []
+        for name_id, name in enumerate(self.names):
+            for gram in ngrams(name_key(name), n):
+                gram_ids.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+                name_ids.append(name_id)
+        gram_ids = np.asarray(gram_ids, dtype=np.int64)
+        name_ids = np.asarray(name_ids, dtype=np.int64)
+        self.sizes = np.bincount(name_ids, minlength=len(self.names))
+
+        counts = np.bincount(gram_ids, minlength=len(self.vocabulary))
+        common = np.flatnonzero(counts > max_postings)
+        # bit position of each common n-gram, -1 for indexed ones
+        self.common_bit = np.full(len(self.vocabulary), -1, dtype=np.int64)
+        self.common_bit[common] = np.arange(len(common))
+        self.words = max(1, -(-len(common) // 64))
+        self.common_bits = self._bitsets(name_ids, self.common_bit[gram_ids], len(self.names))
+        self.common_sizes = self.sizes - np.bincount(name_ids[self.common_bit[gram_ids] < 0], minlength=len(self.names))
+
+        indexed = self.common_bit[gram_ids] < 0
+        order = np.argsort(gram_ids[indexed], kind='stable')
+        self.postings = name_ids[indexed][order]
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids[indexed], minlength=len(self.vocabulary)), out=self.indptr[1:])
+
+    def _bitsets(self, owners: np.ndarray, bits: np.ndarray, rows: int) -> np.ndarray:
+        bitsets = np.zeros((rows, self.words), dtype=np.uint64)
+        owners, bits = owners[bits >= 0], bits[bits >= 0]
+        np.bitwise_or.at(bitsets, (owners, bits // 64), np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64)))
+        return bitsets
+
+    def match(self, queries: Iterable[str], threshold: float = 0.86) -> tuple[np.ndarray, np.ndarray]:
+        """Index into `names` of the best match per query and its score; -1 and 0 when none reaches `threshold`."""
+        queries = list(queries)
+        best = np.full(len(queries), -1, dtype=np.int64)
+        scores = np.zeros(len(queries))
+        for start in range(0, len(queries), QUERY_CHUNK):
+            chunk_best, chunk_scores = self._match_chunk(queries[start:start + QUERY_CHUNK], threshold)
+            best[start:start + len(chunk_best)] = chunk_best
+            scores[start:start + len(chunk_scores)] = chunk_scores
+        return best, scores
+
+    def _match_chunk(self, queries: list[str], threshold: float) -> tuple[np.ndarray, np.ndarray]:
+        owners, grams, query_sizes = [], [], []
+        for query_id, query in enumerate(queries):
+            query_grams = ngrams(name_key(query), self.n)
+            query_sizes.append(len(query_grams))
+            for gram in query_grams:
+                gram_id = self.vocabulary.get(gram)
+                if gram_id is not None:
+                    owners.append(query_id)
+                    grams.append(gram_id)
+        owners = np.asarray(owners, dtype=np.int64)
+        grams = np.asarray(grams, dtype=np.int64)
+        query_sizes = np.asarray(query_sizes, dtype=np.int64)
+        bits = self.common_bit[grams]
+        query_bits = self._bitsets(owners, bits, len(queries))
+        query_common = np.bincount(owners[bits >= 0], minlength=len(queries))
+        owners, grams = owners[bits < 0], grams[bits < 0]
+
+        # expand every (query, indexed n-gram) into the n-gram's postings without a Python loop
+        starts = self.indptr[grams]
+        lengths = self.indptr[grams + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        pairs = np.repeat(owners, lengths) * len(self.names) + self.postings[offsets]
+        shared = np.bincount(pairs, minlength=len(queries) * len(self.names))
+        candidates = np.flatnonzero(shared)
+        query_ids, name_ids = np.divmod(candidates, len(self.names))
+        # drop candidates that cannot reach the threshold even sharing every common n-gram
+        sizes = query_sizes[query_ids] + self.sizes[name_ids]
+        bound = shared[candidates] + np.minimum(query_common[query_ids], self.common_sizes[name_ids])
+        keep = 2 * bound >= threshold * sizes
+        candidates, query_ids, name_ids, sizes = candidates[keep], query_ids[keep], name_ids[keep], sizes[keep]
+
+        # add the common n-grams each candidate shares with its query, then score
+        common_shared = _POPCOUNT[(query_bits[query_ids] & self.common_bits[name_ids]).view(np.uint8)].sum(axis=1)
+        dice = 2 * (shared[candidates] + common_shared) / sizes
+        passed = dice >= threshold
+        query_ids, name_ids, dice = query_ids[passed], name_ids[passed], dice[passed]
+        best = np.full(len(queries), -1, dtype=np.int64)
+        scores = np.zeros(len(queries))
+        if not len(dice):
+            return best, scores
+
+        # best candidate per query; ties go to the earlier name
+        order = np.lexsort((name_ids, -dice, query_ids))
+        first = order[np.r_[True, query_ids[order][1:] != query_ids[order][:-1]]]
+        best[query_ids[first]] = name_ids[first]
+        scores[query_ids[first]] = dice[first]
+        return best, scores
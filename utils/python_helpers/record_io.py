@@ -0,0 +1,162 @@
+import gzip
+import json
+from typing import Iterable, Iterator
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# json: one indented JSON array, the layout the extractors have always written
+# ndjson: one JSON object per line; parquet: row-grouped columnar file
+OUTPUT_FORMATS = ("json", "ndjson", "parquet")
+EXTENSIONS = {"json": ".json", "ndjson": ".ndjson", "parquet": ".parquet"}
+# codecs for the text formats; Parquet takes any codec pyarrow supports
+TEXT_COMPRESSIONS = (None, "gzip")
+
+
+def output_path(base_path: str, output_format: str = "json", compression: str | None = None) -> str:
+    """`base_path` (without extension) plus the extension for `output_format`; gzip text output gets `.gz`."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format}, expected one of {OUTPUT_FORMATS}")
+    path = f"{base_path}{EXTENSIONS[output_format]}"
+    return f"{path}.gz" if compression == "gzip" and output_format != "parquet" else path
+
+
+def _format_of(path: str) -> str:
+    name = path.removesuffix(".gz")
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".parquet"):
+        return "parquet"
+    return "json"
+
+
+def _open_text(path: str, mode: str, compression: str | None = None):
+    if compression == "gzip" or path.endswith(".gz"):
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordWriter:
+    """Writes dict records incrementally as JSON, NDJSON or Parquet.
+
+    Records are written as they arrive, so callers never hold the whole output
+    in memory. Parquet output buffers `row_group_size` records per row group;
+    its columns come from `schema`, or are inferred from the first row group,
+    and a later record with a column outside them is rejected rather than
+    silently dropped. Text formats are gzip-compressed when the path ends in
+    `.gz` or `compression` is "gzip", and take no other codec; for Parquet,
+    `compression` is the codec (snappy by default).
+    """
+
+    def __init__(self, path: str, output_format: str | None = None, compression: str | None = None,
+                 row_group_size: int = 50_000, schema: pa.Schema | None = None) -> None:
+        self.path = path
+        self.output_format = output_format or _format_of(path)
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.schema = schema
+        self.count = 0
+        self._buffer: list[dict] = []
+        self._parquet_writer = None
+        self._file = None
+        if self.output_format == "parquet":
+            return
+        if compression not in TEXT_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression {compression} for {self.output_format}, expected one of {TEXT_COMPRESSIONS}")
+        self._file = _open_text(path, "w", compression)
+        if self.output_format == "json":
+            self._file.write("[")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, record: dict) -> None:
+        if self.output_format == "parquet":
+            self._buffer.append(record)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+        elif self.output_format == "ndjson":
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str))
+            self._file.write("\n")
+        else:
+            # same layout as json.dump(records, f, indent=4)
+            item = json.dumps(record, indent=4, default=str).replace("\n", "\n    ")
+            self._file.write(f"{',' if self.count else ''}\n    {item}")
+        self.count += 1
+
+    def write_many(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.write(record)
+
+    def write_frame(self, df: pd.DataFrame, chunksize: int = 50_000) -> None:
+        """Write a DataFrame's rows, converting `chunksize` rows at a time rather than the whole frame."""
+        for start in range(0, len(df), chunksize):
+            self.write_many(df.iloc[start:start + chunksize].to_dict(orient="records"))
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        if self.schema is None:
+            self.schema = pa.Table.from_pylist(self._buffer).schema
+        unknown = {key for record in self._buffer for key in record} - set(self.schema.names)
+        if unknown:
+            raise ValueError(f"Records have columns {sorted(unknown)} that are not in the Parquet schema of {self.path}")
+        table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression or "snappy")
+        self._parquet_writer.write_table(table)
+        self._buffer = []
+
+    def close(self) -> None:
+        if self.output_format == "parquet":
+            self._flush()
+            if self._parquet_writer is None:
+                # nothing was written; still leave a readable, empty file
+                pq.write_table((self.schema or pa.schema([])).empty_table(), self.path)
+            else:
+                self._parquet_writer.close()
+            return
+        if self._file is None or self._file.closed:
+            return
+        if self.output_format == "json":
+            self._file.write("\n]" if self.count else "]")
+        self._file.close()
+
+
+def iter_records(path: str, batch_size: int = 10_000) -> Iterator[dict]:
+    """Lazily yield the records of a file written by `RecordWriter`.
+
+    NDJSON is read line by line and Parquet one record batch at a time. A JSON
+    array has to be parsed whole.
+    """
+    output_format = _format_of(path)
+    if output_format == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    elif output_format == "ndjson":
+        with _open_text(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with _open_text(path, "r") as f:
+            yield from json.load(f)
+
+
+def read_chunks(path: str, chunksize: int = 50_000, columns: list[str] | None = None) -> Iterator[pd.DataFrame]:
+    """Read a record file as DataFrames of at most `chunksize` rows."""
+    if _format_of(path) == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    chunk = []
+    for record in iter_records(path):
+        chunk.append(record)
+        if len(chunk) >= chunksize:
+            yield pd.DataFrame(chunk, columns=columns)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk, columns=columns)
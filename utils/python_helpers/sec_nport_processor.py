@@ -1,56 +1,85 @@
-import xml.etree.ElementTree as ET
 import json
 import re
+from itertools import islice
+import pyarrow as pa
+from lxml import etree
+from .name_matcher import NameMatcher
+from .record_io import RecordWriter, output_path
+
+# holding identifiers tried, in order, before falling back to the company name
+IDENTIFIER_KEYS = ('cusip', 'isin', 'lei')
+# lowest Dice score accepted for an approximate name match; below it short names like
+# "RF Industries" start matching "CF Industries"
+NAME_MATCH_THRESHOLD = 0.86
 
 def normalize_name(name):
     """Normalize the company name for matching."""
     cleaned_string = re.sub(r'(?:\/The)|(?:&amp;)|&|(?:\/[A-Z]+)|[^a-zA-Z0-9\s]', '', name)
     return cleaned_string.upper().strip()
 
+# N-PORT holding child tag (local name) -> output field
+HOLDING_FIELDS = {'lei': 'lei', 'name': 'name', 'title': 'title', 'cusip': 'cusip', 'invCountry': 'country'}
+# columns of the batches yielded by iter_nport_batches, in parse_nport_xml's key order
+HOLDING_SCHEMA = pa.schema([(field, pa.string()) for field in ('lei', 'name', 'title', 'cusip', 'isin', 'country')])
+HOLDING_BATCH_SIZE = 50_000
+HOLDING_TAG = '{http://www.sec.gov/edgar/nport}invstOrSec'
+
+# genInfo child tag -> fund field, read by nport_fund_info
+FUND_FIELDS = {'regName': 'registrant', 'regCik': 'cik', 'seriesName': 'seriesName', 'seriesId': 'seriesId',
+               'repPdEnd': 'periodEnd', 'repPdDate': 'periodDate'}
+
+def _holding(elem, fields=HOLDING_FIELDS):
+    """One invstOrSec element as a holding dict; missing fields are '' (None for name, title and extra `fields`)."""
+    sec = {'lei': '', 'name': None, 'title': None, 'cusip': '', 'isin': '', 'country': ''}
+    for field in fields.values():
+        sec.setdefault(field, None)
+    for child in elem:
+        tag = child.tag.rpartition('}')[2]
+        if tag in fields:
+            sec[fields[tag]] = child.text
+        elif tag == 'identifiers':
+            for identifier in child:
+                if identifier.tag.rpartition('}')[2] == 'isin':
+                    sec['isin'] = identifier.attrib.get('value') or ''
+                    break
+    return sec
+
+def iter_nport_holdings(xml_file, fields=HOLDING_FIELDS):
+    """Stream the holdings (invstOrSec elements) of an NPORT XML file, one dict at a time.
+
+    lxml's iterparse hands back only invstOrSec elements, and each one is
+    dropped from the tree once read, so memory stays flat however many
+    holdings the filing has. `fields` maps the holding child tags to read
+    (e.g. also valUSD or pctVal) to their output keys.
+    """
+    for _, elem in etree.iterparse(xml_file, tag=HOLDING_TAG, remove_comments=True):
+        yield _holding(elem, fields)
+        # drops this holding and any siblings already read
+        elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+def iter_nport_batches(xml_file, batch_size=HOLDING_BATCH_SIZE):
+    """Stream the holdings of an NPORT XML file as Arrow record batches of up to `batch_size` rows."""
+    holdings = iter_nport_holdings(xml_file)
+    while batch := list(islice(holdings, batch_size)):
+        yield pa.RecordBatch.from_pylist(batch, schema=HOLDING_SCHEMA)
+
+def nport_fund_info(xml_file):
+    """The registrant and series of an NPORT XML file, from genInfo, which comes before the holdings."""
+    for _, elem in etree.iterparse(xml_file, tag='{http://www.sec.gov/edgar/nport}genInfo', remove_comments=True):
+        info = dict.fromkeys(FUND_FIELDS.values())
+        for child in elem:
+            tag = child.tag.rpartition('}')[2]
+            if tag in FUND_FIELDS:
+                info[FUND_FIELDS[tag]] = child.text
+        return info
+    return dict.fromkeys(FUND_FIELDS.values())
+
 def parse_nport_xml(xml_file):
     """Parse the NPORT XML file and extract securities data."""
-    namespaces = {
-        'nport': 'http://www.sec.gov/edgar/nport',
-        'com': 'http://www.sec.gov/edgar/common',
-        'ncom': 'http://www.sec.gov/edgar/nportcommon',
-        'xsi': 'http://www.w3.org/2001/XMLSchema-instance'
-    }
-
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
-
-    invstOrSecs = root.findall('.//nport:invstOrSec', namespaces)
-
-    securities = []
-
-    for sec in invstOrSecs:
-        # Extract fields
-        name = sec.find('nport:name', namespaces)
-        lei = sec.find('nport:lei', namespaces)
-        title = sec.find('nport:title', namespaces)
-        cusip = sec.find('nport:cusip', namespaces)
-        identifiers = sec.find('nport:identifiers', namespaces)
-        isin = None
-        if identifiers is not None:
-            isin_elem = identifiers.find('nport:isin', namespaces)
-            if isin_elem is not None:
-                isin = isin_elem.attrib.get('value')
-        assetCat = sec.find('nport:assetCat', namespaces)
-        issuerCat = sec.find('nport:issuerCat', namespaces)
-        invCountry = sec.find('nport:invCountry', namespaces)
-
-        # Collect the data into a dictionary
-        sec_data = {
-            'lei': lei.text if lei is not None else '',
-            'name': name.text if name is not None else None,
-            'title': title.text if title is not None else None,
-            'cusip': cusip.text if cusip is not None else '',
-            'isin': isin if isin is not None else '',
-            'country': invCountry.text if invCountry is not None else '',
-        }
-        securities.append(sec_data)
-
-    return securities
+    return list(iter_nport_holdings(xml_file))
 
 def load_json_securities(json_file):
     """Load the JSON list of securities."""
@@ -58,8 +87,26 @@ def load_json_securities(json_file):
         json_securities = json.load(f)
     return json_securities
 
-def combine_securities(nport_securities, json_securities):
-    """Combine securities data from NPORT XML and JSON list."""
+def identifier_maps(json_securities):
+    """Map each cusip, isin and lei found in the JSON records (top level or under 'securities') to its record."""
+    maps = {key: {} for key in IDENTIFIER_KEYS}
+    for sec in json_securities:
+        for entry in [sec, *(sec.get('securities') or [])]:
+            for key in IDENTIFIER_KEYS:
+                value = (entry.get(key) or '').strip().upper()
+                if value and value != 'N/A':
+                    maps[key].setdefault(value, sec)
+    return maps
+
+def match_securities(nport_securities, json_securities, threshold=NAME_MATCH_THRESHOLD):
+    """The JSON record matching each NPORT holding, or None.
+
+    Holdings are joined on CUSIP, ISIN or LEI where the JSON records carry
+    them, then on the normalized company name. What is left goes through one
+    batched approximate match (`NameMatcher`) against the company names,
+    accepted at a Dice score of at least `threshold`.
+    """
+    maps = identifier_maps(json_securities)
     # Create a mapping from normalized company name to JSON security data
     json_securities_map = {}
     for sec in json_securities:
@@ -67,14 +114,27 @@ def combine_securities(nport_securities, json_securities):
         normalized_name = normalize_name(company_name)
         json_securities_map[normalized_name] = sec
 
+    matches = []
+    for sec in nport_securities:
+        json_sec = next((maps[key][value] for key in IDENTIFIER_KEYS
+                         if (value := (sec.get(key) or '').strip().upper()) in maps[key]), None)
+        matches.append(json_sec or json_securities_map.get(normalize_name(sec.get('name') or '')))
+
+    remaining = [i for i, json_sec in enumerate(matches) if json_sec is None]
+    if remaining:
+        matcher = NameMatcher(sec.get('companyName', '') for sec in json_securities)
+        best, _ = matcher.match([nport_securities[i].get('name') or '' for i in remaining], threshold)
+        for i, index in zip(remaining, best):
+            if index >= 0:
+                matches[i] = json_securities[index]
+    return matches
+
+def combine_securities(nport_securities, json_securities, threshold=NAME_MATCH_THRESHOLD):
+    """Combine securities data from NPORT XML and JSON list, matched by `match_securities`."""
+    matches = match_securities(nport_securities, json_securities, threshold)
     combined_securities = []
     unmatched = []
-    for sec in nport_securities:
-        nport_name = sec.get('name', '')
-        nport_title = sec.get('title', '')
-
-        normalized_nport_name = normalize_name(nport_name)
-        json_sec = json_securities_map.get(normalized_nport_name)
+    for sec, json_sec in zip(nport_securities, matches):
         if json_sec:
             sec.pop('name', None)
             sec.pop('title', None)
@@ -82,22 +142,22 @@ def combine_securities(nport_securities, json_securities):
             combined_securities.append({**sec, **json_sec})
         else:
             # No match found, report only
-            unmatched.append((nport_name, nport_title))
+            unmatched.append((sec.get('name', ''), sec.get('title', '')))
     print(f"Did not find Ticker/CIK for {len(unmatched)} entities")
     print(unmatched)
     return combined_securities
 
-def process_nport(nport_file, cik_ticker_name_ref_file, output_dir):
-    output_file = f"{output_dir}/securities_cusip_ref.json"
+def process_nport(nport_file, cik_ticker_name_ref_file, output_dir, output_format="json", compression=None):
+    output_file = output_path(f"{output_dir}/securities_cusip_ref", output_format, compression)
 
     nport_securities = parse_nport_xml(nport_file)
     json_securities = load_json_securities(cik_ticker_name_ref_file)
 
     combined_securities = combine_securities(nport_securities, json_securities)
 
-    # Output the combined securities to a JSON file
-    with open(output_file, 'w') as f:
-        json.dump(combined_securities, f, indent=4)
+    # Output the combined securities to a JSON, NDJSON or Parquet file
+    with RecordWriter(output_file, compression=compression) as writer:
+        writer.write_many(combined_securities)
 
     print(f"Combined securities data has been saved to '{output_file}'.")
 
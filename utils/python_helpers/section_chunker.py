@@ -0,0 +1,143 @@
+import json
+import re
+from glob import glob
+from typing import Callable, Iterable, Iterator
+import numpy as np
+import pyarrow as pa
+from .record_io import RecordWriter, iter_records
+
+# words, numbers and single punctuation marks; close to (a little under) BPE token counts for English filings
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+# a sentence-ending mark followed by whitespace, the end of the text or, as get_text(strip=True) joins
+# paragraphs without a space, a capital letter
+SENTENCE_END_PATTERN = re.compile(r'[.!?](?=\s|$|[A-Z])')
+MAX_TOKENS = 512
+OVERLAP_TOKENS = 64
+# filing fields copied onto every chunk
+METADATA_FIELDS = ('cik', 'ticker', 'cusips', 'date', 'name')
+CHUNK_SCHEMA = pa.schema([
+    ('id', pa.string()), ('accession', pa.string()), ('item', pa.string()), ('offset', pa.int64()),
+    ('tokens', pa.int32()), ('text', pa.string()), ('cik', pa.string()), ('ticker', pa.string()),
+    ('cusips', pa.list_(pa.string())), ('date', pa.string()), ('name', pa.string()),
+])
+
+Tokenizer = Callable[[str], tuple[np.ndarray, np.ndarray]]
+
+
+def regex_tokens(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Start and end character offsets of the TOKEN_PATTERN tokens of `text`."""
+    spans = np.array([match.span() for match in TOKEN_PATTERN.finditer(text)], dtype=np.int64).reshape(-1, 2)
+    return spans[:, 0], spans[:, 1]
+
+
+def chunk_spans(text: str, max_tokens: int = MAX_TOKENS, overlap: int = OVERLAP_TOKENS,
+                tokenizer: Tokenizer = regex_tokens) -> Iterator[tuple[int, int, int]]:
+    """(start, end, tokens) of overlapping chunks of at most `max_tokens` tokens covering `text`.
+
+    A chunk ends after the last sentence end in the second half of its token
+    window when there is one, else at the window's end. The next chunk starts
+    `overlap` tokens before that.
+    """
+    if overlap >= max_tokens:
+        raise ValueError(f'overlap ({overlap}) must be smaller than max_tokens ({max_tokens})')
+    starts, ends = tokenizer(text)
+    n = len(starts)
+    # index of the token holding each sentence-ending mark
+    sentence_ends = np.searchsorted(ends, [match.start() + 1 for match in SENTENCE_END_PATTERN.finditer(text)])
+    first = 0
+    while first < n:
+        stop = min(first + max_tokens, n)
+        if stop < n:
+            lo, hi = np.searchsorted(sentence_ends, [first + max_tokens // 2, stop])
+            if hi > lo:
+                stop = int(sentence_ends[hi - 1]) + 1
+        yield int(starts[first]), int(ends[stop - 1]), stop - first
+        if stop == n:
+            break
+        first = max(stop - overlap, first + 1)
+
+
+def chunk_id(accession: str, item: str, offset: int) -> str:
+    # stable across runs: the same filing, item and character offset always give the same id
+    return f'{accession}-{item}-{offset}'
+
+
+def iter_chunks(record: dict, sections: Iterable[str] | None = None, max_tokens: int = MAX_TOKENS,
+                overlap: int = OVERLAP_TOKENS, tokenizer: Tokenizer = regex_tokens) -> Iterator[dict]:
+    """Chunks of the item sections of one extracted 10-K record, each carrying the filing metadata.
+
+    `sections` defaults to every item key in the record. Chunks never span
+    two items; `offset` is the chunk's character offset in its item's text.
+    """
+    # the extractor's key has a trailing space
+    accession = record.get('accession') or record.get('accession ')
+    if not accession:
+        raise ValueError(f"10-K record has no 'accession' field (keys: {sorted(record)})")
+    if '-' not in accession:
+        # directory extraction only knows the accession's sequence number; the filing's file id is unique
+        accession = f"{record.get('cik')}_{record.get('date')}_{accession}"
+    metadata = {field: record.get(field) for field in METADATA_FIELDS}
+    items = sections if sections is not None else [key for key in record if key.startswith('item')]
+    for item in items:
+        text = record.get(item)
+        if not text:
+            continue
+        for start, end, tokens in chunk_spans(text, max_tokens, overlap, tokenizer):
+            yield {'id': chunk_id(accession, item, start), 'accession': accession, 'item': item, 'offset': start,
+                   'tokens': tokens, 'text': text[start:end], **metadata}
+
+
+def iter_section_records(path: str) -> Iterator[dict]:
+    """Extracted 10-K records from an ndjson/parquet/json sections file or a directory of per-filing JSON files."""
+    if path.endswith(('.json', '.json.gz', '.ndjson', '.ndjson.gz', '.jsonl', '.parquet')):
+        yield from iter_records(path)
+        return
+    for file in sorted(glob(f'{path}/*.json')):
+        with open(file, 'r', encoding='utf-8') as f:
+            yield json.load(f)
+
+
+class ChunkWriter:
+    """Takes extracted 10-K records, as the extractor's sections writer does, and writes their chunks.
+
+    Passed to Form10kExtractor in place of the sections writer, chunks are
+    written while extraction is still running, so an indexer can follow NDJSON
+    output as it grows. Parquet output is readable once closed.
+    """
+
+    def __init__(self, path: str, output_format: str | None = None, compression: str | None = None,
+                 max_tokens: int = MAX_TOKENS, overlap: int = OVERLAP_TOKENS, tokenizer: Tokenizer = regex_tokens,
+                 row_group_size: int = 5_000) -> None:
+        self.writer = RecordWriter(path, output_format, compression, row_group_size=row_group_size, schema=CHUNK_SCHEMA)
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.tokenizer = tokenizer
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, record: dict) -> None:
+        for chunk in iter_chunks(record, max_tokens=self.max_tokens, overlap=self.overlap, tokenizer=self.tokenizer):
+            self.writer.write(chunk)
+            self.count += 1
+
+    def write_many(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.write(record)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def chunk_sections(sections_path: str, output_file: str, compression: str | None = None,
+                   max_tokens: int = MAX_TOKENS, overlap: int = OVERLAP_TOKENS,
+                   tokenizer: Tokenizer = regex_tokens) -> int:
+    """Chunk already extracted 10-K sections (see `iter_section_records`) into `output_file`; returns the chunk count."""
+    with ChunkWriter(output_file, compression=compression, max_tokens=max_tokens, overlap=overlap,
+                     tokenizer=tokenizer) as writer:
+        writer.write_many(iter_section_records(sections_path))
+    return writer.count
@@ -0,0 +1,190 @@
+import mmap
+from dataclasses import dataclass
+from typing import Iterator
+
+# per-document header tags that precede <TEXT>
+DOCUMENT_TAGS = ("TYPE", "SEQUENCE", "FILENAME", "DESCRIPTION")
+
+
+@dataclass
+class SubmissionDocument:
+    """Lazy view of one <DOCUMENT> in an EDGAR submission.
+
+    `start`/`end` delimit the <TEXT> body within the submission buffer; the
+    body is only sliced out when `raw`, `text` or `xml` is called.
+    """
+    type: str
+    sequence: int | None
+    filename: str | None
+    description: str | None
+    start: int
+    end: int
+    _buffer: object
+
+    def raw(self) -> bytes | str:
+        return self._buffer[self.start:self.end]
+
+    def text(self) -> str:
+        raw = self.raw()
+        return raw.decode("utf-8", errors="ignore") if isinstance(raw, bytes) else raw
+
+    def xml(self) -> str | None:
+        """Contents of the <XML> block of the body, if it has one."""
+        open_tag, close_tag = ("<XML>", "</XML>") if isinstance(self._buffer, str) else (b"<XML>", b"</XML>")
+        start = self._buffer.find(open_tag, self.start, self.end)
+        if start == -1:
+            return None
+        end = self._buffer.find(close_tag, start, self.end)
+        xml = self._buffer[start + len(open_tag):end if end != -1 else self.end]
+        return (xml.decode("utf-8", errors="ignore") if isinstance(xml, bytes) else xml).strip()
+
+
+def parse_sec_header(header: str) -> dict:
+    """Parse SEC-HEADER `KEY:<tab>value` lines into nested dicts.
+
+    Tab indentation nests sections such as `FILER:` / `COMPANY DATA:`;
+    sections that repeat (several FILER blocks) become lists.
+    """
+    root: dict = {}
+    stack = [(-1, root)]
+    for line in header.splitlines():
+        if not line.strip() or ":" not in line:
+            continue
+        depth = len(line) - len(line.lstrip("\t"))
+        key, _, value = line.strip().partition(":")
+        value = value.strip()
+        while stack[-1][0] >= depth:
+            stack.pop()
+        parent = stack[-1][1]
+        if value:
+            parent[key] = value
+            continue
+        section: dict = {}
+        if key in parent:
+            if not isinstance(parent[key], list):
+                parent[key] = [parent[key]]
+            parent[key].append(section)
+        else:
+            parent[key] = section
+        stack.append((depth, section))
+    return root
+
+
+class SecSubmission:
+    """Single-pass splitter for an EDGAR full-submission (.txt) file.
+
+    The buffer may be `bytes`, an `mmap` (see `open`) or `str`. Documents are
+    located with one forward scan over the buffer and exposed as lazy
+    `SubmissionDocument` views; nothing is copied until a body is requested.
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap | str) -> None:
+        self._buffer = buffer
+        self._binary = not isinstance(buffer, str)
+        self._documents: list[SubmissionDocument] | None = None
+        self._header: dict | None = None
+        self._mmap = None
+        self._file = None
+
+    @classmethod
+    def open(cls, path: str) -> "SecSubmission":
+        f = open(path, "rb")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if f.seek(0, 2) else b""
+        submission = cls(buffer)
+        submission._file = f
+        submission._mmap = buffer if isinstance(buffer, mmap.mmap) else None
+        return submission
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+
+    def _token(self, token: str) -> bytes | str:
+        return token.encode() if self._binary else token
+
+    def _decode(self, value: bytes | str) -> str:
+        return value.decode("latin1") if isinstance(value, bytes) else value
+
+    @property
+    def header_text(self) -> str:
+        buffer = self._buffer
+        for open_tag, close_tag in (("<SEC-HEADER>", "</SEC-HEADER>"), ("<IMS-HEADER>", "</IMS-HEADER>")):
+            start = buffer.find(self._token(open_tag))
+            if start != -1:
+                end = buffer.find(self._token(close_tag), start)
+                return self._decode(buffer[start + len(open_tag):end if end != -1 else len(buffer)])
+        return ""
+
+    @property
+    def header(self) -> dict:
+        if self._header is None:
+            self._header = parse_sec_header(self.header_text)
+        return self._header
+
+    @property
+    def documents(self) -> list[SubmissionDocument]:
+        if self._documents is None:
+            self._documents = list(self.iter_documents())
+        return self._documents
+
+    def iter_documents(self) -> Iterator[SubmissionDocument]:
+        buffer = self._buffer
+        doc_open, doc_close = self._token("<DOCUMENT>"), self._token("</DOCUMENT>")
+        text_open, text_close = self._token("<TEXT>"), self._token("</TEXT>")
+        newline = self._token("\n")
+        pos = buffer.find(doc_open)
+        while pos != -1:
+            doc_end = buffer.find(doc_close, pos)
+            if doc_end == -1:
+                doc_end = len(buffer)
+            body_start = buffer.find(text_open, pos, doc_end)
+            tags_end = body_start if body_start != -1 else doc_end
+            tags = {}
+            # the tag block is a handful of short lines; only it is decoded
+            for line in self._decode(buffer[pos + len(doc_open):tags_end]).splitlines():
+                if line.startswith("<") and ">" in line:
+                    tag, _, value = line[1:].partition(">")
+                    if tag in DOCUMENT_TAGS:
+                        tags[tag] = value.strip()
+            if body_start == -1:
+                start = end = tags_end
+            else:
+                start = body_start + len(text_open)
+                if buffer[start:start + 1] == newline:
+                    start += 1
+                end = buffer.rfind(text_close, start, doc_end)
+                if end == -1:
+                    end = doc_end
+            sequence = tags.get("SEQUENCE")
+            yield SubmissionDocument(
+                type=tags.get("TYPE", ""),
+                sequence=int(sequence) if sequence and sequence.isdigit() else None,
+                filename=tags.get("FILENAME"),
+                description=tags.get("DESCRIPTION"),
+                start=start,
+                end=end,
+                _buffer=buffer,
+            )
+            pos = buffer.find(doc_open, doc_end)
+
+    def find(self, doc_type: str) -> SubmissionDocument | None:
+        """First document whose <TYPE> is `doc_type`."""
+        for document in self.documents:
+            if document.type == doc_type:
+                return document
+        return None
+
+    def subject_company(self) -> dict:
+        """COMPANY DATA of the subject company (SC 13D/G) or, failing that, the first filer."""
+        section = self.header.get("SUBJECT COMPANY") or self.header.get("FILER") or {}
+        if isinstance(section, list):
+            section = section[0]
+        return section.get("COMPANY DATA", {})
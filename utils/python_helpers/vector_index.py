@@ -0,0 +1,242 @@
+import json
+import os
+import zlib
+from typing import Iterable, Protocol
+import numpy as np
+import pandas as pd
+from .section_chunker import TOKEN_PATTERN
+
+EMBEDDINGS_FILENAME = 'embeddings.f32'
+METADATA_FILENAME = 'metadata.parquet'
+IVF_FILENAME = 'ivf.npz'
+INFO_FILENAME = 'index.json'
+# chunk fields kept next to the vectors; cik, ticker and date are the pre-filters
+METADATA_FIELDS = ('id', 'accession', 'item', 'offset', 'cik', 'ticker', 'date', 'text')
+# embedding rows scored per matrix product during a scan
+BLOCK_ROWS = 65_536
+EMBED_BATCH = 1_024
+
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors of `dim` dimensions."""
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder, a stand-in for a model when testing retrieval offline.
+
+    Lower-cased words and word bigrams are hashed (CRC32) to a dimension and a
+    sign, counted and L2-normalized, so texts sharing words score higher. It
+    needs no model or network and gives the same vectors on every machine.
+    """
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    def _features(self, text: str) -> list[int]:
+        words = [word.lower() for word in TOKEN_PATTERN.findall(text)]
+        grams = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+        return [zlib.crc32(gram.encode('utf-8')) for gram in grams]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            rows.extend([row] * len(features))
+            hashes.extend(features)
+        hashes = np.asarray(hashes, dtype=np.int64)
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.int64), hashes % self.dim), signs)
+        return _normalize(vectors)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """The k best (score, row) per query row of `scores`, best first."""
+    k = min(k, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else \
+        np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best_scores, order, axis=1), rows[np.take_along_axis(best, order, axis=1)]
+
+
+def _merge_top_k(scores_a, rows_a, scores_b, rows_b, k: int) -> tuple[np.ndarray, np.ndarray]:
+    scores = np.hstack([scores_a, scores_b])
+    rows = np.hstack([rows_a, rows_b])
+    k = min(k, scores.shape[1])
+    best = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(scores, best, axis=1), np.take_along_axis(rows, best, axis=1)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Unit-length centroids of `vectors` (unit rows), clustered by cosine similarity."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        # per-cluster sums as sorted runs, one reduceat instead of a scatter-add per row
+        order = np.argsort(assignment, kind='stable')
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[order], np.cumsum(counts)[filled] - counts[filled], axis=0)
+        # an empty cluster restarts from a random vector
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class VectorIndex:
+    """A local vector index over chunk embeddings in `directory`.
+
+    Vectors are float32 rows of one raw file that is memory-mapped rather
+    than loaded; chunk metadata, text included, sits in a Parquet file
+    alongside. `search` scores queries against the vectors in
+    blocks with one matrix product per block (exact), or only against the
+    `nprobe` closest IVF lists once `build_ivf` has run (approximate). Either
+    way rows can be pre-filtered on cik, ticker and date first.
+    """
+
+    def __init__(self, directory: str, embedder: Embedder | None = None) -> None:
+        self.directory = directory
+        with open(os.path.join(directory, INFO_FILENAME), 'r') as f:
+            info = json.load(f)
+        self.dim = info['dim']
+        self.embedder = embedder or HashingEmbedder(self.dim)
+        if self.embedder.dim != self.dim:
+            raise ValueError(f'Embedder has {self.embedder.dim} dimensions, the index {self.dim}')
+        self.metadata = pd.read_parquet(os.path.join(directory, METADATA_FILENAME))
+        self.dates = pd.to_datetime(self.metadata['date'], errors='coerce').to_numpy()
+        self.vectors = np.memmap(os.path.join(directory, EMBEDDINGS_FILENAME), dtype=np.float32, mode='r',
+                                 shape=(len(self.metadata), self.dim)) if len(self.metadata) else \
+            np.zeros((0, self.dim), dtype=np.float32)
+        self.centroids = self.list_offsets = self.list_rows = None
+        ivf_file = os.path.join(directory, IVF_FILENAME)
+        if os.path.exists(ivf_file):
+            with np.load(ivf_file) as ivf:
+                self.centroids, self.list_offsets, self.list_rows = ivf['centroids'], ivf['offsets'], ivf['rows']
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    @classmethod
+    def build(cls, chunks: Iterable[dict], directory: str, embedder: Embedder | None = None,
+              batch_size: int = EMBED_BATCH) -> 'VectorIndex':
+        """Embed `chunks` (e.g. section_chunker records) batch by batch, appending to the vector file as it goes."""
+        embedder = embedder or HashingEmbedder()
+        os.makedirs(directory, exist_ok=True)
+        embeddings_file = os.path.join(directory, EMBEDDINGS_FILENAME)
+        metadata = []
+        batch = []
+        with open(f'{embeddings_file}.tmp', 'wb') as f:
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) == batch_size:
+                    f.write(np.ascontiguousarray(embedder.embed([c['text'] for c in batch]), dtype=np.float32).tobytes())
+                    metadata.extend({field: c.get(field) for field in METADATA_FIELDS} for c in batch)
+                    batch = []
+            if batch:
+                f.write(np.ascontiguousarray(embedder.embed([c['text'] for c in batch]), dtype=np.float32).tobytes())
+                metadata.extend({field: c.get(field) for field in METADATA_FIELDS} for c in batch)
+        os.replace(f'{embeddings_file}.tmp', embeddings_file)
+        df = pd.DataFrame(metadata, columns=list(METADATA_FIELDS))
+        # as strings for the filter; a missing cik is '' so no filter value matches it
+        df['cik'] = ['' if record['cik'] is None else str(record['cik']) for record in metadata]
+        df.to_parquet(os.path.join(directory, METADATA_FILENAME), index=False)
+        with open(os.path.join(directory, INFO_FILENAME), 'w') as f:
+            json.dump({'dim': embedder.dim, 'count': len(df), 'embedder': type(embedder).__name__}, f)
+        ivf_file = os.path.join(directory, IVF_FILENAME)
+        if os.path.exists(ivf_file):
+            # the lists described the previous vectors
+            os.remove(ivf_file)
+        return cls(directory, embedder)
+
+    def build_ivf(self, n_lists: int | None = None, sample_size: int = 100_000, seed: int = 0) -> None:
+        """Cluster the vectors into `n_lists` inverted lists (default about 4 * sqrt(rows)) for approximate search."""
+        n_lists = n_lists or max(1, int(4 * np.sqrt(len(self))))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(self), min(sample_size, len(self)), replace=False))
+        self.centroids = spherical_kmeans(np.asarray(self.vectors[sample]), min(n_lists, len(sample)), seed=seed)
+        assignment = np.concatenate([np.argmax(self.vectors[start:start + BLOCK_ROWS] @ self.centroids.T, axis=1)
+                                     for start in range(0, len(self), BLOCK_ROWS)])
+        self.list_rows = np.argsort(assignment, kind='stable')
+        self.list_offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(self.centroids)), out=self.list_offsets[1:])
+        ivf_file = os.path.join(self.directory, IVF_FILENAME)
+        with open(f'{ivf_file}.tmp', 'wb') as f:
+            np.savez(f, centroids=self.centroids, offsets=self.list_offsets, rows=self.list_rows)
+        os.replace(f'{ivf_file}.tmp', ivf_file)
+
+    def filter_rows(self, cik=None, ticker=None, date_from: str | None = None, date_to: str | None = None) -> np.ndarray | None:
+        """Sorted rows matching every given filter (cik and ticker may be lists), or None when there is no filter."""
+        mask = np.ones(len(self), dtype=bool)
+        if cik is not None:
+            # one value or many, as str, int or numpy integers
+            mask &= self.metadata['cik'].isin([str(c) for c in np.atleast_1d(cik).tolist()]).to_numpy()
+        if ticker is not None:
+            mask &= self.metadata['ticker'].isin(np.atleast_1d(ticker).tolist()).to_numpy()
+        if date_from is not None:
+            mask &= self.dates >= np.datetime64(pd.Timestamp(date_from))
+        if date_to is not None:
+            mask &= self.dates <= np.datetime64(pd.Timestamp(date_to))
+        if cik is None and ticker is None and date_from is None and date_to is None:
+            return None
+        return np.flatnonzero(mask)
+
+    def _exact(self, queries: np.ndarray, k: int, rows: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+        scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        found = np.zeros((len(queries), 0), dtype=np.int64)
+        total = len(self) if rows is None else len(rows)
+        for start in range(0, total, BLOCK_ROWS):
+            block_rows = np.arange(start, min(start + BLOCK_ROWS, total)) if rows is None else rows[start:start + BLOCK_ROWS]
+            block = self.vectors[start:start + BLOCK_ROWS] if rows is None else self.vectors[block_rows]
+            block_scores, block_found = _top_k(queries @ block.T, block_rows, k)
+            scores, found = _merge_top_k(scores, found, block_scores, block_found, k)
+        return scores, found
+
+    def _approximate(self, queries: np.ndarray, k: int, rows: np.ndarray | None, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+            if rows is not None:
+                candidates = candidates[np.isin(candidates, rows, assume_unique=True)]
+            if not len(candidates):
+                continue
+            candidates.sort()
+            q_scores, q_found = _top_k(queries[q:q + 1] @ self.vectors[candidates].T, candidates, k)
+            scores[q, :q_scores.shape[1]] = q_scores[0]
+            found[q, :q_found.shape[1]] = q_found[0]
+        return scores, found
+
+    def search(self, queries: list[str] | np.ndarray, k: int = 10, nprobe: int | None = None, cik=None, ticker=None,
+               date_from: str | None = None, date_to: str | None = None) -> pd.DataFrame:
+        """Top `k` chunks per query, as one frame of (query, rank, score) plus the chunk metadata.
+
+        `queries` are texts, embedded with the index's embedder, or vectors.
+        With `nprobe` and an IVF built, only that many closest lists are
+        scanned; otherwise the search is exact.
+        """
+        vectors = self.embedder.embed(list(queries)) if not isinstance(queries, np.ndarray) else \
+            _normalize(np.atleast_2d(queries).astype(np.float32))
+        rows = self.filter_rows(cik, ticker, date_from, date_to)
+        if nprobe is not None and self.centroids is not None:
+            scores, found = self._approximate(vectors, k, rows, nprobe)
+        else:
+            scores, found = self._exact(vectors, k, rows)
+        query, rank = np.nonzero(found >= 0)
+        results = self.metadata.iloc[found[query, rank]].reset_index(drop=True)
+        results.insert(0, 'score', scores[query, rank])
+        results.insert(0, 'rank', rank)
+        results.insert(0, 'query', query)
+        return results